@@ -0,0 +1,277 @@
+import os
+import re
+import time
+import uuid
+import fcntl
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+AUDIO_DIR = os.getenv("AUDIO_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "audio"))
+AUDIO_MAX_BYTES = int(os.getenv("AUDIO_MAX_BYTES", str(200 * 1024 * 1024)))
+AUDIO_MAX_AGE_SECONDS = int(os.getenv("AUDIO_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+# Workers re-read the directory this often to pick up files written or removed by the others
+AUDIO_RESYNC_SECONDS = int(os.getenv("AUDIO_RESYNC_SECONDS", "600"))
+# Lookups also evict, at most this often, so workers that never write keep the bounds too
+AUDIO_EVICT_SECONDS = int(os.getenv("AUDIO_EVICT_SECONDS", "60"))
+# Texts handed out as audio URLs but never fetched are forgotten after this long
+AUDIO_PENDING_MAX_AGE_SECONDS = int(os.getenv("AUDIO_PENDING_MAX_AGE_SECONDS", "3600"))
+# Hits refresh a file's mtime (its LRU position for the other workers) at most this often
+AUDIO_TOUCH_SECONDS = 60
+PARTIAL_MAX_AGE_SECONDS = 3600
+
+# Sidecar files next to an audio file: the text still to be rendered, and a pin marker
+PENDING_SUFFIX = ".txt"
+PIN_SUFFIX = ".pin"
+# Manifest of a pipelined response: one audio name per line as segments are rendered
+TURN_SUFFIX = ".turn"
+
+_AUDIO_NAME = re.compile(r"^[0-9a-f]{64}\.mp3$")
+_TURN_ID = re.compile(r"^[0-9a-f]{32}$")
+
+class AudioStore:
+    """
+    Size and age bounded LRU cache of rendered audio files.
+
+    The LRU order lives in memory, so lookups and evictions never scan the
+    directory. Files are written to a temporary name and renamed into place, and
+    evictions run under a file lock, so several Flask/gunicorn workers can share
+    one directory; each worker re-reads it every AUDIO_RESYNC_SECONDS.
+
+    State every worker must agree on is kept in sidecar files in the same directory:
+    "<name>.txt" holds the text of audio handed out but not rendered yet, and
+    "<name>.pin" keeps a file out of eviction in every worker, and "<turn id>.turn"
+    lists the segments of a pipelined response as they are rendered.
+    """
+
+    def __init__(self, directory=AUDIO_DIR, max_bytes=AUDIO_MAX_BYTES, max_age=AUDIO_MAX_AGE_SECONDS,
+                 resync_seconds=AUDIO_RESYNC_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.resync_seconds = resync_seconds
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_path = os.path.join(self.directory, ".lock")
+        self._lock = threading.Lock()
+        # name -> [size, last used], least recently used first
+        self._index = OrderedDict()
+        self._size = 0
+        self._pinned = set()
+        self._evicted_at = time.time()
+        self._resync()
+
+    @staticmethod
+    def valid_name(name: str) -> bool:
+        return bool(_AUDIO_NAME.match(name))
+
+    def _resync(self):
+        now = time.time()
+        index = []
+        pinned = set()
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.name.endswith(".part") and now - stat.st_mtime > PARTIAL_MAX_AGE_SECONDS:
+                    # Left behind by a worker that died mid-write
+                    self._remove(entry.name)
+                if entry.name.endswith((PENDING_SUFFIX, TURN_SUFFIX)) and now - stat.st_mtime > AUDIO_PENDING_MAX_AGE_SECONDS:
+                    self._remove(entry.name)
+                if entry.name.endswith(PIN_SUFFIX):
+                    pinned.add(entry.name[:-len(PIN_SUFFIX)])
+                if not self.valid_name(entry.name):
+                    continue
+                index.append((stat.st_mtime, entry.name, stat.st_size))
+        index.sort()
+        with self._lock:
+            self._index = OrderedDict((name, [size, mtime]) for mtime, name, size in index)
+            self._size = sum(size for _, _, size in index)
+            self._pinned = pinned
+            self._synced_at = time.time()
+
+    def _forget(self, name):
+        entry = self._index.pop(name, None)
+        if entry:
+            self._size -= entry[0]
+
+    def path(self, name: str):
+        """
+        :return: Path of a cached file (marking it as recently used), or None when not cached
+        """
+        if not self.valid_name(name):
+            return None
+        path = os.path.join(self.directory, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            # Possibly evicted by another worker
+            with self._lock:
+                self._forget(name)
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._index.get(name)
+            if entry is None:
+                # Written by another worker since the last resync
+                self._index[name] = entry = [stat.st_size, stat.st_mtime]
+                self._size += stat.st_size
+            self._index.move_to_end(name)
+            touch = now - entry[1] >= AUDIO_TOUCH_SECONDS
+            entry[1] = now
+        if touch:
+            try:
+                os.utime(path, (now, now))
+            except FileNotFoundError:
+                pass
+        if now - self._evicted_at > AUDIO_EVICT_SECONDS:
+            self.evict()
+        return path
+
+    def partial_path(self, name: str) -> str:
+        """
+        :return: Unique temporary path to write a file to before it is added with put
+        """
+        return os.path.join(self.directory, f"{name}.{uuid.uuid4()}.part")
+
+    def put(self, name: str, partial_path: str) -> str:
+        """
+        Atomically moves a completely written file into the cache and evicts old files.
+        :return: Path of the cached file
+        """
+        path = os.path.join(self.directory, name)
+        size = os.path.getsize(partial_path)
+        os.replace(partial_path, path)
+        with self._lock:
+            self._forget(name)
+            self._index[name] = [size, time.time()]
+            self._size += size
+        self.evict()
+        return path
+
+    def _sidecar(self, name: str, suffix: str) -> str:
+        return os.path.join(self.directory, name + suffix)
+
+    @contextmanager
+    def _directory_lock(self, blocking=True):
+        with open(self._lock_path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            yield True
+
+    def set_pending(self, name: str, text: str):
+        """
+        Records the text of an audio file that will be rendered when first requested,
+        so any worker can serve the request.
+        """
+        if not self.valid_name(name):
+            raise ValueError(f"Invalid audio name {name!r}")
+        partial_path = self.partial_path(name)
+        with open(partial_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(partial_path, self._sidecar(name, PENDING_SUFFIX))
+
+    def pending_text(self, name: str):
+        """
+        :return: Text recorded with set_pending, or None when unknown or already rendered
+        """
+        if not self.valid_name(name):
+            return None
+        try:
+            with open(self._sidecar(name, PENDING_SUFFIX), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def clear_pending(self, name: str):
+        try:
+            os.remove(self._sidecar(name, PENDING_SUFFIX))
+        except FileNotFoundError:
+            pass
+
+    def turn_path(self, turn_id: str):
+        """
+        :return: Path of a turn's manifest, or None if the turn id is invalid
+        """
+        if not _TURN_ID.match(turn_id):
+            return None
+        return os.path.join(self.directory, turn_id + TURN_SUFFIX)
+
+    def append_turn(self, turn_id: str, line: str = None):
+        """
+        Appends a line to a turn's manifest, creating it when line is None.
+        """
+        path = self.turn_path(turn_id)
+        if path is None:
+            raise ValueError(f"Invalid turn id {turn_id!r}")
+        with open(path, "a", encoding="utf-8") as f:
+            if line is not None:
+                f.write(line + "\n")
+
+    def pin(self, name: str):
+        """
+        Keeps a file (e.g. a static prompt) out of eviction in every worker.
+        """
+        if not self.valid_name(name):
+            raise ValueError(f"Invalid audio name {name!r}")
+        # Under the lock, so an eviction already in progress cannot remove it afterwards
+        with self._directory_lock():
+            open(self._sidecar(name, PIN_SUFFIX), "a").close()
+        with self._lock:
+            self._pinned.add(name)
+
+    def _is_pinned(self, name):
+        # Pins made by other workers since the last resync only exist on disk
+        if name in self._pinned:
+            return True
+        if os.path.exists(self._sidecar(name, PIN_SUFFIX)):
+            self._pinned.add(name)
+            return True
+        return False
+
+    def _expired(self, name, entry, now):
+        return (self._size > self.max_bytes or now - entry[1] > self.max_age) and not self._is_pinned(name)
+
+    def evict(self):
+        """
+        Removes least recently used files until the cache fits its size and age bounds.
+        """
+        self._evicted_at = time.time()
+        if self._evicted_at - self._synced_at > self.resync_seconds:
+            self._resync()
+
+        # One worker evicts at a time; the others skip this round
+        with self._directory_lock(blocking=False) as locked:
+            if not locked:
+                return
+
+            now = time.time()
+            victims = []
+            with self._lock:
+                for name, entry in list(self._index.items()):
+                    if not self._expired(name, entry, now):
+                        if name in self._pinned:
+                            continue
+                        break
+                    self._forget(name)
+                    victims.append(name)
+
+            for name in victims:
+                self._remove(name)
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+            print(f"Removed old audio file: {name}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error removing file {name}: {e}")
@@ -1,48 +1,110 @@
-
 import os
-import uuid
+import hashlib
 from elevenlabs import VoiceSettings
 from elevenlabs.client import ElevenLabs
 from dotenv import load_dotenv
+from Call.AudioStore import AudioStore
 
 load_dotenv()
 
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 
+VOICE_ID = "EXAVITQu4vr4xnSDxMaL" # Adam pre-made voice
+MODEL_ID = "eleven_turbo_v2_5" # use the turbo model for low latency
+OUTPUT_FORMAT = "mp3_22050_32"
+VOICE_SETTINGS = {
+    "stability": 0.0,
+    "similarity_boost": 1.0,
+    "style": 0.0,
+    "use_speaker_boost": False,
+}
+
 class TextToSpeech:
-    def __init__(self):
+    def __init__(self, store=None):
         self.client = ElevenLabs(
             api_key=ELEVENLABS_API_KEY,
         )
+        # Rendered audio, named by the hash of its text and voice settings, and the
+        # texts handed out as audio URLs but not rendered yet, shared by all workers
+        self.store = store or AudioStore()
 
-    def text_to_speech_file(self, text: str) -> str:
-        # Calling the text_to_speech conversion API with detailed parameters
-        response = self.client.text_to_speech.convert(
-            voice_id="EXAVITQu4vr4xnSDxMaL", # Adam pre-made voice
-            output_format="mp3_22050_32",
+    @staticmethod
+    def audio_name(text: str) -> str:
+        """
+        Content-addressed file name: the same text with the same voice settings
+        always maps to the same file, so it is only rendered once.
+        """
+        settings = repr((VOICE_ID, MODEL_ID, OUTPUT_FORMAT, sorted(VOICE_SETTINGS.items())))
+        return hashlib.sha256(f"{settings}\n{text}".encode()).hexdigest() + ".mp3"
+
+    def audio_path(self, name: str):
+        """
+        :return: Path of a rendered audio file, or None if the name is invalid or not rendered yet
+        """
+        return self.store.path(name)
+
+    def _convert(self, text: str):
+        # Calling the text_to_speech conversion API; the audio arrives in chunks
+        return self.client.text_to_speech.convert(
+            voice_id=VOICE_ID,
+            output_format=OUTPUT_FORMAT,
             text=text,
-            model_id="eleven_turbo_v2_5", # use the turbo model for low latency
-            voice_settings=VoiceSettings(
-            stability=0.0,
-            similarity_boost=1.0,
-            style=0.0,
-            use_speaker_boost=False,
-        ),
-    )
-
-        # uncomment the line below to play the audio back
-        # play(response)
-
-        # Generating a unique file name for the output MP3 file
-        save_file_path = f"{uuid.uuid4()}.mp3"
-
-        # Writing the audio to a file
-        with open(save_file_path, "wb") as f:
-            for chunk in response:
-                if chunk:
-                    f.write(chunk)
-
-        print(f"{save_file_path}: A new audio file was saved successfully!")
-
-        # Return the path of the saved audio file
-        return save_file_path
\ No newline at end of file
+            model_id=MODEL_ID,
+            voice_settings=VoiceSettings(**VOICE_SETTINGS),
+        )
+
+    def stream(self, text: str):
+        """
+        Yields the audio chunks as ElevenLabs produces them and saves the complete
+        file to the cache once the stream finishes.
+        """
+        name = self.audio_name(text)
+        partial_path = self.store.partial_path(name)
+        try:
+            with open(partial_path, "wb") as f:
+                for chunk in self._convert(text):
+                    if chunk:
+                        f.write(chunk)
+                        yield chunk
+            self.store.put(name, partial_path)
+            self.store.clear_pending(name)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+    def text_to_speech_file(self, text: str) -> str:
+        """
+        Renders the text unless it is already cached.
+        :return: File name of the audio in the cache directory
+        """
+        name = self.audio_name(text)
+        if not self.audio_path(name):
+            for _ in self.stream(text):
+                pass
+            print(f"{name}: A new audio file was saved successfully!")
+        return name
+
+    def prepare(self, text: str) -> str:
+        """
+        Registers the text for rendering without waiting for it, so the audio URL can
+        be returned right away and streamed when the caller fetches it.
+        :return: File name to request from the audio endpoint
+        """
+        name = self.audio_name(text)
+        if not self.audio_path(name):
+            self.store.set_pending(name, text)
+        return name
+
+    def pending_text(self, name: str):
+        return self.store.pending_text(name)
+
+    def prerender(self, texts):
+        """
+        Renders static prompts ahead of time; failures only mean they are streamed on first use.
+        """
+        for text in texts:
+            try:
+                self.store.pin(self.prepare(text))
+                self.text_to_speech_file(text)
+            except Exception as e:
+                print(f"Error pre-rendering audio for {text!r}: {e}")
@@ -1,84 +1,169 @@
-from phi.agent import Agent, RunResponse
-from phi.model.google import Gemini
 import os
-import yfinance as yf
+import threading
 from dotenv import load_dotenv
+from app.llm_gateway import llm_gateway
+from app.news_recommendation_module.news_store import news_store
+from app.news_recommendation_module.news_ingest import NEWS_TICKERS
+from app.news_recommendation_module.relevance import NewsIndex, estimate_tokens
+from app.news_recommendation_module.ticker_resolver import TickerResolver
+from Call.Sessions import CallSession, CallSessions, summarize_portfolio, summarize_news, fit_lines, truncate_tokens
 
 load_dotenv()
 
+# Upper bound on the whole prompt of one turn
+CALL_PROMPT_TOKEN_BUDGET = int(os.getenv("CALL_PROMPT_TOKEN_BUDGET", "3000"))
+# Parts of it used by the portfolio summary and the news computed at call start
+CALL_PORTFOLIO_TOKEN_BUDGET = int(os.getenv("CALL_PORTFOLIO_TOKEN_BUDGET", "800"))
+CALL_NEWS_TOKEN_BUDGET = int(os.getenv("CALL_NEWS_TOKEN_BUDGET", "600"))
+# Longest question passed on, callers rarely say more than this in one turn
+MAX_QUERY_TOKENS = 200
+
+INSTRUCTIONS = (
+    "You are a highly intelligent, professional, and empathetic conversational assistant designed to provide accurate, "
+    "context-aware, and engaging responses. Your primary goal is to assist the client effectively while maintaining "
+    "a pleasant and professional tone."
+
+    "\n\nHere are your guidelines for generating a response:"
+    "\n1. If the query is directly related to the portfolio or business news, integrate the relevant details into your response."
+    "\n2. Ensure all data used is accurate and properly contextualized for the query."
+    "\n3. If the query is not directly related to the provided data, respond like a general conversational assistant without "
+    "referencing the portfolio or news."
+    "\n4. Maintain a polite, engaging, and professional tone throughout the conversation."
+    "\n5. Avoid providing false or speculative information. Only use data when it is relevant and applicable."
+    "\n6. If the query is ambiguous, ask clarifying questions to better understand the client’s needs."
+    "\n7. For queries unrelated to the portfolio, news, or business, handle them appropriately as a general conversational bot, "
+    "focusing on being helpful and pleasant."
+    "\n8. If the client asks for advice or recommendations, ensure they are actionable, practical, and backed by context where applicable."
+    "\n9. Handle sensitive or personal questions with empathy and discretion, ensuring the response is respectful and appropriate."
+    "\n10. If the client’s query includes humor, sarcasm, or casual remarks, respond in a way that matches the client’s tone while "
+    "still being professional and pleasant."
+)
+
 class ResponseAgent:
+    """
+    Answers a caller's questions about their portfolio and the news.
+    The portfolio and news context is summarized once per call and reused with a
+    short rolling history, so every turn's prompt stays within CALL_PROMPT_TOKEN_BUDGET.
+    """
 
     def __init__(self):
-        self.agent = Agent(
-            model=Gemini(id="gemini-2.0-flash-exp", api_key=os.getenv("GEMINI_API_KEY"))
-        )
-        self.news_data = {}
+        self.sessions = CallSessions()
+        self.portfolio = {}
+        self.resolver = TickerResolver()
+        self.tickers = set()
+        self._portfolio_summary = ""
+        # (store version, news, storage timestamps) read once per news update rather
+        # than on every call, and the relevance index built from it
+        self._news = (None, {}, {})
+        self._news_index = (None, None)
+        self._news_lock = threading.Lock()
 
     def set_portfolio(self, portfolio):
         self.portfolio = portfolio
-        
-    def fetch_news(self, indexes):
+        # Match news against the symbols and names of the stocks held
+        self.resolver = TickerResolver()
+        self.tickers = set()
+        for stock in portfolio.get("portfolio", {}).get("stocks", []):
+            if stock.get("symbol"):
+                ticker = f"{stock['symbol']}.NS"
+                self.tickers.add(ticker)
+                self.resolver.add(stock["symbol"], ticker)
+                if stock.get("name"):
+                    self.resolver.add(stock["name"], ticker)
+        self._portfolio_summary = fit_lines(summarize_portfolio(portfolio), CALL_PORTFOLIO_TOKEN_BUDGET)
+        with self._news_lock:
+            self._news_index = (None, None)
+
+    def _read_news(self):
+        """
+        Latest news per ticker from the news store shared with the FastAPI app, whose
+        background worker ingests it. Re-read only when the store's version changes.
+        :return: (news, storage timestamps)
         """
-        Fetches the latest news for a list of stock indexes.
-        :param indexes: List of ticker symbols for stock indexes
-        :return: News data as a JSON object
+        version = news_store.version()
+        with self._news_lock:
+            cached_version, news, timestamps = self._news
+            if cached_version != version:
+                news, timestamps = news_store.get_timestamped_news()
+                if not news:
+                    print("The news store is empty, is the FastAPI app's news worker running?")
+                    news, timestamps = news_store.get_timestamped_news(NEWS_TICKERS)
+                self._news = (version, news, timestamps)
+            return news, timestamps
+
+    def news_index(self):
+        """
+        Relevance index of the current news, rebuilt only when the news or the portfolio changes.
+        """
+        news, timestamps = self._read_news()
+        with self._news_lock:
+            cached_news, index = self._news_index
+            if index is None or cached_news is not news:
+                index = NewsIndex(news, self.resolver, timestamps)
+                self._news_index = (news, index)
+            return index
+
+    def build_context(self):
+        """
+        Compact portfolio and news summary for one call.
         """
+        news = self.news_index().select(self.tickers, token_budget=CALL_NEWS_TOKEN_BUDGET)
+        return (
+            f"The client's portfolio:\n{self._portfolio_summary}"
+            f"\n\nThe latest business news relevant to the client:\n{summarize_news(news) or 'No news found.'}"
+        )
 
-        for ticker_symbol in indexes:
-            try:
-                ticker = yf.Ticker(ticker_symbol)
-                news = ticker.news or []
-
-                index_news = []
-                for article in news:
-                    try:
-                        index_news.append({
-                            "Title": article["content"]["title"],
-                            "Summary": article["content"]["summary"],
-                            "Link": article["content"]["clickThroughUrl"]["url"]
-                        })
-                    except KeyError:
-                        continue
-
-                if not index_news:
-                    index_news.append({
-                        "Title": "No news found",
-                        "Summary": "",
-                        "Link": ""
-                    })
-
-                self.news_data[ticker_symbol.upper()] = index_news
-            except Exception as e:
-                print(f"Error fetching news for {ticker_symbol.upper()}: {e}")
-
-    def generate_response(self, query):
-        prompt = (
-            "You are a highly intelligent, professional, and empathetic conversational assistant designed to provide accurate, "
-            "context-aware, and engaging responses. Your primary goal is to assist the client effectively while maintaining "
-            "a pleasant and professional tone."
-            
-            f"\n\nThe client's portfolio contains the following information: {self.portfolio}."
-            f"\nThe latest business news relevant to the client includes: {self.news_data}."
-            
+    def start_call(self, call_sid):
+        """
+        Summarizes the context for a new call. Calls without a session get one on their first
+        turn; a session that already exists, from a turn or another worker, is kept.
+        """
+        return self.sessions.start(call_sid, self.build_context())
+
+    def end_call(self, call_sid):
+        self.sessions.end(call_sid)
+
+    def _session(self, call_sid):
+        if call_sid is None:
+            return CallSession(self.build_context())
+        return self.sessions.get(call_sid) or self.start_call(call_sid)
+
+    def _prompt(self, query, session):
+        query = truncate_tokens(" ".join(query.split()), MAX_QUERY_TOKENS)
+        question = (
             f"\n\nThe client has asked the following question: {query}."
-            
-            "\n\nHere are your guidelines for generating a response:"
-            "\n1. If the query is directly related to the portfolio or business news, integrate the relevant details into your response."
-            "\n2. Ensure all data used is accurate and properly contextualized for the query."
-            "\n3. If the query is not directly related to the provided data, respond like a general conversational assistant without "
-            "referencing the portfolio or news."
-            "\n4. Maintain a polite, engaging, and professional tone throughout the conversation."
-            "\n5. Avoid providing false or speculative information. Only use data when it is relevant and applicable."
-            "\n6. If the query is ambiguous, ask clarifying questions to better understand the client’s needs."
-            "\n7. For queries unrelated to the portfolio, news, or business, handle them appropriately as a general conversational bot, "
-            "focusing on being helpful and pleasant."
-            "\n8. If the client asks for advice or recommendations, ensure they are actionable, practical, and backed by context where applicable."
-            "\n9. Handle sensitive or personal questions with empathy and discretion, ensuring the response is respectful and appropriate."
-            "\n10. If the client’s query includes humor, sarcasm, or casual remarks, respond in a way that matches the client’s tone while "
-            "still being professional and pleasant."
-            
-            "\n\nNow, based on the provided data and query, generate a response that fulfills the client’s expectations and adheres to "
-            "the above guidelines. Strive for clarity, relevance, and engagement in every response."
+            "\n\nNow, based on the provided data, conversation and query, generate a response that fulfills the client’s "
+            "expectations and adheres to the above guidelines. Strive for clarity, relevance, and engagement in every response."
         )
-        run: RunResponse = self.agent.run(prompt)
-        return run.content
\ No newline at end of file
+        prompt = f"{INSTRUCTIONS}\n\n{session.context}"
+
+        # Most recent turns first, as many as fit in the rest of the budget
+        remaining = CALL_PROMPT_TOKEN_BUDGET - estimate_tokens(prompt + question)
+        turns = []
+        for asked, answer in reversed(session.history):
+            turn = f"Client: {asked}\nAssistant: {answer}"
+            remaining -= estimate_tokens(turn)
+            if remaining < 0:
+                break
+            turns.append(turn)
+
+        if turns:
+            prompt += "\n\nThe conversation so far:\n" + "\n".join(reversed(turns))
+        return prompt + question
+
+    def generate_response(self, query, call_sid=None):
+        session = self._session(call_sid)
+        content = llm_gateway.run(self._prompt(query, session))
+        session.add_turn(query, content)
+        return content
+
+    def stream_response(self, query, call_sid=None):
+        """
+        Yields the response text in chunks as the model generates it.
+        """
+        session = self._session(call_sid)
+        chunks = []
+        for chunk in llm_gateway.stream(self._prompt(query, session)):
+            chunks.append(chunk)
+            yield chunk
+        session.add_turn(query, "".join(chunks))
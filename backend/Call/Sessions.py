@@ -0,0 +1,164 @@
+import os
+import json
+from collections import deque
+from app.news_recommendation_module.relevance import estimate_tokens
+from app.redis_db.redis import redis_client
+
+# Calls without a turn for this long are dropped
+CALL_SESSION_TTL_SECONDS = int(os.getenv("CALL_SESSION_TTL_SECONDS", "1800"))
+# Question/answer pairs remembered per call
+CALL_HISTORY_TURNS = int(os.getenv("CALL_HISTORY_TURNS", "6"))
+
+_CONTEXT_KEY = "call:{}:context"
+_HISTORY_KEY = "call:{}:history"
+
+# Fields that do not help answer questions and only cost tokens
+_SKIPPED_FIELDS = {"email", "contact"}
+
+
+def _fields(item):
+    return ", ".join(
+        f"{key}={value}"
+        for key, value in item.items()
+        if key not in _SKIPPED_FIELDS and not isinstance(value, (dict, list))
+    )
+
+
+def summarize_portfolio(portfolio):
+    """
+    Renders a portfolio as one short line per holding instead of its full repr.
+    """
+    lines = []
+    investor = portfolio.get("investor", {})
+    if investor:
+        lines.append(f"Investor: {_fields(investor)}")
+        if investor.get("investment_profile"):
+            lines.append(f"Profile: {_fields(investor['investment_profile'])}")
+
+    for section, holdings in portfolio.get("portfolio", {}).items():
+        if isinstance(holdings, list):
+            lines.extend(f"{section}: {_fields(holding)}" for holding in holdings)
+        elif isinstance(holdings, dict):
+            lines.append(f"{section}: {_fields(holdings)}")
+            lines.extend(
+                f"{section} {key}: {_fields(value)}" for key, value in holdings.items() if isinstance(value, dict)
+            )
+
+    for activity in portfolio.get("recent_activities", [])[:3]:
+        lines.append(f"Recent activity: {_fields(activity)}")
+    return "\n".join(lines)
+
+
+def summarize_news(news):
+    """
+    Renders selected news ({"Companies": [...], "Market": [...]}) as one line per article.
+    """
+    return "\n".join(
+        f"{section}: {article.get('Title', '')} - {article.get('Summary', '')}"
+        for section, articles in news.items()
+        for article in articles
+    )
+
+
+def fit_lines(text, token_budget):
+    """
+    Keeps whole lines from the start of the text until the token budget is used up.
+    """
+    kept, used = [], 0
+    for line in text.splitlines():
+        cost = estimate_tokens(line)
+        if used + cost > token_budget:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept)
+
+
+def truncate_tokens(text, token_budget):
+    """
+    Cuts text to the token budget at a word boundary, or mid-word when a single word is longer.
+    """
+    if estimate_tokens(text) <= token_budget:
+        return text
+    limit = max(0, (token_budget - 1) * 4)
+    cut = text[:limit]
+    space = cut.rfind(" ")
+    return cut[:space] if space > 0 else cut
+
+
+class CallSession:
+    def __init__(self, context, history=(), call_sid=None, store=None):
+        # Portfolio and news summary computed once when the call starts
+        self.context = context
+        self.history = deque(history, maxlen=CALL_HISTORY_TURNS)
+        self.call_sid = call_sid
+        self.store = store
+
+    def add_turn(self, query, answer):
+        self.history.append((query, answer))
+        if self.store is not None:
+            self.store.add_turn(self.call_sid, query, answer)
+
+
+class CallSessions:
+    """
+    Per-call state keyed by Twilio CallSid, kept in Redis so every worker of the Call
+    service sees the same calls. A call's context is only written if none exists yet,
+    so a late start never replaces a session a turn has already used. Calls expire
+    after CALL_SESSION_TTL_SECONDS without a turn.
+    """
+
+    def __init__(self, client=None, ttl=CALL_SESSION_TTL_SECONDS, history_turns=CALL_HISTORY_TURNS):
+        self.client = client or redis_client.redis_client
+        self.ttl = ttl
+        self.history_turns = history_turns
+
+    def get(self, call_sid):
+        """
+        :return: The call's session, or None when the call has not started or expired
+        """
+        context_key, history_key = _CONTEXT_KEY.format(call_sid), _HISTORY_KEY.format(call_sid)
+        try:
+            pipe = self.client.pipeline()
+            pipe.get(context_key)
+            pipe.lrange(history_key, 0, -1)
+            pipe.expire(context_key, self.ttl)
+            pipe.expire(history_key, self.ttl)
+            context, turns = pipe.execute()[:2]
+        except Exception as e:
+            print(f"Error reading call session {call_sid}: {e}")
+            return None
+        if context is None:
+            return None
+        history = [tuple(json.loads(turn)) for turn in turns]
+        return CallSession(context, history, call_sid, self)
+
+    def start(self, call_sid, context):
+        """
+        Stores the context of a new call, unless the call already has a session.
+        :return: The call's session
+        """
+        try:
+            if not self.client.set(_CONTEXT_KEY.format(call_sid), context, ex=self.ttl, nx=True):
+                return self.get(call_sid) or CallSession(context, call_sid=call_sid, store=self)
+        except Exception as e:
+            print(f"Error storing call session {call_sid}: {e}")
+        return CallSession(context, call_sid=call_sid, store=self)
+
+    def add_turn(self, call_sid, query, answer):
+        history_key = _HISTORY_KEY.format(call_sid)
+        try:
+            pipe = self.client.pipeline()
+            pipe.rpush(history_key, json.dumps([query, answer]))
+            pipe.ltrim(history_key, -self.history_turns, -1)
+            pipe.expire(history_key, self.ttl)
+            pipe.expire(_CONTEXT_KEY.format(call_sid), self.ttl)
+            pipe.execute()
+        except Exception as e:
+            print(f"Error storing call turn {call_sid}: {e}")
+
+    def end(self, call_sid):
+        try:
+            self.client.delete(_CONTEXT_KEY.format(call_sid), _HISTORY_KEY.format(call_sid))
+        except Exception as e:
+            print(f"Error ending call session {call_sid}: {e}")
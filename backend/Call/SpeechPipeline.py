@@ -0,0 +1,185 @@
+import os
+import re
+import time
+import uuid
+import threading
+import concurrent.futures
+from collections import OrderedDict
+
+# Sentences synthesized at the same time
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "4"))
+# Shorter fragments are merged with the next sentence to avoid tiny TTS calls
+MIN_SENTENCE_CHARS = int(os.getenv("MIN_SENTENCE_CHARS", "20"))
+# Turns kept in memory for the caller to fetch
+MAX_TURNS = int(os.getenv("MAX_TURNS", "256"))
+# A turn followed from another worker's manifest is given up after this long without a new segment
+TURN_STALL_SECONDS = int(os.getenv("TURN_STALL_SECONDS", "60"))
+TURN_POLL_SECONDS = 0.1
+# Last line of a turn manifest
+TURN_END = "END"
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+")
+
+def split_sentences(chunks, min_chars=MIN_SENTENCE_CHARS):
+    """
+    Splits streamed text into sentences as soon as each one is complete.
+    :param chunks: Iterable of text chunks
+    :return: Generator of sentences
+    """
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        start = 0
+        for match in _SENTENCE_END.finditer(buffer):
+            sentence = buffer[start:match.end()].strip()
+            if len(sentence) < min_chars:
+                continue
+            yield sentence
+            start = match.end()
+        buffer = buffer[start:]
+
+    if buffer.strip():
+        yield buffer.strip()
+
+
+class _Turn:
+    def __init__(self):
+        self.segments = []
+        self.done = False
+        self.error = None
+        self.condition = threading.Condition()
+
+    def add(self, segment):
+        with self.condition:
+            self.segments.append(segment)
+            self.condition.notify_all()
+
+    def finish(self, error=None):
+        with self.condition:
+            self.done = True
+            self.error = error
+            self.condition.notify_all()
+
+    def __iter__(self):
+        index = 0
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: index < len(self.segments) or self.done)
+                if index >= len(self.segments):
+                    if self.error:
+                        print(f"Error generating response: {self.error}")
+                    return
+                segment = self.segments[index]
+            index += 1
+            yield segment
+
+
+class ResponsePipeline:
+    """
+    Pipelines LLM generation and speech synthesis for one conversational turn.
+
+    The model's response is streamed and split into sentences; each sentence is
+    sent to TTS as soon as it is complete, with several sentences synthesized at
+    once, and the audio endpoint plays the rendered segments back in order. The
+    caller starts hearing the answer after about one sentence of LLM and TTS time.
+    The worker that generates a turn streams it from memory; it also records the
+    rendered segments in a manifest in the shared audio directory, so any other
+    worker asked for the turn's audio follows that manifest instead.
+    """
+
+    def __init__(self, response_agent, tts, workers=TTS_WORKERS):
+        self.response_agent = response_agent
+        self.tts = tts
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self._turns = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, query, call_sid=None):
+        """
+        Starts generating the response in the background.
+        :return: Turn id to fetch the audio with
+        """
+        turn_id = uuid.uuid4().hex
+        turn = _Turn()
+        with self._lock:
+            self._turns[turn_id] = turn
+            while len(self._turns) > MAX_TURNS:
+                self._turns.popitem(last=False)
+        # Exists before the URL is handed out, so any worker can find the turn
+        self.tts.store.append_turn(turn_id)
+
+        threading.Thread(target=self._generate, args=(turn, query, call_sid), daemon=True).start()
+        threading.Thread(target=self._record, args=(turn, turn_id), daemon=True).start()
+        return turn_id
+
+    def _generate(self, turn, query, call_sid):
+        try:
+            for sentence in split_sentences(self.response_agent.stream_response(query, call_sid)):
+                turn.add(self.executor.submit(self.tts.text_to_speech_file, sentence))
+            turn.finish()
+        except Exception as e:
+            turn.finish(e)
+
+    def _record(self, turn, turn_id):
+        # Segment names in order, for workers that did not generate the turn
+        store = self.tts.store
+        try:
+            for segment in turn:
+                try:
+                    store.append_turn(turn_id, segment.result())
+                except Exception as e:
+                    print(f"Error recording sentence: {e}")
+            store.append_turn(turn_id, TURN_END)
+        except Exception as e:
+            print(f"Error recording turn {turn_id}: {e}")
+
+    def audio(self, turn_id):
+        """
+        :return: Generator of MP3 bytes for the turn, or None if the turn is unknown
+        """
+        with self._lock:
+            turn = self._turns.get(turn_id)
+        if turn is not None:
+            return self._stream(turn)
+
+        path = self.tts.store.turn_path(turn_id)
+        if path is None or not os.path.exists(path):
+            return None
+        return self._follow(path)
+
+    def _follow(self, path):
+        with open(path, "rb") as manifest:
+            waited = 0.0
+            while waited < TURN_STALL_SECONDS:
+                position = manifest.tell()
+                line = manifest.readline()
+                if not line.endswith(b"\n"):
+                    # Nothing new yet, or a line still being written
+                    manifest.seek(position)
+                    time.sleep(TURN_POLL_SECONDS)
+                    waited += TURN_POLL_SECONDS
+                    continue
+                waited = 0.0
+                name = line.decode().strip()
+                if name == TURN_END:
+                    return
+                yield from self._read(self.tts.audio_path(name))
+            print(f"Gave up waiting for the rest of turn {os.path.basename(path)}")
+
+    def _stream(self, turn):
+        # MP3 frames can be concatenated, so the segments play back as one file
+        for segment in turn:
+            try:
+                path = self.tts.audio_path(segment.result())
+            except Exception as e:
+                print(f"Error synthesizing sentence: {e}")
+                continue
+            yield from self._read(path)
+
+    @staticmethod
+    def _read(path):
+        if not path:
+            return
+        with open(path, "rb") as f:
+            while chunk := f.read(16384):
+                yield chunk
@@ -1,12 +1,15 @@
+# Run from backend/ with `python -m Call.main`, so the app package shared with the FastAPI service is importable
 import os
 from dotenv import load_dotenv
 from twilio.rest import Client
-from flask import Flask, request, send_file
+from flask import Flask, request, send_file, Response, stream_with_context
 from twilio.twiml.voice_response import VoiceResponse
-from ElevenLabs import TextToSpeech
-from Response import ResponseAgent
+from Call.ElevenLabs import TextToSpeech
+from Call.Response import ResponseAgent
+from Call.SpeechPipeline import ResponsePipeline
 from flask_cors import CORS
 import subprocess
+import threading
 
 # Load environment variables from .env file
 load_dotenv()
@@ -139,8 +142,10 @@ CORS(app, resources={
 })
 tts = TextToSpeech()
 response_agent = ResponseAgent()
-response_agent.fetch_news(['^BSESN', "TCS.NS"])
 response_agent.set_portfolio(portfolio)
+response_pipeline = ResponsePipeline(response_agent, tts)
+# Set to false to synthesize the complete response only after the model has finished
+PIPELINED_RESPONSES = os.getenv("PIPELINED_RESPONSES", "true").lower() == "true"
 
 # Get environment variables
 account_sid = os.environ["TWILIO_ACCOUNT_SID"]
@@ -149,24 +154,35 @@ client = Client(account_sid, auth_token)
 
 NGROK_URL = "https://cd61-160-20-123-3.ngrok-free.app"  # Your ngrok URL
 
+WELCOME_TEXT = "Hello! I'm an automated assistant. How can I help you today?"
+PROMPT_TEXT = "Please speak after the beep."
+
+# Static prompts are rendered once in the background; until then they are streamed
+threading.Thread(target=tts.prerender, args=([WELCOME_TEXT, PROMPT_TEXT],), daemon=True).start()
+
+def audio_url(text):
+    # Returns immediately; the audio is rendered (or read from cache) when Twilio fetches it
+    return f"{NGROK_URL}/audio/{tts.prepare(text)}"
+
 @app.route("/start-call", methods=['GET'])
 def make_call():
     call = client.calls.create(
         url=f"{NGROK_URL}/welcome",
         to="+919409814992",
         from_="+16412176555",
+        status_callback=f"{NGROK_URL}/call-status",
     )
     return str(call.sid)
 
 @app.route("/welcome", methods=['POST'])
 def welcome():
-    # Generate welcome message audio
-    welcome_file = tts.text_to_speech_file(
-        "Hello! I'm an automated assistant. How can I help you today?"
-    )
-    
+    # Summarize the portfolio and news once for the whole call, while the greeting plays
+    call_sid = request.values.get('CallSid')
+    if call_sid:
+        threading.Thread(target=response_agent.start_call, args=(call_sid,), daemon=True).start()
+
     response = VoiceResponse()
-    response.play(f"{NGROK_URL}/audio/{welcome_file}")
+    response.play(audio_url(WELCOME_TEXT))
     
     gather = response.gather(
         input='speech',
@@ -176,23 +192,25 @@ def welcome():
         action='/handle-response'
     )
     
-    # Generate prompt audio
-    prompt_file = tts.text_to_speech_file("Please speak after the beep.")
-    gather.play(f"{NGROK_URL}/audio/{prompt_file}")
+    gather.play(audio_url(PROMPT_TEXT))
     
     return str(response)
 
 @app.route("/handle-response", methods=['POST'])
 def handle_response():
     user_speech = request.values.get('SpeechResult', '')
+    call_sid = request.values.get('CallSid')
     
     response = VoiceResponse()
     
-    response_text = response_agent.generate_response(user_speech)
-    
-    # Generate audio file for response
-    response_file = tts.text_to_speech_file(response_text)
-    response.play(f"{NGROK_URL}/audio/{response_file}")
+    if PIPELINED_RESPONSES:
+        # Sentences are synthesized while the model is still generating
+        turn_id = response_pipeline.start(user_speech, call_sid)
+        response.play(f"{NGROK_URL}/audio/turn/{turn_id}.mp3")
+    else:
+        response_text = response_agent.generate_response(user_speech, call_sid)
+        # Audio for the response is streamed when Twilio requests it
+        response.play(audio_url(response_text))
     
     gather = response.gather(
         input='speech',
@@ -202,20 +220,35 @@ def handle_response():
         action='/handle-response'
     )
     
-    # Generate prompt audio
-    prompt_file = tts.text_to_speech_file("Please speak after the beep.")
-    gather.play(f"{NGROK_URL}/audio/{prompt_file}")
+    gather.play(audio_url(PROMPT_TEXT))
     
     return str(response)
 
-# Route to serve audio files
+@app.route("/call-status", methods=['POST'])
+def call_status():
+    # Twilio reports the call as completed when it ends
+    if request.values.get('CallStatus') == 'completed':
+        response_agent.end_call(request.values.get('CallSid'))
+    return "", 204
+
+# Route to serve audio files, streaming the ones that have not been rendered yet
 @app.route("/audio/<filename>")
 def serve_audio(filename):
-    try:
-        return send_file(filename, mimetype="audio/mpeg")
-    except Exception as e:
-        print(f"Error serving audio file: {e}")
-        return str(e), 404
+    path = tts.audio_path(filename)
+    if path:
+        return send_file(path, mimetype="audio/mpeg")
+
+    text = tts.pending_text(filename)
+    if text is None:
+        return "Audio not found", 404
+    return Response(stream_with_context(tts.stream(text)), mimetype="audio/mpeg")
+
+@app.route("/audio/turn/<turn_id>.mp3")
+def serve_turn_audio(turn_id):
+    audio = response_pipeline.audio(turn_id)
+    if audio is None:
+        return "Audio not found", 404
+    return Response(stream_with_context(audio), mimetype="audio/mpeg")
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
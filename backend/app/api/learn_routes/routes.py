@@ -1,18 +1,26 @@
-from fastapi import APIRouter, HTTPException
+import json
+import asyncio
+import threading
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from ...learning_module.learn import CourseBuilder
+from ...learning_module.course_store import course_store
 from pydantic import BaseModel
 from typing import Dict
+from app.concurrency import run_blocking
 router = APIRouter()
 
 class LearnRequest(BaseModel):
     query: str
 
 class LearnResponse(BaseModel):
+    course_id: str
     syllabus: Dict[str, str]
     chapters: Dict[str, str]
     questions: Dict[str, str]
 
 class AnswerRequest(BaseModel):
+    course_id: str
     Set: Dict[str,str]
     chapter: str
 
@@ -20,19 +28,75 @@ class AnswerResponse(BaseModel):
     Scores: Dict[str, int]
     Evaluation: str
 
+# Stateless, so one instance is shared by all requests
 Learner = CourseBuilder()
 
+def build_course(query: str):
+    course = Learner.GenerateCourse(query)
+    return LearnResponse(**course)
+
+def evaluate_answers(answers: Dict[str, str], course_id: str, chapter_ref: str):
+    chapter = course_store.get_chapter(course_id, chapter_ref)
+    if chapter is None:
+        raise HTTPException(status_code=404, detail="Course or chapter not found")
+    try:
+        scores, summary = Learner.evaluate(answers, chapter)
+    except ValueError as e:
+        # The model's scores could not be parsed or did not match the questions
+        raise HTTPException(status_code=502, detail=f"Could not evaluate the answers: {e}")
+    return AnswerResponse(Scores=scores, Evaluation=summary)
+
 @router.post("/learn")
 async def learn(request: LearnRequest):
-    Learner.set_query(request.query)
-    syllabus = Learner.PlanSyllabus()
-    chapters = Learner.BuildChapters()
-    questions = Learner.GenerateQuestions()
-    return LearnResponse(syllabus=syllabus, chapters=chapters, questions=questions)
+    return await run_blocking(build_course, request.query, dependency="llm")
+
+@router.post("/learn/stream")
+async def learn_stream(request: LearnRequest, http_request: Request):
+    """
+    Streams the course as it is generated: the syllabus first, then every chapter and
+    question set as soon as it is ready. Sends server-sent events when the client
+    accepts text/event-stream and newline-delimited JSON otherwise.
+    """
+    use_sse = "text/event-stream" in http_request.headers.get("accept", "")
+    cancelled = threading.Event()
+    events = Learner.IterCourse(request.query, cancelled)
+
+    def encode(event):
+        payload = json.dumps(event)
+        return f"event: {event['event']}\ndata: {payload}\n\n" if use_sse else payload + "\n"
+
+    def close_events(step=None):
+        if step is not None and not step.cancelled():
+            # Retrieved so a failure after the client left is not reported as unhandled
+            step.exception()
+        # Runs the generator's cleanup: queued chapter jobs are cancelled and the generation lock released
+        asyncio.get_running_loop().run_in_executor(None, events.close)
+
+    async def body():
+        step = None
+        try:
+            while True:
+                step = asyncio.ensure_future(run_blocking(next, events, None, dependency="llm"))
+                # Shielded so a disconnect does not abandon the step while it still runs in a thread
+                event = await asyncio.shield(step)
+                if event is None:
+                    yield encode({"event": "done"})
+                    break
+                yield encode(event)
+        except Exception as e:
+            yield encode({"event": "error", "detail": str(e)})
+        finally:
+            cancelled.set()
+            if step is None or step.done():
+                close_events()
+            else:
+                # The generator cannot be closed while next() runs; close it once that step returns
+                step.add_done_callback(close_events)
+
+    media_type = "text/event-stream" if use_sse else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media_type)
 
 @router.post("/evaluate")
 async def evaluate(request: AnswerRequest):
-    scores = Learner.get_scores(request.Set, request.chapter)
-    summary = Learner.get_eval(request.Set, request.chapter)
-    return AnswerResponse(Scores=scores, Evaluation=summary)
+    return await run_blocking(evaluate_answers, request.Set, request.course_id, request.chapter, dependency="llm")
 
@@ -1,14 +1,30 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from ...news_recommendation_module.news import NewsReporter
+from ...news_recommendation_module.market_data import market_cache, VALID_PERIODS, VALID_INTERVALS
+from ...news_recommendation_module.news_store import news_store
+from ...news_recommendation_module.recommendation_cache import result_cache
+from ...news_recommendation_module.price_stream import PriceHub
 from app.redis_db.redis import redis_client
+from app.concurrency import run_blocking
+from app.llm_gateway import llm_gateway
+from app.serialization import json_dumps
 import yfinance as yf
 
 router = APIRouter()
 
+class FastJSONResponse(JSONResponse):
+    # orjson when installed, the json module otherwise; both handle numpy values in price histories
+    def render(self, content) -> bytes:
+        return json_dumps(content)
+
+# Stateless apart from the shared news corpus, so one instance serves all requests
 reporter = NewsReporter()
-reporter.fetch_news(['^BSESN', "TCS.NS"])
+# One poller for all live price subscribers of the deployment, started with the app in every worker
+price_hub = PriceHub(reporter.fetch_prices, redis_client.async_client)
 
 class Stocks(BaseModel):
     name: str
@@ -33,6 +49,8 @@ class FixedDeposits(BaseModel):
     maturity_value: float
     tenure_years: int
     interest_rate: float
+    # ISO date the deposit was opened, used to accrue its current value
+    start_date: Optional[str] = None
 
 class RecentTransactions(BaseModel):
     date: str
@@ -78,39 +96,52 @@ class WalletRequest(BaseModel):
 
 @router.post("/news")
 async def news(request: WalletRequest):
-    portfolio = redis_client.get_portfolio(request.wallet_address)
+    portfolio = await redis_client.aget_portfolio(request.wallet_address)
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
-    reporter.set_portfolio(portfolio)
-    relevant_news = reporter.get_news()
+    relevant_news = await result_cache.news_summary(
+        await news_store.aversion(),
+        lambda: run_blocking(reporter.get_news, dependency="llm"),
+    )
     return NewsResponse(news=relevant_news)
 
 @router.post("/recommendations")
 async def recommendations(request: WalletRequest):
-    portfolio = redis_client.get_portfolio(request.wallet_address)
+    portfolio = await redis_client.aget_portfolio(request.wallet_address)
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
-    reporter.set_portfolio(portfolio)
-    recommendations = reporter.generate_recommendations()
+    recommendations = await result_cache.recommendations(
+        request.wallet_address,
+        portfolio,
+        await news_store.aversion(),
+        lambda: run_blocking(reporter.generate_recommendations, portfolio, dependency="llm"),
+    )
     return RecommendationsResponse(recommendations=recommendations)
 
 @router.post("/portfolio")
 async def create_portfolio(portfolio: PortfolioSubmission):
-    success = redis_client.set_portfolio(portfolio.wallet_address, portfolio.portfolio_data)
+    success = await redis_client.aset_portfolio(portfolio.wallet_address, portfolio.portfolio_data)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to save portfolio")
     return {"message": "Portfolio saved successfully"}
 
-@router.get("/portfolio/{wallet_address}")
+@router.get("/portfolio/{wallet_address}", response_class=FastJSONResponse)
 async def get_portfolio(wallet_address: str):
-    portfolio = redis_client.get_portfolio(wallet_address)
+    portfolio = await redis_client.aget_portfolio(wallet_address)
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
     return portfolio
 
+@router.get("/portfolio/{wallet_address}/section/{section}")
+async def get_portfolio_section(wallet_address: str, section: str):
+    section_data = await redis_client.aget_portfolio_section(wallet_address, section)
+    if section_data is None:
+        raise HTTPException(status_code=404, detail="Portfolio section not found")
+    return section_data
+
 @router.put("/portfolio/section")
 async def update_portfolio_section(update: PortfolioSectionUpdate):
-    success = redis_client.update_portfolio_section(
+    success = await redis_client.aupdate_portfolio_section(
         update.wallet_address,
         update.section,
         update.section_data
@@ -119,11 +150,77 @@ async def update_portfolio_section(update: PortfolioSectionUpdate):
         raise HTTPException(status_code=500, detail="Failed to update portfolio section")
     return {"message": "Portfolio section updated successfully"}
 
-@router.get("/portfolio/{wallet_address}/stocks")
-async def get_stocks(wallet_address:str):
-    portfolio = redis_client.get_portfolio(wallet_address)
+@router.get("/portfolio/{wallet_address}/stocks", response_class=FastJSONResponse)
+async def get_stocks(wallet_address:str, period: str = "1mo", interval: str = "1d", format: str = "rows"):
+    if period not in VALID_PERIODS or interval not in VALID_INTERVALS or format not in ("rows", "columnar"):
+        raise HTTPException(status_code=400, detail="Invalid period, interval or format")
+    portfolio = await redis_client.aget_portfolio(wallet_address)
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
-    reporter.set_portfolio(portfolio)
-    updated_portfolio = reporter.update_portfolio_prices()
-    return updated_portfolio
\ No newline at end of file
+    updated_portfolio = await run_blocking(
+        reporter.update_portfolio_prices,
+        portfolio,
+        period=period,
+        interval=interval,
+        columnar=format == "columnar",
+        dependency="market_data",
+    )
+    return updated_portfolio
+
+@router.get("/portfolio/{wallet_address}/analytics", response_class=FastJSONResponse)
+async def get_analytics(wallet_address: str):
+    portfolio = await redis_client.aget_portfolio(wallet_address)
+    if not portfolio:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    return await run_blocking(reporter.portfolio_analytics, portfolio, dependency="market_data")
+
+@router.get("/portfolio/{wallet_address}/valuation")
+async def get_valuation(wallet_address: str):
+    # Written by the bulk revaluation job (news_recommendation_module/revaluation.py)
+    valuation = await redis_client.aget_valuation(wallet_address)
+    if valuation is None:
+        raise HTTPException(status_code=404, detail="Valuation not found")
+    return valuation
+
+@router.get("/market-data/cache")
+async def market_data_cache_stats():
+    return market_cache.stats()
+
+@router.get("/llm/stats")
+async def llm_stats():
+    return llm_gateway.stats()
+
+@router.websocket("/portfolio/{wallet_address}/live")
+async def live_prices(websocket: WebSocket, wallet_address: str):
+    """
+    Pushes {"type": "quotes", "quotes": {ticker: price}} whenever a held stock's price changes.
+    The first message maps each stock name to its ticker.
+    """
+    await websocket.accept()
+    portfolio = await redis_client.aget_portfolio(wallet_address)
+    if not portfolio:
+        await websocket.close(code=1008, reason="Portfolio not found")
+        return
+
+    tickers = await run_blocking(reporter.portfolio_tickers, portfolio)
+    await websocket.send_json({"type": "holdings", "tickers": tickers})
+    queue = price_hub.subscribe(tickers.values())
+    # Only used to notice the client going away
+    receiver = asyncio.create_task(websocket.receive_text())
+    update = asyncio.create_task(queue.get())
+    try:
+        while True:
+            done, _ = await asyncio.wait({receiver, update}, return_when=asyncio.FIRST_COMPLETED)
+            # Both may finish together; the update is sent before a disconnect is raised
+            if update in done:
+                await websocket.send_json({"type": "quotes", "quotes": update.result()})
+                update = asyncio.create_task(queue.get())
+            if receiver in done:
+                receiver.result()
+                receiver = asyncio.create_task(websocket.receive_text())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        update.cancel()
+        price_hub.unsubscribe(queue)
@@ -0,0 +1,120 @@
+import os
+import time
+import asyncio
+import functools
+import threading
+import concurrent.futures
+
+# Threads available to blocking calls (LLM, yfinance) made from async handlers
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "32"))
+
+# Maximum number of in-flight blocking calls per upstream dependency
+DEPENDENCY_LIMITS = {
+    "market_data": int(os.getenv("MARKET_DATA_CONCURRENCY", "16")),
+}
+# Dependencies whose calls can wait a long time get a pool of their own, so waiting
+# never holds the threads market data and Redis calls run on. LLM calls queue here
+# and then for a slot of the LLM gateway (LLM_MAX_CONCURRENCY).
+DEPENDENCY_POOL_SIZES = {
+    "llm": int(os.getenv("LLM_BLOCKING_POOL_SIZE", "16")),
+}
+
+_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=BLOCKING_POOL_SIZE, thread_name_prefix="blocking"
+)
+_dependency_executors = {
+    name: concurrent.futures.ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"{name}-blocking")
+    for name, size in DEPENDENCY_POOL_SIZES.items()
+}
+_semaphores = {name: asyncio.Semaphore(limit) for name, limit in DEPENDENCY_LIMITS.items()}
+
+
+async def run_blocking(func, *args, dependency=None, **kwargs):
+    """
+    Runs a blocking callable on a thread pool without stalling the event loop.
+    :param func: Blocking callable
+    :param dependency: Optional dependency name ("market_data", "llm") whose concurrency limit or pool applies
+    :return: Result of func(*args, **kwargs)
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args, **kwargs)
+    executor = _dependency_executors.get(dependency, _executor)
+    if dependency not in _semaphores:
+        return await loop.run_in_executor(executor, call)
+    async with _semaphores[dependency]:
+        return await loop.run_in_executor(executor, call)
+
+
+def shutdown_executor():
+    for executor in (_executor, *_dependency_executors.values()):
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+    Allows bursts of up to capacity calls and refills at rate tokens per second.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """
+        Blocks until the requested number of tokens is available.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into a single execution.
+    The first caller for a key runs the function, every caller that arrives while
+    it is still running waits for and receives the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Runs fn() once per key across concurrent callers.
+        :param key: Hashable key identifying the call
+        :param fn: Zero-argument callable producing the result
+        :return: Result of fn()
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = concurrent.futures.Future()
+                self._calls[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
@@ -0,0 +1,121 @@
+import os
+import re
+import time
+import hashlib
+from contextlib import contextmanager
+from redis.exceptions import LockError
+from app.redis_db.redis import redis_client
+from app.serialization import serializer
+
+COURSE_CACHE_TTL_SECONDS = int(os.getenv("COURSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+COURSE_CACHE_MAX_ENTRIES = int(os.getenv("COURSE_CACHE_MAX_ENTRIES", "5000"))
+# Upper bound on how long one generation may hold the per-query lock
+COURSE_GENERATION_TIMEOUT = int(os.getenv("COURSE_GENERATION_TIMEOUT", "300"))
+# How often a caller waiting for another caller's generation checks on it
+COURSE_LOCK_POLL_SECONDS = 0.5
+
+_KEY_PREFIX = "course_cache:"
+_INDEX_KEY = "course_cache:index"
+
+
+def normalize_query(query):
+    """
+    Normalizes a course query so trivially different spellings share a cache entry.
+    "  Sustainable Investing basics? " and "sustainable investing basics" are equal.
+    """
+    query = re.sub(r"\s+", " ", query.lower()).strip()
+    return query.strip(" .,!?;:")
+
+
+class CourseCache:
+    """
+    Redis cache of generated courses keyed by a hash of the normalized query and the
+    prompt version. Entries expire after a TTL, the least recently used entries are
+    evicted beyond a maximum count, and a per-key Redis lock makes sure concurrent
+    identical queries (from any worker) start a single generation and the others wait
+    for its result.
+    """
+
+    def __init__(self, client, ttl=COURSE_CACHE_TTL_SECONDS, max_entries=COURSE_CACHE_MAX_ENTRIES):
+        self.client = client
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    @staticmethod
+    def key_for(query, prompt_version):
+        digest = hashlib.sha256(f"{prompt_version}:{normalize_query(query)}".encode()).hexdigest()
+        return f"{_KEY_PREFIX}{digest}"
+
+    def get(self, key):
+        """
+        Returns the cached course ({"syllabus", "chapters", "questions"}) or None.
+        """
+        try:
+            data = self.client.get(key)
+            if not data:
+                return None
+            self.client.zadd(_INDEX_KEY, {key: time.time()})
+            return serializer.loads(data)
+        except Exception as e:
+            print(f"Error reading course cache: {e}")
+            return None
+
+    def set(self, key, course_data):
+        try:
+            pipe = self.client.pipeline()
+            pipe.set(key, serializer.dumps(course_data), ex=self.ttl)
+            pipe.zadd(_INDEX_KEY, {key: time.time()})
+            # Forget index entries whose values already expired
+            pipe.zremrangebyscore(_INDEX_KEY, "-inf", time.time() - self.ttl)
+            pipe.zcard(_INDEX_KEY)
+            size = pipe.execute()[-1]
+
+            if size > self.max_entries:
+                evicted = self.client.zpopmin(_INDEX_KEY, size - self.max_entries)
+                if evicted:
+                    self.client.delete(*[member for member, _ in evicted])
+        except Exception as e:
+            print(f"Error writing course cache: {e}")
+
+    @contextmanager
+    def generation_lock(self, key, wait=COURSE_GENERATION_TIMEOUT, cancelled=None):
+        """
+        Waits until the caller may generate the course for key: when no one else is
+        generating it, when the holder has stored it, or after wait seconds. Yields True
+        when the lock was taken and False otherwise; either way the caller should check
+        the cache again first. The lock is released when the block exits, including when
+        a generator holding it is closed early.
+        :param cancelled: Optional threading.Event that stops the wait when set
+        """
+        # The lock may be released from a different thread than the one that took it
+        lock = self.client.lock(
+            f"{key}:lock",
+            timeout=COURSE_GENERATION_TIMEOUT,
+            blocking_timeout=COURSE_LOCK_POLL_SECONDS,
+            thread_local=False,
+        )
+        deadline = time.monotonic() + wait
+        acquired = False
+        try:
+            while not (acquired := lock.acquire()):
+                if time.monotonic() >= deadline or (cancelled is not None and cancelled.is_set()):
+                    break
+                if self.client.exists(key):
+                    # Stored by the holder, which releases the lock shortly
+                    break
+        except Exception as e:
+            # Generate without the lock rather than fail the request
+            print(f"Error acquiring course generation lock: {e}")
+            acquired = False
+
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    lock.release()
+                except LockError:
+                    # Expired while generating; another caller may already hold it
+                    pass
+
+course_cache = CourseCache(redis_client.binary_client)
@@ -0,0 +1,112 @@
+import os
+import uuid
+import threading
+from collections import OrderedDict
+from app.redis_db.redis import redis_client
+from app.serialization import serializer, MAGIC
+
+# Generated courses are kept long enough for students to work through them
+COURSE_STORE_TTL_SECONDS = int(os.getenv("COURSE_STORE_TTL_SECONDS", str(90 * 24 * 3600)))
+COURSE_STORE_LOCAL_ENTRIES = int(os.getenv("COURSE_STORE_LOCAL_ENTRIES", "1024"))
+
+_KEY_PREFIX = "course:"
+
+
+class CourseStore:
+    """
+    Keyed store of generated courses. Each course is one Redis hash (course:<id>)
+    with a field for the syllabus and one per chapter content / question set, so a
+    reader fetches only the fields it needs. Courses never change once saved,
+    which lets each process keep a small in-memory read-through cache.
+    """
+
+    def __init__(self, client, ttl=COURSE_STORE_TTL_SECONDS, local_entries=COURSE_STORE_LOCAL_ENTRIES):
+        self.client = client
+        self.ttl = ttl
+        self.local_entries = local_entries
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(course_id):
+        return f"{_KEY_PREFIX}{course_id}"
+
+    def save(self, query, course_data, course_id=None):
+        """
+        Saves a course and returns its id.
+        :param query: The query the course was generated for
+        :param course_data: {"syllabus": ..., "chapters": ..., "questions": ...}
+        :param course_id: Optional id to (re)use, a new one is generated otherwise
+        :return: Course id
+        """
+        course_id = course_id or uuid.uuid4().hex
+        fields = {"query": query, "syllabus": course_data["syllabus"]}
+        for chapter_no, content in course_data["chapters"].items():
+            fields[f"chapter:{chapter_no}"] = content
+        for chapter_no, questions in course_data["questions"].items():
+            fields[f"questions:{chapter_no}"] = questions
+        fields = {field: serializer.dumps(value) for field, value in fields.items()}
+
+        pipe = self.client.pipeline()
+        pipe.hset(self._key(course_id), mapping=fields)
+        pipe.expire(self._key(course_id), self.ttl)
+        pipe.execute()
+        return course_id
+
+    def exists(self, course_id):
+        return bool(self.client.exists(self._key(course_id)))
+
+    def _get_field(self, course_id, field):
+        with self._lock:
+            if (course_id, field) in self._local:
+                self._local.move_to_end((course_id, field))
+                return self._local[(course_id, field)]
+
+        value = self.client.hget(self._key(course_id), field)
+        if value is None:
+            return None
+        if field == "syllabus" or value.startswith(MAGIC):
+            value = serializer.loads(value)
+        else:
+            # Courses saved before the serializer stored chapter text as-is
+            value = value.decode()
+
+        with self._lock:
+            self._local[(course_id, field)] = value
+            while len(self._local) > self.local_entries:
+                self._local.popitem(last=False)
+        return value
+
+    def get_syllabus(self, course_id):
+        return self._get_field(course_id, "syllabus")
+
+    def get_chapter(self, course_id, chapter):
+        """
+        Returns a single chapter of a course.
+        :param course_id: Course id returned by /api/learn
+        :param chapter: Chapter key ("chapter2") or chapter title from the syllabus
+        :return: {"chapter": key, "title": ..., "content": ..., "questions": ...} or None
+        """
+        syllabus = self.get_syllabus(course_id)
+        if not syllabus:
+            return None
+
+        if chapter in syllabus:
+            chapter_no = chapter
+        else:
+            chapter_no = next(
+                (no for no, title in syllabus.items() if title.strip().lower() == chapter.strip().lower()),
+                None,
+            )
+        if chapter_no is None:
+            return None
+
+        return {
+            "chapter": chapter_no,
+            "title": syllabus[chapter_no],
+            "content": self._get_field(course_id, f"chapter:{chapter_no}") or "",
+            "questions": self._get_field(course_id, f"questions:{chapter_no}") or "",
+        }
+
+
+course_store = CourseStore(redis_client.binary_client)
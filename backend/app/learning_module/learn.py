@@ -1,32 +1,43 @@
-import time
-import random
 import json
-from typing import Dict
-from phi.agent import Agent, RunResponse
-from phi.model.google import Gemini
+import uuid
+from typing import Dict, Tuple
 import os
 from dotenv import load_dotenv
 import re
 import concurrent.futures
-from google.api_core.exceptions import InternalServerError
+from app.llm_gateway import llm_gateway
+from .course_cache import course_cache
+from .course_store import course_store
 
 load_dotenv()
 
+# Bump whenever a prompt changes so cached courses from older prompts are not served
+PROMPT_VERSION = "1"
+
+# Chapter and question jobs from every course share one scheduler
+COURSE_JOB_CONCURRENCY = int(os.getenv("COURSE_JOB_CONCURRENCY", "6"))
+# How often a running generation checks whether its consumer has gone away
+CANCEL_CHECK_SECONDS = 0.5
+
 class CourseBuilder:
+    """
+    Generates courses with Gemini. Holds no per-request state: every method takes
+    the query and syllabus it works on, so one instance can serve concurrent requests.
+    """
 
     def __init__(self):
-        self.agent = Agent(
-            model=Gemini(id="gemini-2.0-flash-exp", api_key=os.getenv("GEMINI_API_KEY"))
+        self.scheduler = concurrent.futures.ThreadPoolExecutor(
+            max_workers=COURSE_JOB_CONCURRENCY, thread_name_prefix="course-job"
         )
-        self.chapters = {}
 
-    def set_query(self, query):
-        self.query = query
+    def _run(self, prompt) -> str:
+        # Rate limited, retried and de-duplicated by the shared gateway
+        return llm_gateway.run(prompt)
 
-    def PlanSyllabus(self):
+    def PlanSyllabus(self, query):
         prompt = (
             "You are an expert course syllabus planner tasked with creating a detailed and well-structured course plan. "
-            f"The client has provided the following requirement: {self.query}. "
+            f"The client has provided the following requirement: {query}. "
             "Your job is to design a comprehensive course outline that is thoroughly organized and progresses logically from basic to advanced concepts. "
             "The course should be broken down into chapters, with each chapter representing a small, manageable section of content that can fit on approximately one page. "
             "Ensure the following guidelines are adhered to when creating the course plan:" 
@@ -42,8 +53,7 @@ class CourseBuilder:
             "\n\nRemember, the objective is to create a course outline that is well-balanced, informative, and easy to follow while ensuring each chapter is appropriately scoped for a single-page content limit."
         )
 
-        run: RunResponse = self.agent.run(prompt)
-        output = run.content
+        output = self._run(prompt)
 
         chapter_dict = {}
         chapter_pattern = r"Chapter\s*(\d+):\s*(.+)"
@@ -53,61 +63,157 @@ class CourseBuilder:
             chapter_number = f"chapter{match.group(1).strip()}"
             chapter_title = match.group(2).strip()
             chapter_dict[chapter_number] = chapter_title
-                
-        self.chapters = chapter_dict
-
-        with open("course.json", "w") as file:
-            json.dump({"syllabus": chapter_dict}, file, indent=4)
 
         return chapter_dict
 
-    def BuildChapters(self):
-        if not self.chapters:
-            raise ValueError("Chapters have not been created. Run PlanSyllabus() first.")
-
-        chapters_list = list(self.chapters.items())
-        total_chapters = len(chapters_list)
-        workers = 3
-
-        chunk_size = (total_chapters + workers - 1) // workers
-        chunks = [chapters_list[i:i + chunk_size] for i in range(0, total_chapters, chunk_size)]
-
-        chapter_content = {}
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-            futures = []
-
-            for i, chunk in enumerate(chunks):
-                futures.append(executor.submit(self._process_chunk_content, chunk, i))
+    def IterCourse(self, query, cancelled=None):
+        """
+        Generates a course incrementally. The syllabus is yielded as soon as it is parsed,
+        then each chapter and question set as soon as its own job finishes. Courses for
+        previously seen queries are replayed from the course cache. A concurrent identical
+        query, from this or another worker, waits for the running generation and replays
+        its result, or generates the course itself if that generation failed.
 
-            for future in concurrent.futures.as_completed(futures):
-                result = future.result()
-                chapter_content.update(result)
+        Args:
+            query (str): The client's course requirement.
+            cancelled (threading.Event, optional): Set when the consumer goes away; waiting
+                stops, queued chapter jobs are cancelled and the partial course is not stored.
+
+        Yields:
+            dict: {"event": "syllabus", "course_id": str, "syllabus": {...}} followed by
+                  {"event": "chapter" | "questions", "chapter": "chapterN", "content": str}
+                  and finally {"event": "saved", "course_id": str} once the course is stored.
+        """
+        key = course_cache.key_for(query, PROMPT_VERSION)
+        course_data = course_cache.get(key)
+
+        if course_data is None:
+            with course_cache.generation_lock(key, cancelled=cancelled):
+                if cancelled is not None and cancelled.is_set():
+                    return
+                # Whoever held the lock before us may have generated it already
+                course_data = course_cache.get(key)
+                if course_data is None:
+                    yield from self._generate_course(query, key, cancelled)
+                    return
+
+        course_id = course_data.get("course_id")
+        if not course_id or not course_store.exists(course_id):
+            # The stored course expired before its cache entry, store it again
+            course_id = course_store.save(query, course_data, course_id)
+
+        yield {"event": "syllabus", "course_id": course_id, "syllabus": course_data["syllabus"]}
+        for chapter_no in course_data["syllabus"]:
+            if chapter_no in course_data["chapters"]:
+                yield {"event": "chapter", "chapter": chapter_no, "content": course_data["chapters"][chapter_no]}
+            if chapter_no in course_data["questions"]:
+                yield {"event": "questions", "chapter": chapter_no, "content": course_data["questions"][chapter_no]}
+        yield {"event": "saved", "course_id": course_id}
+
+    def _generate_course(self, query, key, cancelled=None):
+        syllabus = self.PlanSyllabus(query)
+        # The id is handed out with the syllabus; the course is stored once complete
+        course_id = uuid.uuid4().hex
+        yield {"event": "syllabus", "course_id": course_id, "syllabus": syllabus}
+
+        course_data = {"syllabus": syllabus, "chapters": {}, "questions": {}}
+        for kind, chapter_no, text in self._iter_chapter_jobs(query, syllabus, True, True, cancelled):
+            course_data[kind][chapter_no] = text
+            yield {"event": "chapter" if kind == "chapters" else "questions", "chapter": chapter_no, "content": text}
+        if cancelled is not None and cancelled.is_set():
+            return
+
+        course_data = self._ordered(course_data)
+        # Failed chapters are retried by the next request instead of being cached
+        failed = any(
+            text.startswith("Failed to generate")
+            for section in ("chapters", "questions")
+            for text in course_data[section].values()
+        )
+        course_store.save(query, course_data, course_id)
+        if syllabus and not failed:
+            course_cache.set(key, {**course_data, "course_id": course_id})
+        yield {"event": "saved", "course_id": course_id}
 
-        with open("course.json", "r") as file:
-            course_data = json.load(file)
+    def GenerateCourse(self, query):
+        """
+        Plans the syllabus and then generates every chapter and question set concurrently.
+        Content and question jobs for all chapters are queued as soon as the syllabus is
+        parsed, so total latency approaches that of the slowest single LLM call.
 
-        course_data["chapters"] = chapter_content
+        Args:
+            query (str): The client's course requirement.
 
-        with open("course.json", "w") as file:
-            json.dump(course_data, file, indent=4)
+        Returns:
+            dict: {"course_id": ..., "syllabus": ..., "chapters": ..., "questions": ...}
+        """
+        course_data = {"syllabus": {}, "chapters": {}, "questions": {}}
+        for event in self.IterCourse(query):
+            if event["event"] == "syllabus":
+                course_id = event["course_id"]
+                course_data["syllabus"] = event["syllabus"]
+            elif event["event"] == "chapter":
+                course_data["chapters"][event["chapter"]] = event["content"]
+            elif event["event"] == "questions":
+                course_data["questions"][event["chapter"]] = event["content"]
+
+        return {"course_id": course_id, **self._ordered(course_data)}
+
+    @staticmethod
+    def _ordered(course_data):
+        # Keep syllabus order regardless of completion order
+        syllabus = course_data["syllabus"]
+        return {
+            "syllabus": syllabus,
+            "chapters": {no: course_data["chapters"][no] for no in syllabus if no in course_data["chapters"]},
+            "questions": {no: course_data["questions"][no] for no in syllabus if no in course_data["questions"]},
+        }
+
+    def _iter_chapter_jobs(self, query, chapters, content, questions, cancelled=None):
+        if not chapters:
+            raise ValueError("Chapters have not been created. Run PlanSyllabus() first.")
 
+        futures = {}
+        for chapter_no, chapter_name in chapters.items():
+            if content:
+                future = self.scheduler.submit(self.build_chapter_content, query, chapter_no, chapter_name)
+                futures[future] = ("chapters", chapter_no)
+            if questions:
+                future = self.scheduler.submit(self.generate_questions, query, chapter_no, chapter_name)
+                futures[future] = ("questions", chapter_no)
+
+        try:
+            pending = set(futures)
+            while pending:
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=CANCEL_CHECK_SECONDS, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                if cancelled is not None and cancelled.is_set():
+                    return
+                for future in done:
+                    kind, chapter_no = futures[future]
+                    yield kind, chapter_no, future.result()[chapter_no]
+        finally:
+            # Drop queued jobs if the consumer goes away early (e.g. a closed stream)
+            for future in futures:
+                future.cancel()
+
+    def _run_chapter_jobs(self, query, chapters, content, questions):
+        results = {"syllabus": chapters, "chapters": {}, "questions": {}}
+        for kind, chapter_no, text in self._iter_chapter_jobs(query, chapters, content, questions):
+            results[kind][chapter_no] = text
+
+        ordered = self._ordered(results)
+        return ordered["chapters"], ordered["questions"]
+
+    def BuildChapters(self, query, chapters):
+        chapter_content, _ = self._run_chapter_jobs(query, chapters, content=True, questions=False)
         return chapter_content
 
-    def _process_chunk_content(self, chunk, worker_id):
-        chunk_result = {}
-
-        for chapter_no, chapter_name in chunk:
-            print(f"Worker {worker_id} processing content for {chapter_name}...")
-            chunk_result.update(self.build_chapter_content(chapter_no, chapter_name))
-            time.sleep(random.uniform(2, 5))
-
-        return chunk_result
-
-    def build_chapter_content(self, chapter_no, chapter_name):
+    def build_chapter_content(self, query, chapter_no, chapter_name):
         prompt = (
             f"You are an expert educational content developer tasked with creating a detailed and well-structured chapter. "
-            f"The chapter should be written for the course titled '{self.query}', and the specific chapter is '{chapter_name}'. "
+            f"The chapter should be written for the course titled '{query}', and the specific chapter is '{chapter_name}'. "
             "Ensure the following requirements are met when writing the content:" 
             "\n1. The content should start with the chapter title at the top." 
             "\n2. Provide a detailed explanation of the chapter topic in a clear and concise manner." 
@@ -120,70 +226,21 @@ class CourseBuilder:
             "\n\nChapter Content: A detailed explanation of the chapter topic, including all necessary details to cover the topic comprehensively."
         )
 
-        retries = 3
-        backoff_time = 5
-
-        for attempt in range(retries):
-            try:
-                run: RunResponse = self.agent.run(prompt)
-                return {chapter_no: run.content.strip()}
-            except InternalServerError as e:
-                print(f"Attempt {attempt+1} failed for {chapter_name}. Retrying in {backoff_time} seconds...")
-                time.sleep(backoff_time)
-                backoff_time *= 2
-            except Exception as e:
-                print(f"Unexpected error occurred: {e}")
-                break
-
-        return {chapter_no: "Failed to generate content after multiple retries."}
-
-    def GenerateQuestions(self):
-        if not self.chapters:
-            raise ValueError("Chapters have not been created. Run PlanSyllabus() first.")
-
-        chapters_list = list(self.chapters.items())
-        total_chapters = len(chapters_list)
-        workers = 3
-
-        chunk_size = (total_chapters + workers - 1) // workers
-        chunks = [chapters_list[i:i + chunk_size] for i in range(0, total_chapters, chunk_size)]
-
-        questions_content = {}
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-            futures = []
+        try:
+            return {chapter_no: self._run(prompt).strip()}
+        except Exception as e:
+            print(f"Failed to generate content for {chapter_name}: {e}")
 
-            for i, chunk in enumerate(chunks):
-                futures.append(executor.submit(self._process_chunk_questions, chunk, i))
-
-            for future in concurrent.futures.as_completed(futures):
-                result = future.result()
-                questions_content.update(result)
-
-        with open("course.json", "r") as file:
-            course_data = json.load(file)
-
-        course_data["questions"] = questions_content
-
-        with open("course.json", "w") as file:
-            json.dump(course_data, file, indent=4)
+        return {chapter_no: "Failed to generate content: the LLM gateway gave up after its retries."}
 
+    def GenerateQuestions(self, query, chapters):
+        _, questions_content = self._run_chapter_jobs(query, chapters, content=False, questions=True)
         return questions_content
 
-    def _process_chunk_questions(self, chunk, worker_id):
-        chunk_result = {}
-
-        for chapter_no, chapter_name in chunk:
-            print(f"Worker {worker_id} generating questions for {chapter_name}...")
-            chunk_result.update(self.generate_questions(chapter_no, chapter_name))
-            time.sleep(random.uniform(2, 5))
-
-        return chunk_result
-
-    def generate_questions(self, chapter_no, chapter_name):
+    def generate_questions(self, query, chapter_no, chapter_name):
         prompt = (
             f"You are an expert question generator tasked with creating 10 well-structured questions for a chapter. "
-            f"The chapter is titled '{chapter_name}' from the course '{self.query}'. "
+            f"The chapter is titled '{chapter_name}' from the course '{query}'. "
             "The questions should test understanding of the chapter content, covering both fundamental and advanced topics. "
             "Ensure the following guidelines are met:" 
             "\n1. Generate exactly 10 questions." 
@@ -192,40 +249,27 @@ class CourseBuilder:
             f"\n\nThe format should be as follows:\nChapter {chapter_no}:\nQuestion 1\nQuestion 2\n...\nQuestion 10"
         )
 
-        retries = 3
-        backoff_time = 5
-
-        for attempt in range(retries):
-            try:
-                run: RunResponse = self.agent.run(prompt)
-                return {chapter_no: run.content.strip()}
-            except InternalServerError as e:
-                print(f"Attempt {attempt+1} failed for {chapter_name}. Retrying in {backoff_time} seconds...")
-                time.sleep(backoff_time)
-                backoff_time *= 2
-            except Exception as e:
-                print(f"Unexpected error occurred: {e}")
-                break
-
-        return {chapter_no: "Failed to generate questions after multiple retries."}
+        try:
+            return {chapter_no: self._run(prompt).strip()}
+        except Exception as e:
+            print(f"Failed to generate questions for {chapter_name}: {e}")
+
+        return {chapter_no: "Failed to generate questions: the LLM gateway gave up after its retries."}
     
-    def get_scores(self, set: dict, chapter: str) -> Dict[str, int]:
+    def get_scores(self, set: dict, chapter: dict) -> Dict[str, int]:
         """
         Generates scores for each question in a given answer set for a chapter.
         
         Args:
             set (dict): A dictionary containing questions as keys and answers as values.
-            chapter (str): The chapter name or index for reference.
+            chapter (dict): The chapter being evaluated, as returned by CourseStore.get_chapter.
         
         Returns:
             Dict[str, int]: A dictionary mapping each question to its corresponding score.
         """
-        with open("course.json", "r") as file:
-            course_data = json.load(file)
-        
         prompt = (
             "You are an experienced exam evaluator."
-            f" The question paper is based on the chapter: {course_data["chapters"]}."
+            f" The question paper is based on the chapter: {chapter['content']}."
             " You are provided with an answer sheet in JSON format with questions as keys and answers as values."
             f" The answer sheet is: {set}."
             " Your task is to evaluate each answer based on the chapter content and assign a percentage score."
@@ -233,8 +277,7 @@ class CourseBuilder:
             " Provide only the array as output with no extra text."
         )
         
-        run: RunResponse = self.agent.run(prompt)
-        response = run.content.strip()
+        response = self._run(prompt).strip()
         
         match = re.search(r"\[(.*?)\]", response)
         if not match:
@@ -242,28 +285,22 @@ class CourseBuilder:
         
         scores = [int(score.strip()) for score in match.group(1).split(",")]
         
-        question_scores = {f"question{i+1}": scores[i] for i in range(len(scores))}
-        
-        return question_scores
+        return self._validate_scores(scores, len(set))
     
-    def get_eval(self, set: dict, chapter: str) -> str:
+    def get_eval(self, set: dict, chapter: dict) -> str:
         """
         Generates a performance evaluation for the provided answer sheet based on the chapter's content.
 
         Args:
             set (dict): A dictionary with questions as keys and student's answers as values.
-            chapter (str): The chapter name or index for reference.
+            chapter (dict): The chapter being evaluated, as returned by CourseStore.get_chapter.
 
         Returns:
             str: A comprehensive evaluation of the student's performance.
         """
-        
-        with open("course.json", "r") as file:
-            course_data = json.load(file)
-        
         prompt = (
             "You are an experienced and meticulous exam evaluator."
-            f" The question paper evaluates knowledge from the chapter titled: '{course_data["chapters"]}'."
+            f" The question paper evaluates knowledge from the chapter titled '{chapter['title']}':\n{chapter['content']}\n"
             " You are provided with a JSON-format answer sheet where questions are keys and the student's answers are the values."
             f" The answer sheet is as follows: {set}."
             " Based on this answer sheet, your task is to provide an overall evaluation of the student's performance."
@@ -276,12 +313,62 @@ class CourseBuilder:
             " Ensure your response is clear, constructive, and tailored to the content of the chapter."
         )
         
-        run: RunResponse = self.agent.run(prompt)
-        return run.content
+        return self._run(prompt)
+
+    def evaluate(self, set: dict, chapter: dict) -> Tuple[Dict[str, int], str]:
+        """
+        Scores and evaluates an answer sheet with a single LLM call that returns both
+        as JSON. Falls back to running get_scores and get_eval concurrently when the
+        response cannot be parsed or does not score every question.
+
+        Args:
+            set (dict): A dictionary with questions as keys and student's answers as values.
+            chapter (dict): The chapter being evaluated, as returned by CourseStore.get_chapter.
+
+        Returns:
+            Tuple[Dict[str, int], str]: Per-question scores and the written evaluation.
+        """
+        prompt = (
+            "You are an experienced and meticulous exam evaluator."
+            f" The question paper evaluates knowledge from the chapter titled '{chapter['title']}':\n{chapter['content']}\n"
+            " You are provided with a JSON-format answer sheet where questions are keys and the student's answers are the values."
+            f" The answer sheet is as follows: {json.dumps(set)}."
+            " Your task is to:"
+            " 1. Evaluate each answer based on the chapter content and assign a percentage score between 0 and 100."
+            " 2. Write an overall evaluation with the sections 'Overall Summary', 'Weak Areas' and 'Suggestions for Improvement',"
+            " without numerical scores or percentages."
+            f" Respond with only a JSON object of the form {{\"scores\": [80, 90, ...], \"evaluation\": \"...\"}}"
+            f" where scores contains exactly {len(set)} integers in the order the questions appear."
+        )
+
+        try:
+            response = self._run(prompt)
+            match = re.search(r"\{.*\}", response, re.DOTALL)
+            if not match:
+                raise ValueError("The response does not contain a JSON object.")
+            result = json.loads(match.group(0))
+            scores = self._validate_scores(result["scores"], len(set))
+            evaluation = str(result["evaluation"]).strip()
+            if not evaluation:
+                raise ValueError("The response does not contain an evaluation.")
+            return scores, evaluation
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Combined evaluation failed ({e}), falling back to separate calls.")
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            scores = executor.submit(self.get_scores, set, chapter)
+            evaluation = executor.submit(self.get_eval, set, chapter)
+            return scores.result(), evaluation.result()
+
+    @staticmethod
+    def _validate_scores(scores, question_count) -> Dict[str, int]:
+        if not isinstance(scores, list) or len(scores) != question_count:
+            raise ValueError(f"Expected {question_count} scores, got {scores!r}.")
+        scores = [max(0, min(100, int(score))) for score in scores]
+        return {f"question{i+1}": score for i, score in enumerate(scores)}
 
 # Example usage of how it works so that it becomes easier to interate with backen later.
 # if __name__ == "__main__":
-#     vatsal = CourseBuilder("I want a course to help me learn about stock trading.")
-#     syllabus = vatsal.PlanSyllabus()
-#     chapters = vatsal.BuildChapters()
-#     questions = vatsal.GenerateQuestions()
\ No newline at end of file
+#     vatsal = CourseBuilder()
+#     query = "I want a course to help me learn about stock trading."
+#     course = vatsal.GenerateCourse(query)
\ No newline at end of file
@@ -0,0 +1,274 @@
+import os
+import time
+import queue
+import random
+import hashlib
+import threading
+import concurrent.futures
+from phi.agent import Agent, RunResponse
+from phi.model.google import Gemini
+from dotenv import load_dotenv
+from app.concurrency import TokenBucket, SingleFlight
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    google_exceptions = None
+
+load_dotenv()
+
+LLM_MODEL_ID = os.getenv("LLM_MODEL_ID", "gemini-2.0-flash-exp")
+# Provider quota shared by every caller in the process (requests per second, burst size)
+LLM_RATE = float(os.getenv("LLM_RATE", "2"))
+LLM_BURST = int(os.getenv("LLM_BURST", "6"))
+# Requests in flight at once
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Seconds a single attempt may take
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+# Backoff before retry n is a random value up to min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2**n) seconds
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+
+
+class LLMTimeoutError(TimeoutError):
+    pass
+
+
+# Marks the end of a streamed response
+_END = object()
+
+
+def is_retryable(error):
+    """
+    Rate limiting (429), server errors (5xx) and timeouts are worth retrying.
+    """
+    if isinstance(error, LLMTimeoutError):
+        return True
+    if google_exceptions and isinstance(
+        error, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests, google_exceptions.ServerError)
+    ):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return isinstance(code, int) and (code == 429 or 500 <= code < 600)
+
+
+class LLMGateway:
+    """
+    Single entry point for Gemini calls from every module.
+
+    Requests pass a process-wide token bucket and concurrency limit, so callers
+    together stay within the provider quota instead of bursting into 429s. This is
+    the only LLM concurrency limit: a slot is held while a request is actually in
+    flight, including attempts the caller stopped waiting for after a timeout, so
+    retries never push the number of open requests above it.
+    Retryable failures are retried with full-jitter exponential backoff, every
+    attempt has a timeout, and identical prompts already in flight share one
+    request. Hooks registered with add_hook are called as hook(event, info) for
+    the events "request", "success", "retry", "error" and "coalesced".
+    """
+
+    def __init__(self, model_id=LLM_MODEL_ID, api_key=None, rate=LLM_RATE, burst=LLM_BURST,
+                 concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT_SECONDS, retries=LLM_MAX_RETRIES):
+        self.model_id = model_id
+        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        self.timeout = timeout
+        self.retries = retries
+        self.rate_limiter = TokenBucket(rate, burst)
+        self._slots = threading.BoundedSemaphore(concurrency)
+        # Attempts run here so the caller can stop waiting after the timeout
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="llm")
+        self._single_flight = SingleFlight()
+        self._hooks = []
+        self._lock = threading.Lock()
+        self._metrics = {
+            "requests": 0, "successes": 0, "retries": 0, "errors": 0,
+            "timeouts": 0, "coalesced": 0, "latency_seconds": 0.0,
+        }
+        # Requests holding a slot, and those among them nobody waits for any more
+        self._in_flight = 0
+        self._abandoned = 0
+
+    def add_hook(self, hook):
+        self._hooks.append(hook)
+
+    def _emit(self, event, **info):
+        with self._lock:
+            if event == "request":
+                self._metrics["requests"] += 1
+            elif event == "success":
+                self._metrics["successes"] += 1
+                self._metrics["latency_seconds"] += info["seconds"]
+            elif event == "retry":
+                self._metrics["retries"] += 1
+            elif event == "error":
+                self._metrics["errors"] += 1
+            elif event == "coalesced":
+                self._metrics["coalesced"] += 1
+            if isinstance(info.get("error"), LLMTimeoutError):
+                self._metrics["timeouts"] += 1
+        for hook in self._hooks:
+            try:
+                hook(event, info)
+            except Exception as e:
+                print(f"Error in LLM metrics hook: {e}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._metrics)
+            stats["in_flight"] = self._in_flight
+            stats["abandoned_in_flight"] = self._abandoned
+        stats["average_latency_seconds"] = (
+            round(stats["latency_seconds"] / stats["successes"], 3) if stats["successes"] else None
+        )
+        return stats
+
+    def _agent(self):
+        # phi Agents record every run in their memory, so each call gets its own
+        return Agent(model=Gemini(id=self.model_id, api_key=self.api_key))
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+    def _submit(self, fn):
+        """
+        Runs fn on the gateway's executor once a slot is free. The slot is only freed
+        when fn really finishes, even if the caller has stopped waiting for it.
+        """
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(fn)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_flight += 1
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            if getattr(future, "abandoned", False):
+                self._abandoned -= 1
+        self._slots.release()
+
+    def _abandon(self, future):
+        # Still counted against the limit until it finishes; cancelled outright if it has not started
+        with self._lock:
+            if not future.done():
+                future.abandoned = True
+                self._abandoned += 1
+        future.cancel()
+
+    def _attempt(self, prompt, timeout):
+        self.rate_limiter.acquire()
+        future = self._submit(lambda: self._agent().run(prompt))
+        try:
+            run: RunResponse = future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            self._abandon(future)
+            raise LLMTimeoutError(f"LLM request timed out after {timeout} seconds")
+        return run.content
+
+    def _run(self, prompt, timeout):
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            self._emit("request", attempt=attempt)
+            try:
+                content = self._attempt(prompt, timeout)
+            except Exception as e:
+                if attempt >= self.retries or not is_retryable(e):
+                    self._emit("error", error=e, attempt=attempt)
+                    raise
+                delay = self._backoff(attempt)
+                self._emit("retry", error=e, attempt=attempt, delay=delay)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._emit("success", attempt=attempt, seconds=time.monotonic() - started)
+            return content
+
+    def run(self, prompt, timeout=None):
+        """
+        Runs a prompt and returns the response text.
+        :param prompt: Prompt text
+        :param timeout: Seconds allowed per attempt, LLM_TIMEOUT_SECONDS by default
+        :return: Response content
+        """
+        key = (self.model_id, hashlib.sha256(prompt.encode()).hexdigest())
+        leader = []
+
+        def call():
+            leader.append(True)
+            return self._run(prompt, timeout or self.timeout)
+
+        result = self._single_flight.do(key, call)
+        if not leader:
+            self._emit("coalesced")
+        return result
+
+    def _open_stream(self, prompt, stop):
+        # The response is read into a queue on the executor, so the slot is held for
+        # as long as the request runs, not for as long as the consumer takes
+        chunks = queue.Queue()
+
+        def produce():
+            try:
+                for run in self._agent().run(prompt, stream=True):
+                    if stop.is_set():
+                        break
+                    if run.content:
+                        chunks.put(run.content)
+                chunks.put(_END)
+            except Exception as e:
+                chunks.put(e)
+
+        return self._submit(produce), chunks
+
+    def stream(self, prompt, timeout=None):
+        """
+        Runs a prompt and yields the response text in chunks as it is generated.
+        Failures are retried only until the first chunk has been yielded.
+        :param timeout: Seconds allowed between chunks, LLM_TIMEOUT_SECONDS by default
+        """
+        timeout = timeout or self.timeout
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            self._emit("request", attempt=attempt)
+            started = time.monotonic()
+            yielded = False
+            stop = threading.Event()
+            future, chunks = self._open_stream(prompt, stop)
+            try:
+                while True:
+                    try:
+                        chunk = chunks.get(timeout=timeout)
+                    except queue.Empty:
+                        raise LLMTimeoutError(f"LLM stream produced nothing for {timeout} seconds")
+                    if chunk is _END:
+                        break
+                    if isinstance(chunk, Exception):
+                        raise chunk
+                    yielded = True
+                    yield chunk
+            except Exception as e:
+                if yielded or attempt >= self.retries or not is_retryable(e):
+                    self._emit("error", error=e, attempt=attempt)
+                    raise
+                delay = self._backoff(attempt)
+                self._emit("retry", error=e, attempt=attempt, delay=delay)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            finally:
+                # Stops reading if the consumer went away or the attempt failed
+                if not future.done():
+                    stop.set()
+                    self._abandon(future)
+            self._emit("success", attempt=attempt, seconds=time.monotonic() - started)
+            return
+
+llm_gateway = LLMGateway()
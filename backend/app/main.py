@@ -1,8 +1,25 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from .api.learn_routes.routes import router as learn_router
-from .api.news_routes.routes import router as news_router
+from .api.news_routes.routes import router as news_router, price_hub
+from .concurrency import shutdown_executor
+from .news_recommendation_module.news_ingest import news_ingestor
+from .redis_db.redis import redis_client
 from fastapi.middleware.cors import CORSMiddleware
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # News is refreshed in the background so startup never waits on yfinance
+    news_task = asyncio.create_task(news_ingestor.run())
+    price_task = asyncio.create_task(price_hub.run())
+    yield
+    news_task.cancel()
+    price_task.cancel()
+    await redis_client.aclose()
+    shutdown_executor()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -0,0 +1,248 @@
+import os
+import datetime
+import numpy as np
+import pandas as pd
+
+# Daily bars per year, used to annualize volatility
+TRADING_DAYS = 252
+# History window used for volatility, drawdown and returns
+ANALYTICS_HISTORY_PERIOD = os.getenv("ANALYTICS_HISTORY_PERIOD", "1y")
+
+ASSET_CLASSES = ("Stocks", "Mutual_funds", "Fixed_deposits", "Crypto")
+
+
+def _round(value, digits=2):
+    if value is None or not np.isfinite(value):
+        return None
+    return round(float(value), digits)
+
+
+def _holding_label(asset_class, holding):
+    if asset_class == "Fixed_deposits":
+        return holding.get("bank_name", "Fixed deposit")
+    return holding.get("name", asset_class)
+
+
+def _fixed_deposit_value(holding, today=None):
+    """
+    Accrued value of a fixed deposit. From its start_date the deposit compounds at the
+    rate implied by its maturity value (or at interest_rate), reaching the maturity
+    value at the end of the tenure. Without a start date the stored current_value is used.
+    :return: (current value, whether it was accrued or stored rather than assumed)
+    """
+    invested = float(holding.get("investment_amount", 0))
+    if not holding.get("start_date"):
+        return float(holding.get("current_value", invested)), "current_value" in holding
+    try:
+        start = datetime.date.fromisoformat(str(holding["start_date"])[:10])
+    except ValueError:
+        return invested, False
+
+    years = max(0.0, ((today or datetime.date.today()) - start).days / 365.25)
+    tenure = float(holding.get("tenure_years") or 0)
+    if tenure:
+        years = min(years, tenure)
+    maturity = float(holding.get("maturity_value") or 0)
+    if maturity and tenure and invested > 0:
+        growth = (maturity / invested) ** (years / tenure)
+    else:
+        growth = (1 + float(holding.get("interest_rate", 0)) / 100) ** years
+    return invested * growth, True
+
+
+def _holdings_frame(portfolio, prices, today=None):
+    """
+    Builds one row per holding with its invested and current value.
+    Stocks are valued at the market price when one is known and fixed deposits at
+    their accrued value; everything else (and unpriced stocks) falls back to the
+    stored values.
+    """
+    rows = []
+    for asset_class in ASSET_CLASSES:
+        for holding in portfolio.get(asset_class) or []:
+            if asset_class in ("Stocks", "Crypto"):
+                quantity = float(holding.get("quantity", 0))
+                invested = quantity * float(holding.get("price_bought_at", 0))
+                price = prices.get(id(holding), holding.get("current_price"))
+                current = quantity * float(price) if price is not None else invested
+                priced = price is not None
+            elif asset_class == "Mutual_funds":
+                invested = float(holding.get("investment_amount", 0))
+                current = float(holding.get("current_value", invested))
+                priced = "current_value" in holding
+            else:
+                invested = float(holding.get("investment_amount", 0))
+                current, priced = _fixed_deposit_value(holding, today)
+            rows.append({
+                "asset_class": asset_class,
+                "name": _holding_label(asset_class, holding),
+                "invested": invested,
+                "current": current,
+                "priced": priced,
+            })
+    return pd.DataFrame(rows, columns=["asset_class", "name", "invested", "current", "priced"])
+
+
+def _closes_frame(histories):
+    """
+    Aligns columnar histories ({"dates": [...], "close": [...]}) on their dates.
+    :param histories: Dictionary mapping ticker to columnar history
+    :return: DataFrame of closing prices, one column per ticker
+    """
+    series = {
+        ticker: pd.Series(history["close"], index=history["dates"], dtype=float)
+        for ticker, history in histories.items()
+        if history and history.get("dates")
+    }
+    if not series:
+        return pd.DataFrame()
+    return pd.DataFrame(series).sort_index().ffill()
+
+
+def _risk(values):
+    """
+    Annualized volatility, maximum drawdown and total return of a value series.
+    """
+    values = values[np.isfinite(values) & (values > 0)]
+    if len(values) < 2:
+        return {"volatility_pct": None, "max_drawdown_pct": None, "return_pct": None}
+    returns = np.diff(values) / values[:-1]
+    drawdowns = values / np.maximum.accumulate(values) - 1
+    return {
+        "volatility_pct": _round(returns.std(ddof=1) * np.sqrt(TRADING_DAYS) * 100) if len(returns) > 1 else None,
+        "max_drawdown_pct": _round(drawdowns.min() * 100),
+        "return_pct": _round((values[-1] / values[0] - 1) * 100),
+    }
+
+
+def _sleeve_index(closes, quantities):
+    """
+    Value index of a basket holding fixed quantities. Each day's return only uses the
+    tickers priced on both days, so a ticker with a shorter history neither cuts the
+    window for the others nor shows up as a jump when its prices start.
+    """
+    values = closes.to_numpy(dtype=float) * quantities
+    previous, latest = values[:-1], values[1:]
+    both = np.isfinite(previous) & np.isfinite(latest)
+    base = np.where(both, previous, 0.0).sum(axis=1)
+    change = np.where(both, latest - previous, 0.0).sum(axis=1)
+    returns = change[base > 0] / base[base > 0]
+    return np.concatenate([[1.0], np.cumprod(1 + returns)])
+
+
+def analyze_portfolio(portfolio, resolved, market_data, today=None):
+    """
+    Computes deterministic portfolio analytics.
+    :param portfolio: Portfolio in the PortfolioRequest shape
+    :param resolved: List of (stock holding, ticker) pairs
+    :param market_data: Dictionary mapping ticker to {"current_price": ..., "history": columnar history}
+    :param today: Date fixed deposits are accrued to, today by default
+    :return: Dictionary with totals, allocation, concentration and risk metrics
+    """
+    prices = {
+        id(stock): market_data[ticker]["current_price"]
+        for stock, ticker in resolved
+        if market_data.get(ticker, {}).get("current_price") is not None
+    }
+    holdings = _holdings_frame(portfolio, prices, today)
+
+    invested = holdings["invested"].to_numpy(dtype=float)
+    current = holdings["current"].to_numpy(dtype=float)
+    total_invested = invested.sum()
+    total_current = current.sum()
+    weights = current / total_current if total_current > 0 else np.zeros_like(current)
+
+    by_class = holdings.groupby("asset_class", sort=False)[["invested", "current"]].sum()
+    by_class["pnl"] = by_class["current"] - by_class["invested"]
+    asset_classes = {
+        asset_class: {
+            "invested": _round(row.invested),
+            "current_value": _round(row.current),
+            "pnl": _round(row.pnl),
+            "pnl_pct": _round(row.pnl / row.invested * 100) if row.invested else None,
+            "allocation_pct": _round(row.current / total_current * 100) if total_current > 0 else None,
+        }
+        for asset_class, row in by_class.iterrows()
+    }
+
+    # Herfindahl-Hirschman index over holding weights: 1/n when evenly spread, 1 for a single holding
+    hhi = float(np.square(weights).sum()) if len(weights) else None
+    largest = int(np.argmax(weights)) if len(weights) else None
+
+    # Stock sleeve: value the current quantities over the aligned price history
+    closes = _closes_frame({ticker: market_data.get(ticker, {}).get("history") for _, ticker in resolved})
+    quantities = {}
+    for stock, ticker in resolved:
+        quantities[ticker] = quantities.get(ticker, 0.0) + float(stock.get("quantity", 0))
+    stocks = {}
+    sleeve_risk = _risk(np.array([]))
+    if not closes.empty:
+        for ticker in closes.columns:
+            stocks[ticker] = _risk(closes[ticker].to_numpy())
+        quantity_vector = np.array([quantities[ticker] for ticker in closes.columns])
+        sleeve_risk = _risk(_sleeve_index(closes, quantity_vector))
+
+    return {
+        "total_invested": _round(total_invested),
+        "total_current_value": _round(total_current),
+        "total_pnl": _round(total_current - total_invested),
+        "total_return_pct": _round((total_current / total_invested - 1) * 100) if total_invested else None,
+        "asset_classes": asset_classes,
+        "holdings": [
+            {
+                "asset_class": row.asset_class,
+                "name": row.name,
+                "current_value": _round(row.current),
+                "pnl": _round(row.current - row.invested),
+                "weight_pct": _round(weight * 100),
+                "priced": bool(row.priced),
+            }
+            for row, weight in zip(holdings.itertuples(index=False), weights)
+        ],
+        "concentration": {
+            "hhi": _round(hhi, 4),
+            "effective_holdings": _round(1 / hhi) if hhi else None,
+            "largest_holding": holdings["name"].iloc[largest] if largest is not None else None,
+            "largest_weight_pct": _round(weights[largest] * 100) if largest is not None else None,
+        },
+        "stocks": {
+            "history_period": ANALYTICS_HISTORY_PERIOD,
+            **sleeve_risk,
+            "by_ticker": stocks,
+        },
+    }
+
+
+def analytics_facts(analytics):
+    """
+    Renders analytics as short fact lines for an LLM prompt.
+    """
+    facts = [
+        f"Total invested: {analytics['total_invested']}, current value: {analytics['total_current_value']}, "
+        f"P&L: {analytics['total_pnl']} ({analytics['total_return_pct']}%)",
+    ]
+    for asset_class, values in analytics["asset_classes"].items():
+        facts.append(
+            f"{asset_class}: {values['allocation_pct']}% of portfolio, value {values['current_value']}, "
+            f"P&L {values['pnl']} ({values['pnl_pct']}%)"
+        )
+    facts.append("Holdings: " + "; ".join(
+        f"{holding['name']} ({holding['asset_class']}) {holding['weight_pct']}%, P&L {holding['pnl']}"
+        for holding in analytics["holdings"]
+    ))
+    concentration = analytics["concentration"]
+    facts.append(
+        f"Concentration: HHI {concentration['hhi']}, effective holdings {concentration['effective_holdings']}, "
+        f"largest holding {concentration['largest_holding']} at {concentration['largest_weight_pct']}%"
+    )
+    stocks = analytics["stocks"]
+    facts.append(
+        f"Stocks over {stocks['history_period']}: return {stocks['return_pct']}%, "
+        f"annualized volatility {stocks['volatility_pct']}%, max drawdown {stocks['max_drawdown_pct']}%"
+    )
+    for ticker, risk in stocks["by_ticker"].items():
+        facts.append(
+            f"{ticker}: return {risk['return_pct']}%, volatility {risk['volatility_pct']}%, "
+            f"max drawdown {risk['max_drawdown_pct']}%"
+        )
+    return "\n".join(facts)
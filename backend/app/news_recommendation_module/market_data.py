@@ -0,0 +1,162 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from app.concurrency import SingleFlight
+
+QUOTE_TTL_SECONDS = float(os.getenv("QUOTE_TTL_SECONDS", "30"))
+# Intraday bars keep changing during the session, so they expire quickly
+INTRADAY_TTL_SECONDS = float(os.getenv("INTRADAY_TTL_SECONDS", "60"))
+MARKET_CACHE_MAX_ENTRIES = int(os.getenv("MARKET_CACHE_MAX_ENTRIES", "2048"))
+
+# Daily bars only change once the exchange closes (NSE: 15:30 IST, Mon-Fri)
+MARKET_TIMEZONE = ZoneInfo("Asia/Kolkata")
+MARKET_CLOSE_HOUR = 15
+MARKET_CLOSE_MINUTE = 30
+
+
+# Periods and intervals accepted by yfinance's history()
+VALID_PERIODS = {"1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "ytd", "max"}
+VALID_INTERVALS = {"1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h", "1d", "5d", "1wk", "1mo", "3mo"}
+
+HISTORY_COLUMNS = ("Open", "Close", "High", "Low")
+
+
+def is_intraday(interval):
+    return interval.endswith("m") or interval.endswith("h")
+
+
+def history_to_columns(data, interval="1d"):
+    """
+    Converts a yfinance history DataFrame into column arrays without iterating rows.
+    :param data: DataFrame indexed by timestamp with Open/Close/High/Low columns
+    :param interval: Bar interval, intraday bars keep their time of day
+    :return: {"dates": [...], "open": [...], "close": [...], "high": [...], "low": [...]}
+    """
+    date_format = "%Y-%m-%d %H:%M" if is_intraday(interval) else "%Y-%m-%d"
+    columns = {"dates": data.index.strftime(date_format).tolist()}
+    for column in HISTORY_COLUMNS:
+        columns[column.lower()] = data[column].to_numpy(dtype=float).tolist()
+    return columns
+
+
+def columns_to_rows(columns):
+    """
+    Converts column arrays into the {date: {"Open", "Close", "High", "Low"}} row format.
+    """
+    values = zip(*(columns[column.lower()] for column in HISTORY_COLUMNS))
+    return {date: dict(zip(HISTORY_COLUMNS, row)) for date, row in zip(columns["dates"], values)}
+
+
+def next_market_close(now=None):
+    """
+    Returns the UNIX timestamp of the next market close after now.
+    :param now: Optional timezone-aware datetime, defaults to the current time
+    :return: Timestamp of the next close (weekends skipped)
+    """
+    now = (now or datetime.now(MARKET_TIMEZONE)).astimezone(MARKET_TIMEZONE)
+    close = now.replace(hour=MARKET_CLOSE_HOUR, minute=MARKET_CLOSE_MINUTE, second=0, microsecond=0)
+    if close <= now:
+        close += timedelta(days=1)
+    while close.weekday() >= 5:
+        close += timedelta(days=1)
+    return close.timestamp()
+
+
+class MarketDataCache:
+    """
+    Process-wide LRU cache for quotes and price histories.
+    Quotes expire after a few seconds, histories at the next market close.
+    Concurrent misses for the same key trigger a single upstream fetch.
+    """
+
+    def __init__(self, max_entries=MARKET_CACHE_MAX_ENTRIES, quote_ttl=QUOTE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.quote_ttl = quote_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def _store(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_fetch(self, key, fetch, expires_at):
+        """
+        Returns the cached value for key or fetches and caches it.
+        :param key: Cache key
+        :param fetch: Zero-argument callable producing the value on a miss
+        :param expires_at: Callable returning the expiry timestamp for a fresh value
+        :return: Cached or freshly fetched value
+        """
+        found, value = self._lookup(key)
+        if found:
+            return value
+
+        def load():
+            # Another caller may have filled the entry while we waited for the flight
+            found, value = self._lookup(key)
+            if found:
+                return value
+            with self._lock:
+                self.misses += 1
+            value = fetch()
+            self._store(key, value, expires_at())
+            return value
+
+        return self._flight.do(key, load)
+
+    def get_quote(self, ticker, fetch):
+        return self.get_or_fetch(("quote", ticker.upper()), fetch, lambda: time.time() + self.quote_ttl)
+
+    def get_history(self, ticker, period, fetch, interval="1d"):
+        if is_intraday(interval):
+            expires_at = lambda: time.time() + INTRADAY_TTL_SECONDS
+        else:
+            expires_at = next_market_close
+        return self.get_or_fetch(("history", ticker.upper(), period, interval), fetch, expires_at)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns hit/miss counters and the current size of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Shared by every request handled by this process
+market_cache = MarketDataCache()
@@ -1,21 +1,34 @@
 import yfinance as yf
 import json
-from phi.agent import Agent, RunResponse
-from phi.model.google import Gemini
 import os
 from dotenv import load_dotenv
-import pandas as pd
-from fuzzywuzzy import process  # Import fuzzywuzzy's process module
+import concurrent.futures
+from .market_data import market_cache, history_to_columns, columns_to_rows
+from .ticker_resolver import TickerResolver
+from .news_store import news_store
+from .relevance import NewsIndex
+from app.llm_gateway import llm_gateway
+from .analytics import analyze_portfolio, analytics_facts, ANALYTICS_HISTORY_PERIOD
 
 # Load environment variables
 load_dotenv()
 
+# Upper bound on concurrent yfinance requests made while refreshing a portfolio
+MARKET_DATA_WORKERS = int(os.getenv("MARKET_DATA_WORKERS", "8"))
+
+# Optional JSON guide or NSE/BSE CSV listing with additional instruments
+TICKER_GUIDE_PATH = os.getenv("TICKER_GUIDE_PATH")
+
+# Latest transactions sent with the portfolio facts when asking for recommendations
+RECENT_TRANSACTIONS_IN_PROMPT = int(os.getenv("RECENT_TRANSACTIONS_IN_PROMPT", "10"))
+
 class NewsReporter:
+    """
+    News summaries, recommendations and price updates for portfolios.
+    Portfolios are passed to each method, so one instance can serve concurrent requests.
+    """
+
     def __init__(self):
-        self.news_data = {}
-        self.agent = Agent(
-            model=Gemini(id="gemini-2.0-flash-exp", api_key=os.getenv("GEMINI_API_KEY"))
-        )
         self.guide = {
             "Stocks": [
                 {"name": "Reliance Industries", "ticker": "RELIANCE.NS"},
@@ -41,56 +54,56 @@ class NewsReporter:
                 {"name": "Sun Pharma", "ticker": "SUNPHARMA.NS"}
             ]
         }
+        self.resolver = TickerResolver.from_guide(self.guide)
+        if TICKER_GUIDE_PATH:
+            self.resolver.load_file(TICKER_GUIDE_PATH)
+        # (news corpus version, NewsIndex), rebuilt when the corpus changes
+        self._news_index = (None, None)
+
+    def _run(self, prompt):
+        # Rate limited, retried and de-duplicated by the shared gateway
+        return llm_gateway.run(prompt)
 
-    def set_portfolio(self, portfolio):
+    def news_index(self):
         """
-        Set the portfolio data for the user.
-        :param portfolio: Portfolio data as a dictionary
+        Returns the relevance index for the current news corpus.
         """
-        self.portfolio = portfolio
+        version = news_store.version()
+        cached_version, index = self._news_index
+        if index is None or cached_version != version:
+            news, timestamps = news_store.get_timestamped_news()
+            index = NewsIndex(news, self.resolver, timestamps)
+            self._news_index = (version, index)
+        return index
 
-    def fetch_news(self, indexes):
+    def relevant_news(self, portfolio=None):
         """
-        Fetches the latest news for a list of stock indexes.
-        :param indexes: List of ticker symbols for stock indexes
-        :return: News data as a JSON object
+        Selects the news relevant to a portfolio's holdings under the prompt token budget.
+        :param portfolio: Portfolio data as a dictionary, or None for the overall top news
+        :return: {"Companies": [...], "Market": [...]}
         """
-        for ticker_symbol in indexes:
-            try:
-                ticker = yf.Ticker(ticker_symbol)
-                news = ticker.news or []
-
-                index_news = []
-                for article in news:
-                    try:
-                        index_news.append({
-                            "Title": article["content"]["title"],
-                            "Summary": article["content"]["summary"],
-                            "Link": article["content"]["clickThroughUrl"]["url"]
-                        })
-                    except KeyError:
-                        continue
-
-                if not index_news:
-                    index_news.append({
-                        "Title": "No news found",
-                        "Summary": "",
-                        "Link": ""
-                    })
+        tickers = set()
+        for stock in (portfolio or {}).get("Stocks", []):
+            ticker = self.resolver.resolve(stock.get("name", ""))
+            if ticker:
+                tickers.add(ticker)
+        return self.news_index().select(tickers)
 
-                self.news_data[ticker_symbol.upper()] = index_news
-            except Exception as e:
-                print(f"Error fetching news for {ticker_symbol.upper()}: {e}")
-
-    def generate_recommendations(self):
+    def generate_recommendations(self, portfolio):
         """
         Generates AI-driven recommendations based on the portfolio and news data.
+        :param portfolio: Portfolio data as a dictionary
         :return: AI-generated response as a string.
         """
+        profile = {"age": portfolio.get("age"), **(portfolio.get("Investment_profile") or {})}
+        transactions = (portfolio.get("Recent_transactions") or [])[-RECENT_TRANSACTIONS_IN_PROMPT:]
         prompt = (
             f"Analyze the following:\n\n"
-            f"News data:\n{json.dumps(self.news_data, indent=2)}\n\n"
-            f"Portfolio details:\n{json.dumps(self.portfolio, indent=2)}\n\n"
+            f"News data:\n{json.dumps(self.relevant_news(portfolio))}\n\n"
+            f"Investment profile:\n{json.dumps(profile)}\n\n"
+            f"Recent transactions:\n{json.dumps(transactions)}\n\n"
+            f"Portfolio facts (computed from market data, use these numbers as given):\n"
+            f"{analytics_facts(self.portfolio_analytics(portfolio))}\n\n"
             f"Considering the user's portfolio allocation and goals, how might the latest news impact their holdings? "
             f"Provide actionable insights and suggest potential strategies the user could adopt."
             "The structured news should be in the following format: \n"
@@ -98,13 +111,12 @@ class NewsReporter:
             "ESG Oppurtunities: <Environmental, Social, and Governance._opportunities>\n"
             "Market Trends: <market_trends>\n"
             "Performance Analysis: <performance_analysis>\n"
-            "The portfolio optimisation should contain the current risk score and diversification score."
+            "The portfolio optimisation should discuss risk and diversification using the volatility, drawdown and concentration facts."
             "The ESG oppurtunities should contain the current ESG score and the oppurtunities for improvement."
             "The market trends should contain the current market trends and the oppurtunities for improvement."
-            "The performance analysis should contain the current return rate, current performance analysis and the oppurtunities for improvement."
+            "The performance analysis should contain the current return rate from the facts, current performance analysis and the oppurtunities for improvement."
         )
-        run: RunResponse = self.agent.run(prompt)
-        return run.content
+        return self._run(prompt)
     
     def get_news(self):
         """
@@ -112,7 +124,7 @@ class NewsReporter:
         :return: AI-generated news summary as a string.
         """
         prompt = (
-            f"The following is the latest news: {json.dumps(self.news_data, indent=2)}. Your task is to summarize the top 6 news items overall. "
+            f"The following is the latest news: {json.dumps(self.relevant_news())}. Your task is to summarize the top 6 news items overall. "
             "Follow these instructions carefully:\n\n"
             
             "1. *Summary Style*:\n"
@@ -141,70 +153,146 @@ class NewsReporter:
             "Carefully review the provided data and ensure your structured summary adheres to these guidelines."
         )
 
-        run: RunResponse = self.agent.run(prompt)
-        return run.content
+        return self._run(prompt)
     
     def get_price(self, ticker_symbol):
         """
         Fetches the current price of a stock using its ticker symbol.
+        Served from the shared market data cache for a few seconds.
         :param ticker_symbol: Stock's ticker symbol
         :return: Current stock price
         """
+        return market_cache.get_quote(ticker_symbol, lambda: self._fetch_price(ticker_symbol))
+
+    def _fetch_price(self, ticker_symbol):
         stock = yf.Ticker(ticker_symbol)
         current_price_info = stock.info.get("currentPrice")
         return current_price_info
     
-    def get_stock_history(self, ticker_symbol):
+    def get_stock_history(self, ticker_symbol, period="1mo", interval="1d", columnar=False):
         """
-        Fetches the historical stock data for the past 1 month.
+        Fetches the historical stock data for the given period and interval.
+        Served from the shared market data cache until the next market close
+        (about a minute for intraday intervals).
         :param ticker_symbol: Stock's ticker symbol
-        :return: Historical data in plain string format without escape characters
+        :param period: yfinance period string, e.g. "1mo", "1y"
+        :param interval: yfinance interval string, e.g. "1d", "5m"
+        :param columnar: Return {"dates": [...], "open": [...], ...} instead of one dict per date
+        :return: Historical Open/Close/High/Low data
         """
+        columns = market_cache.get_history(
+            ticker_symbol,
+            period,
+            lambda: self._fetch_stock_history(ticker_symbol, period, interval),
+            interval=interval,
+        )
+        return columns if columnar else columns_to_rows(columns)
+
+    def _fetch_stock_history(self, ticker_symbol, period, interval):
         stock = yf.Ticker(ticker_symbol)
-        data = stock.history(period="1mo")
-        
-        # Create a dictionary to store the history data
-        history_data = {}
-
-        # Iterate through each row to extract Date and corresponding Open, Close, High, Low
-        for index, row in data.iterrows():
-            history_data[str(index.date())] = {
-                "Open": row["Open"],
-                "Close": row["Close"],
-                "High": row["High"],
-                "Low": row["Low"]
-            }
-
-        # Convert dictionary to JSON string without indentation or newlines
-        # json_data = json.dumps(history_data)
-        
-        # Return the plain string without escape characters (already no escape characters)
-        return history_data
+        data = stock.history(period=period, interval=interval)
+        return history_to_columns(data, interval)
 
+    def fetch_market_data(self, tickers, period="1mo", interval="1d", columnar=False, history=True):
+        """
+        Fetches the current price and history (1 month of daily bars by default) for
+        several tickers at once. Requests are fanned out over a bounded thread pool so
+        the total time grows with the slowest request rather than with the number of tickers.
+        :param tickers: Iterable of ticker symbols
+        :param period: History period, see get_stock_history
+        :param interval: History interval, see get_stock_history
+        :param columnar: Return histories in the columnar format
+        :param history: Set to False to only fetch current prices
+        :return: Dictionary mapping each ticker to {"current_price": ..., "history": ...}
+        """
+        tickers = list(dict.fromkeys(tickers))
+        market_data = {ticker: {"current_price": None, "history": {}} for ticker in tickers}
+        if not tickers:
+            return market_data
+
+        workers = min(MARKET_DATA_WORKERS, (2 if history else 1) * len(tickers))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for ticker in tickers:
+                futures[executor.submit(self.get_price, ticker)] = (ticker, "current_price")
+                if not history:
+                    continue
+                future = executor.submit(self.get_stock_history, ticker, period, interval, columnar)
+                futures[future] = (ticker, "history")
+
+            for future in concurrent.futures.as_completed(futures):
+                ticker, field = futures[future]
+                try:
+                    market_data[ticker][field] = future.result()
+                except Exception as e:
+                    print(f"Error fetching {field} for {ticker}: {e}")
 
-    def update_portfolio_prices(self):
+        return market_data
+
+    def fetch_prices(self, tickers):
         """
-        Updates the portfolio with the current price and stock history.
-        Iterates through the portfolio and fetches data from the guide.
-        :return: Updated portfolio with current prices and stock history
+        Fetches only the current price of several tickers at once.
+        :return: Dictionary mapping each ticker to its price (None when unavailable)
+        """
+        market_data = self.fetch_market_data(tickers, history=False)
+        return {ticker: data["current_price"] for ticker, data in market_data.items()}
+
+    def portfolio_tickers(self, portfolio):
+        """
+        :return: Dictionary mapping each resolvable stock name in the portfolio to its ticker
+        """
+        return {stock["name"]: ticker for stock, ticker in self._resolve_stocks(portfolio)}
+
+    def _resolve_stocks(self, portfolio):
         """
-        for stock in self.portfolio["Stocks"]:
+        :return: List of (stock holding, ticker) pairs for the holdings that could be resolved
+        """
+        resolved = []
+
+        for stock in portfolio.get("Stocks") or []:
             stock_name = stock["name"]
             
-            # Use fuzzy matching to find the best matching ticker
-            match = process.extractOne(stock_name, [item["name"] for item in self.guide["Stocks"]])
+            # Exact name/symbol lookup with a memoized fuzzy fallback
+            ticker = self.resolver.resolve(stock_name)
             
-            if match and match[1] >= 80:  # Only accept matches with a high similarity score
-                # Get the corresponding ticker from the guide
-                ticker = next(item["ticker"] for item in self.guide["Stocks"] if item["name"] == match[0])
-                
-                # Fetch current price and stock history
-                current_price = self.get_price(ticker)
-                stock["current_price"] = current_price
-                
-                history = self.get_stock_history(ticker)
-                stock["history"] = history
+            if ticker:
+                resolved.append((stock, ticker))
             else:
                 print(f"Unable to find a close match for {stock_name}.")
+
+        return resolved
+
+    def portfolio_analytics(self, portfolio):
+        """
+        Computes valuation, P&L, allocation, concentration and risk metrics for the portfolio
+        from cached prices and daily histories.
+        :param portfolio: Portfolio data as a dictionary
+        :return: Analytics dictionary, see analytics.analyze_portfolio
+        """
+        resolved = self._resolve_stocks(portfolio)
+        market_data = self.fetch_market_data(
+            (ticker for _, ticker in resolved), period=ANALYTICS_HISTORY_PERIOD, columnar=True
+        )
+        return analyze_portfolio(portfolio, resolved, market_data)
+
+    def update_portfolio_prices(self, portfolio, period="1mo", interval="1d", columnar=False):
+        """
+        Updates the portfolio with the current price and stock history.
+        Resolves every holding to a ticker first, then fetches market data for all
+        distinct tickers in one batch.
+        :param portfolio: Portfolio data as a dictionary, updated in place
+        :param period: History period, see get_stock_history
+        :param interval: History interval, see get_stock_history
+        :param columnar: Attach histories in the columnar format
+        :return: Updated portfolio with current prices and stock history
+        """
+        resolved = self._resolve_stocks(portfolio)
+        market_data = self.fetch_market_data(
+            (ticker for _, ticker in resolved), period=period, interval=interval, columnar=columnar
+        )
+
+        for stock, ticker in resolved:
+            stock["current_price"] = market_data[ticker]["current_price"]
+            stock["history"] = market_data[ticker]["history"]
         
-        return self.portfolio
\ No newline at end of file
+        return portfolio
@@ -0,0 +1,89 @@
+import os
+import asyncio
+import concurrent.futures
+import yfinance as yf
+from app.concurrency import run_blocking
+from app.redis_db.redis import redis_client
+from .news_store import news_store
+
+NEWS_TICKERS = [ticker.strip() for ticker in os.getenv("NEWS_TICKERS", "^BSESN,TCS.NS").split(",") if ticker.strip()]
+NEWS_REFRESH_SECONDS = int(os.getenv("NEWS_REFRESH_SECONDS", "900"))
+NEWS_FETCH_WORKERS = int(os.getenv("NEWS_FETCH_WORKERS", "8"))
+
+_REFRESH_LOCK_KEY = "news:refresh:lock"
+
+
+def fetch_ticker_news(ticker_symbol):
+    """
+    Fetches the latest news for a ticker from yfinance.
+    :param ticker_symbol: Ticker symbol
+    :return: List of {"Title", "Summary", "Link"} dictionaries
+    """
+    ticker = yf.Ticker(ticker_symbol)
+    news = ticker.news or []
+
+    index_news = []
+    for article in news:
+        try:
+            index_news.append({
+                "Title": article["content"]["title"],
+                "Summary": article["content"]["summary"],
+                "Link": article["content"]["clickThroughUrl"]["url"]
+            })
+        except (KeyError, TypeError):
+            continue
+    return index_news
+
+
+class NewsIngestor:
+    """
+    Periodically refreshes the shared news store for a set of tickers.
+    Every process may run the loop; a Redis lock makes sure only one of them
+    fetches per refresh interval.
+    """
+
+    def __init__(self, store, tickers=NEWS_TICKERS, interval=NEWS_REFRESH_SECONDS):
+        self.store = store
+        self.tickers = tickers
+        self.interval = interval
+
+    def refresh(self, tickers=None):
+        """
+        Fetches news for all tickers concurrently and stores the new articles.
+        :param tickers: Optional list of tickers, the configured set by default
+        :return: Number of new articles per ticker
+        """
+        tickers = tickers or self.tickers
+        added = {}
+        workers = max(1, min(NEWS_FETCH_WORKERS, len(tickers)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(fetch_ticker_news, ticker): ticker for ticker in tickers}
+            for future in concurrent.futures.as_completed(futures):
+                ticker = futures[future]
+                try:
+                    added[ticker.upper()] = self.store.add_articles(ticker, future.result())
+                except Exception as e:
+                    print(f"Error fetching news for {ticker.upper()}: {e}")
+        return added
+
+    def _claim_cycle(self):
+        # Expires on its own so the next cycle can be claimed by any worker
+        return redis_client.redis_client.set(_REFRESH_LOCK_KEY, "1", nx=True, ex=max(1, self.interval - 1))
+
+    async def run(self):
+        """
+        Refresh loop meant to run as a background task for the life of the app.
+        """
+        while True:
+            try:
+                if await run_blocking(self._claim_cycle):
+                    added = await run_blocking(self.refresh, dependency="market_data")
+                    print(f"News refresh stored {sum(added.values())} new articles.")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error refreshing news: {e}")
+            await asyncio.sleep(self.interval)
+
+
+news_ingestor = NewsIngestor(news_store)
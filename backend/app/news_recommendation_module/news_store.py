@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import hashlib
+from app.redis_db.redis import redis_client
+
+NEWS_MAX_ARTICLES_PER_TICKER = int(os.getenv("NEWS_MAX_ARTICLES_PER_TICKER", "50"))
+
+_ARTICLES_KEY = "news:articles:{}"
+_INDEX_KEY = "news:index:{}"
+_TICKERS_KEY = "news:tickers"
+_VERSION_KEY = "news:version"
+
+# Stands in for the articles of a ticker nothing has been stored for yet
+NO_NEWS = {"Title": "No news found", "Summary": "", "Link": ""}
+
+
+def article_id(article):
+    """
+    Stable id of an article: a hash of its link, or of its title when there is no link.
+    """
+    source = article.get("Link") or article.get("Title", "")
+    return hashlib.sha1(source.encode()).hexdigest()
+
+
+class NewsStore:
+    """
+    Shared Redis store of news articles per ticker, used by the FastAPI app and the
+    Call service. Articles are de-duplicated by id, kept newest first and trimmed to
+    a fixed number per ticker. A version counter is bumped whenever new articles arrive.
+    """
+
+    def __init__(self, client, async_client, max_articles=NEWS_MAX_ARTICLES_PER_TICKER):
+        self.client = client
+        self.async_client = async_client
+        self.max_articles = max_articles
+
+    def add_articles(self, ticker, articles):
+        """
+        Appends the articles that are not stored yet.
+        :param ticker: Ticker symbol the articles belong to
+        :param articles: List of {"Title", "Summary", "Link"} dictionaries
+        :return: Number of new articles
+        """
+        ticker = ticker.upper()
+        articles_key, index_key = _ARTICLES_KEY.format(ticker), _INDEX_KEY.format(ticker)
+        ids = [article_id(article) for article in articles]
+
+        pipe = self.client.pipeline()
+        for id_, article in zip(ids, articles):
+            pipe.hsetnx(articles_key, id_, json.dumps(article))
+        added = pipe.execute()
+
+        now = time.time()
+        # Articles arrive newest first; keep that order within one batch with steps small
+        # enough that every article of a later batch still ranks newer
+        new = {id_: now - position * 1e-6 for position, (id_, is_new) in enumerate(zip(ids, added)) if is_new}
+        if not new:
+            return 0
+
+        pipe = self.client.pipeline()
+        pipe.zadd(index_key, new)
+        pipe.sadd(_TICKERS_KEY, ticker)
+        pipe.incr(_VERSION_KEY)
+        pipe.zrange(index_key, 0, -(self.max_articles + 1))
+        stale = pipe.execute()[-1]
+
+        if stale:
+            pipe = self.client.pipeline()
+            pipe.zrem(index_key, *stale)
+            pipe.hdel(articles_key, *stale)
+            pipe.execute()
+        return len(new)
+
+    def get_news(self, tickers=None):
+        """
+        Returns stored articles grouped by ticker, newest first.
+        :param tickers: Optional list of tickers, all stored tickers by default
+        :return: {TICKER: [article, ...]}, with [NO_NEWS] for requested tickers without articles
+        """
+        return self.get_timestamped_news(tickers)[0]
+
+    def get_timestamped_news(self, tickers=None):
+        """
+        Like get_news, also returning when each article was stored.
+        :return: ({TICKER: [article, ...]}, {article id: UNIX timestamp})
+        """
+        tickers = sorted(self.client.smembers(_TICKERS_KEY)) if tickers is None else [t.upper() for t in tickers]
+
+        pipe = self.client.pipeline()
+        for ticker in tickers:
+            pipe.zrevrange(_INDEX_KEY.format(ticker), 0, -1, withscores=True)
+        id_lists = pipe.execute()
+
+        timestamps = {}
+        pipe = self.client.pipeline()
+        for ticker, scored_ids in zip(tickers, id_lists):
+            if scored_ids:
+                pipe.hmget(_ARTICLES_KEY.format(ticker), [id_ for id_, _ in scored_ids])
+            for id_, score in scored_ids:
+                timestamps[id_] = max(score, timestamps.get(id_, score))
+        values = iter(pipe.execute())
+
+        news_data = {}
+        for ticker, scored_ids in zip(tickers, id_lists):
+            articles = [json.loads(value) for value in next(values) if value] if scored_ids else []
+            news_data[ticker] = articles or [dict(NO_NEWS)]
+        return news_data, timestamps
+
+    def version(self):
+        """
+        Returns a counter that changes whenever new articles are stored.
+        """
+        return int(self.client.get(_VERSION_KEY) or 0)
+
+    async def aversion(self):
+        return int(await self.async_client.get(_VERSION_KEY) or 0)
+
+
+news_store = NewsStore(redis_client.redis_client, redis_client.async_client)
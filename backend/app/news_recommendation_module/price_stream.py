@@ -0,0 +1,162 @@
+import os
+import time
+import uuid
+import asyncio
+from app.concurrency import run_blocking
+
+# Seconds between polls, matching the quote cache TTL by default
+PRICE_STREAM_SECONDS = float(os.getenv("PRICE_STREAM_SECONDS", os.getenv("QUOTE_TTL_SECONDS", "30")))
+# Updates buffered per subscriber before older ones are dropped
+PRICE_STREAM_QUEUE_SIZE = int(os.getenv("PRICE_STREAM_QUEUE_SIZE", "16"))
+
+# Shared between processes: the poller's lease, the subscribed tickers (scored by the
+# last time a process reported them) and the latest prices
+_POLLER_KEY = "prices:poller"
+_TICKERS_KEY = "prices:tickers"
+_PRICES_KEY = "prices:latest"
+
+
+class PriceHub:
+    """
+    Shares one price poller between all WebSocket subscribers. Each interval the
+    distinct tickers that anyone is subscribed to are fetched once, and only the
+    prices that changed are pushed to the subscribers holding them.
+
+    With a Redis client the poller is shared by the whole deployment: every process
+    reports its subscribed tickers to Redis, the one process holding the poller lease
+    fetches them all and stores the prices there, and every process reads the prices
+    of its own subscribers back. Without a client each process polls for itself.
+    """
+
+    def __init__(self, fetch_prices, client=None, interval=PRICE_STREAM_SECONDS):
+        """
+        :param fetch_prices: Blocking callable taking a list of tickers and returning {ticker: price}
+        :param client: Optional asyncio Redis client (decoding responses) to share the poller through
+        :param interval: Seconds between polls
+        """
+        self.fetch_prices = fetch_prices
+        self.client = client
+        self.interval = interval
+        self._id = uuid.uuid4().hex
+        # ticker -> set of subscriber queues, and queue -> its tickers
+        self._subscribers = {}
+        self._tickers = {}
+        self._prices = {}
+        self._wake = asyncio.Event()
+
+    def subscribe(self, tickers):
+        """
+        Registers a subscriber. The queue receives {ticker: price} dictionaries,
+        starting with the last known prices.
+        :param tickers: Tickers the subscriber holds
+        :return: asyncio.Queue to read updates from
+        """
+        queue = asyncio.Queue(maxsize=PRICE_STREAM_QUEUE_SIZE)
+        tickers = set(tickers)
+        self._tickers[queue] = tickers
+        for ticker in tickers:
+            self._subscribers.setdefault(ticker, set()).add(queue)
+
+        known = {ticker: self._prices[ticker] for ticker in tickers if ticker in self._prices}
+        if known:
+            queue.put_nowait(known)
+        if len(known) < len(tickers):
+            # Fetch the new tickers now instead of waiting for the next interval
+            self._wake.set()
+        return queue
+
+    def unsubscribe(self, queue):
+        for ticker in self._tickers.pop(queue, ()):
+            queues = self._subscribers.get(ticker)
+            if queues is None:
+                continue
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[ticker]
+                self._prices.pop(ticker, None)
+
+    def _publish(self, changed):
+        updates = {}
+        for ticker, price in changed.items():
+            for queue in self._subscribers.get(ticker, ()):
+                updates.setdefault(queue, {})[ticker] = price
+
+        for queue, update in updates.items():
+            if queue.full():
+                # Slow client: drop its oldest update rather than block the poller
+                queue.get_nowait()
+            queue.put_nowait(update)
+
+    async def _hold_lease(self):
+        # The lease outlives a few missed polls, then another process takes over
+        ttl = max(1, int(self.interval * 3))
+        if await self.client.set(_POLLER_KEY, self._id, nx=True, ex=ttl):
+            return True
+        if await self.client.get(_POLLER_KEY) == self._id:
+            await self.client.expire(_POLLER_KEY, ttl)
+            return True
+        return False
+
+    async def _shared_prices(self, tickers):
+        now = time.time()
+        stale = now - self.interval * 3
+        pipe = self.client.pipeline()
+        if tickers:
+            pipe.zadd(_TICKERS_KEY, {ticker: now for ticker in tickers})
+        pipe.zremrangebyscore(_TICKERS_KEY, "-inf", stale)
+        await pipe.execute()
+
+        if await self._hold_lease():
+            wanted = await self.client.zrange(_TICKERS_KEY, 0, -1)
+            if wanted:
+                prices = await run_blocking(self.fetch_prices, wanted, dependency="market_data")
+                prices = {ticker: price for ticker, price in prices.items() if price is not None}
+                if prices:
+                    pipe = self.client.pipeline()
+                    pipe.hset(_PRICES_KEY, mapping=prices)
+                    pipe.expire(_PRICES_KEY, max(1, int(self.interval * 3)))
+                    await pipe.execute()
+
+        if not tickers:
+            return {}
+        values = await self.client.hmget(_PRICES_KEY, tickers)
+        return {ticker: float(value) for ticker, value in zip(tickers, values) if value is not None}
+
+    async def poll(self):
+        tickers = list(self._subscribers)
+        if self.client is None:
+            if not tickers:
+                return
+            prices = await run_blocking(self.fetch_prices, tickers, dependency="market_data")
+        else:
+            try:
+                prices = await self._shared_prices(tickers)
+            except Exception as e:
+                if not tickers:
+                    raise
+                print(f"Error sharing prices through Redis, polling locally: {e}")
+                prices = await run_blocking(self.fetch_prices, tickers, dependency="market_data")
+        changed = {
+            ticker: price
+            for ticker, price in prices.items()
+            if price is not None and ticker in self._subscribers and self._prices.get(ticker) != price
+        }
+        self._prices.update(changed)
+        if changed:
+            self._publish(changed)
+
+    async def run(self):
+        """
+        Polls forever; meant to run as a background task for the app's lifetime in
+        every process. With a Redis client only the lease holder calls fetch_prices.
+        """
+        while True:
+            self._wake.clear()
+            try:
+                await self.poll()
+            except Exception as e:
+                print(f"Error polling prices: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from app.redis_db.redis import redis_client, RECOMMENDATIONS_KEY
+
+# Results younger than this are served without refreshing
+RESULT_FRESH_SECONDS = int(os.getenv("RECOMMENDATION_FRESH_SECONDS", "3600"))
+# Results are dropped from Redis entirely after this long
+RESULT_MAX_AGE_SECONDS = int(os.getenv("RECOMMENDATION_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+
+NEWS_SUMMARY_KEY = "news_summary"
+
+
+def portfolio_hash(portfolio):
+    return hashlib.sha256(json.dumps(portfolio, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Stale-while-revalidate cache of generated LLM results in Redis.
+    Every entry records the identity it was generated for (e.g. a portfolio hash) and
+    the news corpus version it used. An entry whose identity matches but whose news
+    version or age is out of date is served immediately while a background task
+    regenerates it. Concurrent misses for the same key and identity share one
+    generation; a generation still running for an earlier identity is never reused.
+    """
+
+    def __init__(self, client, fresh_seconds=RESULT_FRESH_SECONDS, max_age_seconds=RESULT_MAX_AGE_SECONDS):
+        self.client = client
+        self.fresh_seconds = fresh_seconds
+        self.max_age_seconds = max_age_seconds
+        # (key, identity) -> running generation task
+        self._inflight = {}
+
+    async def get_or_generate(self, key, identity, version, generate):
+        """
+        Returns the cached result for key, generating it when needed.
+        :param key: Redis key of the entry
+        :param identity: Value the entry must have been generated for to be served at all
+        :param version: Current news corpus version; a different version marks the entry stale
+        :param generate: Zero-argument coroutine function producing the result
+        :return: The cached or freshly generated result
+        """
+        entry = await self._read(key)
+        if entry and entry["identity"] == identity:
+            stale = entry["version"] != version or time.time() - entry["created_at"] > self.fresh_seconds
+            if stale:
+                self._refresh(key, identity, version, generate)
+            return entry["result"]
+
+        return await asyncio.shield(self._refresh(key, identity, version, generate))
+
+    async def _read(self, key):
+        try:
+            data = await self.client.get(key)
+            return json.loads(data) if data else None
+        except Exception as e:
+            print(f"Error reading cached result {key}: {e}")
+            return None
+
+    def _refresh(self, key, identity, version, generate):
+        task = self._inflight.get((key, identity))
+        if task is None:
+            task = asyncio.create_task(self._generate(key, identity, version, generate))
+            self._inflight[(key, identity)] = task
+            task.add_done_callback(lambda done: self._finished(key, identity, done))
+        return task
+
+    def _finished(self, key, identity, task):
+        self._inflight.pop((key, identity), None)
+        if not task.cancelled() and task.exception():
+            print(f"Error generating {key}: {task.exception()}")
+
+    async def _generate(self, key, identity, version, generate):
+        result = await generate()
+        entry = {"identity": identity, "version": version, "created_at": time.time(), "result": result}
+        try:
+            await self.client.set(key, json.dumps(entry), ex=self.max_age_seconds)
+        except Exception as e:
+            print(f"Error caching result {key}: {e}")
+        return result
+
+    async def recommendations(self, wallet_address, portfolio, version, generate):
+        return await self.get_or_generate(
+            RECOMMENDATIONS_KEY.format(wallet_address), portfolio_hash(portfolio), version, generate
+        )
+
+    async def news_summary(self, version, generate):
+        # The summary only depends on the news corpus, so every wallet shares it
+        return await self.get_or_generate(NEWS_SUMMARY_KEY, "", version, generate)
+
+
+result_cache = ResultCache(redis_client.async_client)
@@ -0,0 +1,141 @@
+import os
+import re
+import json
+from .ticker_resolver import normalize_name
+from .news_store import article_id
+
+# Upper bound on the size of the news section of a prompt
+NEWS_TOKEN_BUDGET = int(os.getenv("NEWS_TOKEN_BUDGET", "2000"))
+# Articles about holdings and index-level articles included per prompt
+NEWS_TOP_K = int(os.getenv("NEWS_TOP_K", "8"))
+NEWS_INDEX_K = int(os.getenv("NEWS_INDEX_K", "3"))
+
+# Longest company name, in words, looked for in article text
+_MAX_NAME_WORDS = 5
+
+# Upper case words that are candidate symbols: exchange-qualified ("NSE:TCS", "TCS.NS") or bare ("TCS")
+_SYMBOL = re.compile(r"\b(?:(NSE|BSE):\s?)?([A-Z][A-Z&]+)(?:(\.(?:NS|BO))\b|\b)")
+# Bare symbols shorter than this are mostly acronyms ("IT", "AI", "US")
+_MIN_BARE_SYMBOL_CHARS = 3
+# Acronyms common in business news that are also listed symbols
+_NOT_SYMBOLS = {
+    "CEO", "CFO", "COO", "CTO", "MD", "IPO", "FPO", "GDP", "CPI", "GST", "RBI", "SEBI", "NSE", "BSE",
+    "USD", "INR", "EUR", "ETF", "FII", "FIIS", "DII", "DIIS", "EPS", "EBITDA", "PAT", "YOY", "QOQ",
+    "AGM", "EGM", "ESG", "NIFTY", "SENSEX", "IMF", "FED", "USA", "UAE", "PSU", "NBFC", "AUM",
+}
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 1
+
+
+def is_index_ticker(ticker):
+    # Yahoo prefixes market indexes with a caret (^BSESN, ^NSEI)
+    return ticker.startswith("^")
+
+
+class NewsIndex:
+    """
+    Index of the news corpus by ticker. An article is filed under the ticker it was
+    fetched for and under every company from the resolver its title or summary
+    mentions, by name or by symbol. Built once per news corpus version.
+    Articles are ranked by when they were stored, so the order of the tickers in
+    news_data does not decide which articles are selected.
+    """
+
+    def __init__(self, news_data, resolver, timestamps=None):
+        """
+        :param news_data: {TICKER: [article, ...]}
+        :param resolver: TickerResolver of the companies to look for
+        :param timestamps: Optional {article id: UNIX timestamp} from the news store; articles
+                           without one rank after those with one, in news_data order
+        """
+        timestamps = timestamps or {}
+        self.articles = []
+        # Storage time per position, newest articles rank first
+        self.timestamps = []
+        # Positions per ticker and of index-level articles, in insertion order and without repeats
+        self.by_ticker = {}
+        self.index_articles = {}
+        seen = {}
+
+        for source_ticker, articles in news_data.items():
+            for article in articles:
+                key = article.get("Link") or article.get("Title")
+                if key in seen:
+                    position = seen[key]
+                else:
+                    position = seen[key] = len(self.articles)
+                    self.articles.append(article)
+                    self.timestamps.append(timestamps.get(article_id(article), 0.0))
+
+                tickers = self._mentions(article, resolver)
+                if is_index_ticker(source_ticker):
+                    self.index_articles[position] = None
+                else:
+                    tickers.add(source_ticker)
+                for ticker in tickers:
+                    self.by_ticker.setdefault(ticker, {})[position] = None
+
+    @staticmethod
+    def _mentions(article, resolver):
+        text = f"{article.get('Title', '')} {article.get('Summary', '')}"
+        tickers = set()
+
+        for exchange, symbol, suffix in _SYMBOL.findall(text):
+            if not (exchange or suffix) and (len(symbol) < _MIN_BARE_SYMBOL_CHARS or symbol in _NOT_SYMBOLS):
+                continue
+            ticker = resolver.symbol_ticker(symbol + suffix) or resolver.symbol_ticker(symbol)
+            if ticker:
+                tickers.add(ticker)
+
+        words = normalize_name(text).split()
+        for size in range(1, _MAX_NAME_WORDS + 1):
+            for start in range(len(words) - size + 1):
+                ticker = resolver.name_ticker(" ".join(words[start:start + size]))
+                if ticker:
+                    tickers.add(ticker)
+        return tickers
+
+    def select(self, tickers=(), top_k=NEWS_TOP_K, index_k=NEWS_INDEX_K, token_budget=NEWS_TOKEN_BUDGET):
+        """
+        Selects the news relevant to a set of holdings.
+        Articles mentioning more holdings rank first, then the most recent ones; up to
+        index_k of the most recent index-level articles are added and the result is cut
+        to the token budget.
+        Without tickers the most recent articles of the whole corpus are selected.
+        :param tickers: Tickers held by the portfolio
+        :return: {"Companies": [...], "Market": [...]}
+        """
+        counts = {}
+        for ticker in tickers:
+            for position in self.by_ticker.get(ticker, ()):
+                counts[position] = counts.get(position, 0) + 1
+
+        recency = lambda position: (-self.timestamps[position], position)
+        if tickers:
+            ranked = sorted(counts, key=lambda position: (-counts[position], *recency(position)))[:top_k]
+        else:
+            ranked = sorted((p for p in range(len(self.articles)) if p not in self.index_articles), key=recency)[:top_k]
+        market = sorted((p for p in self.index_articles if p not in counts), key=recency)[:index_k]
+
+        selected = {"Companies": [], "Market": []}
+        used = 0
+        # Interleave so a long holdings list cannot crowd out market context entirely
+        for section, position in self._interleave(ranked, market):
+            article = self.articles[position]
+            cost = estimate_tokens(json.dumps(article))
+            if used + cost > token_budget:
+                continue
+            selected[section].append(article)
+            used += cost
+        return selected
+
+    @staticmethod
+    def _interleave(holdings, market):
+        for i in range(max(len(holdings), len(market))):
+            if i < len(holdings):
+                yield "Companies", holdings[i]
+            if i < len(market):
+                yield "Market", market[i]
@@ -0,0 +1,155 @@
+import os
+import time
+import logging
+import argparse
+import numpy as np
+from app.redis_db.redis import redis_client
+from .news import NewsReporter
+
+# Wallets read and written per pipelined round-trip
+REVALUATION_BATCH_SIZE = int(os.getenv("REVALUATION_BATCH_SIZE", "1000"))
+
+logger = logging.getLogger(__name__)
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class PortfolioRevaluer:
+    """
+    Revalues the stock holdings of every stored portfolio.
+
+    Portfolios still stored in the old single-string format are first migrated to
+    hashes so they are included. Then it runs two passes over the wallets found with
+    SCAN: the first collects the distinct stock names so each ticker is resolved and
+    priced exactly once, the second computes all valuations of a batch with NumPy
+    and writes them back in one pipeline. Only the Stocks section is read, and
+    portfolio contents are not modified.
+    """
+
+    def __init__(self, client=redis_client, reporter=None, batch_size=REVALUATION_BATCH_SIZE):
+        self.client = client
+        self.reporter = reporter or NewsReporter()
+        self.batch_size = batch_size
+
+    def _stock_sections(self, wallets):
+        for batch in _batches(wallets, self.batch_size):
+            yield self.client.get_portfolio_sections(batch, "Stocks")
+
+    def collect(self):
+        """
+        First pass: lists the wallets and resolves every distinct stock name.
+        :return: (wallet addresses, {stock name: ticker or None})
+        """
+        wallets = list(self.client.scan_wallets(count=self.batch_size))
+        names = set()
+        for sections in self._stock_sections(wallets):
+            for stocks in sections.values():
+                names.update(stock.get("name") for stock in stocks or [])
+        names.discard(None)
+        return wallets, {name: self.reporter.resolver.resolve(name) for name in names}
+
+    @staticmethod
+    def value_batch(sections, tickers, prices, as_of):
+        """
+        Values one batch of Stocks sections in a single vectorized pass.
+        :param sections: Mapping of wallet address to its list of stock holdings
+        :param tickers: Mapping of stock name to ticker
+        :param prices: Mapping of ticker to current price (None when unavailable)
+        :param as_of: UNIX timestamp stored with each valuation
+        :return: Mapping of wallet address to its valuation
+        """
+        wallets = list(sections)
+        wallet_index, quantity, cost, price = [], [], [], []
+        for index, wallet in enumerate(wallets):
+            for stock in sections[wallet] or []:
+                wallet_index.append(index)
+                quantity.append(float(stock.get("quantity", 0)))
+                cost.append(float(stock.get("price_bought_at", 0)))
+                market_price = prices.get(tickers.get(stock.get("name")))
+                price.append(np.nan if market_price is None else float(market_price))
+
+        wallet_index = np.array(wallet_index, dtype=np.int64)
+        quantity = np.array(quantity, dtype=float)
+        cost = np.array(cost, dtype=float)
+        price = np.array(price, dtype=float)
+
+        priced = ~np.isnan(price)
+        invested = quantity * cost
+        # Unpriced holdings are carried at cost
+        current = np.where(priced, quantity * np.nan_to_num(price), invested)
+
+        size = len(wallets)
+        totals_invested = np.bincount(wallet_index, weights=invested, minlength=size)
+        totals_current = np.bincount(wallet_index, weights=current, minlength=size)
+        holdings = np.bincount(wallet_index, minlength=size)
+        unpriced = np.bincount(wallet_index, weights=~priced, minlength=size)
+
+        return {
+            wallet: {
+                "as_of": as_of,
+                "stocks_invested": round(float(totals_invested[index]), 2),
+                "stocks_current_value": round(float(totals_current[index]), 2),
+                "stocks_pnl": round(float(totals_current[index] - totals_invested[index]), 2),
+                "holdings": int(holdings[index]),
+                "unpriced_holdings": int(unpriced[index]),
+            }
+            for index, wallet in enumerate(wallets)
+        }
+
+    def run(self):
+        """
+        Revalues all stored portfolios.
+        :return: Summary with the number of wallets, tickers and elapsed seconds
+        """
+        started = time.time()
+        migrated = self.client.migrate_legacy_portfolios(self.batch_size)
+        if migrated:
+            logger.info("Migrated %d portfolios from the old single-string format", migrated)
+        wallets, tickers = self.collect()
+        logger.info("Revaluing %d wallets holding %d distinct stocks", len(wallets), len(tickers))
+        distinct = sorted({ticker for ticker in tickers.values() if ticker})
+        prices = self.reporter.fetch_prices(distinct)
+
+        as_of = int(time.time())
+        written = 0
+        for sections in self._stock_sections(wallets):
+            valuations = self.value_batch(sections, tickers, prices, as_of)
+            if self.client.set_valuations(valuations):
+                written += len(valuations)
+
+        return {
+            "wallets": len(wallets),
+            "migrated_legacy": migrated,
+            "written": written,
+            "tickers": len(distinct),
+            "unpriced_tickers": sum(1 for price in prices.values() if price is None),
+            "seconds": round(time.time() - started, 2),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Revalue the stock holdings of every stored portfolio.")
+    parser.add_argument("--batch-size", type=int, default=REVALUATION_BATCH_SIZE,
+                        help="wallets read and written per round-trip")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    try:
+        summary = PortfolioRevaluer(batch_size=args.batch_size).run()
+    except Exception:
+        logger.exception("Revaluation failed")
+        return 1
+    logger.info(
+        "Revalued %(written)d of %(wallets)d wallets (%(migrated_legacy)d migrated), %(tickers)d tickers "
+        "(%(unpriced_tickers)d unpriced) in %(seconds)ss", summary
+    )
+    return 0 if summary["written"] == summary["wallets"] else 1
+
+
+if __name__ == "__main__":
+    # Nightly reconciliation: python -m app.news_recommendation_module.revaluation [--batch-size N]
+    raise SystemExit(main())
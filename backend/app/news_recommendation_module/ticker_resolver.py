@@ -0,0 +1,150 @@
+import re
+import csv
+import json
+import threading
+from fuzzywuzzy import process
+
+# Corporate suffixes that carry no information when matching names
+_STOP_WORDS = {"ltd", "limited", "inc", "corp", "corporation", "co", "company", "plc", "the"}
+
+# Header names used by the NSE (EQUITY_L.csv) and BSE equity list downloads
+_NAME_COLUMNS = ("name", "NAME OF COMPANY", "Security Name", "Issuer Name")
+_TICKER_COLUMNS = ("ticker", "SYMBOL", "Security Id")
+
+
+def normalize_name(name):
+    """
+    Normalizes a company name for exact matching.
+    "Mahindra & Mahindra Ltd." and "mahindra and mahindra" both become "mahindra and mahindra".
+    """
+    name = name.lower().replace("&", " and ")
+    tokens = re.sub(r"[^a-z0-9]+", " ", name).split()
+    return " ".join(token for token in tokens if token not in _STOP_WORDS)
+
+
+class TickerResolver:
+    """
+    Maps user supplied stock names or symbols to exchange tickers.
+    Exact names and symbols are resolved through hash indexes, anything else falls
+    back to fuzzy matching whose results are memoized per query.
+    """
+
+    def __init__(self, score_cutoff=80, fuzzy_cache_size=4096):
+        self.score_cutoff = score_cutoff
+        self.fuzzy_cache_size = fuzzy_cache_size
+        self._by_name = {}
+        self._by_ticker = {}
+        self._fuzzy_cache = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_guide(cls, guide, **kwargs):
+        """
+        Builds a resolver from a guide of the form {"Stocks": [{"name": ..., "ticker": ...}]}.
+        """
+        resolver = cls(**kwargs)
+        resolver.add_instruments(guide.get("Stocks", []))
+        return resolver
+
+    def add(self, name, ticker):
+        ticker = ticker.strip().upper()
+        normalized = normalize_name(name)
+        with self._lock:
+            if normalized:
+                self._by_name.setdefault(normalized, ticker)
+            self._by_ticker.setdefault(ticker, ticker)
+            # Allow bare symbols such as "RELIANCE" for "RELIANCE.NS"
+            self._by_ticker.setdefault(ticker.split(".")[0], ticker)
+            self._fuzzy_cache.clear()
+
+    def add_instruments(self, instruments):
+        for item in instruments:
+            self.add(item["name"], item["ticker"])
+
+    def load_file(self, path, suffix=".NS"):
+        """
+        Loads instruments from a JSON guide or an exchange CSV listing.
+        :param path: Path to a .json guide or a .csv with name/symbol columns
+        :param suffix: Exchange suffix appended to CSV symbols without one (".NS" or ".BO")
+        :return: Number of instruments loaded
+        """
+        if path.endswith(".json"):
+            with open(path, "r") as file:
+                data = json.load(file)
+            instruments = data.get("Stocks", []) if isinstance(data, dict) else data
+            self.add_instruments(instruments)
+            return len(instruments)
+
+        count = 0
+        with open(path, "r", newline="", encoding="utf-8-sig") as file:
+            reader = csv.DictReader(file)
+            fields = {field.strip(): field for field in reader.fieldnames or []}
+            name_column = next((fields[c] for c in _NAME_COLUMNS if c in fields), None)
+            ticker_column = next((fields[c] for c in _TICKER_COLUMNS if c in fields), None)
+            if not name_column or not ticker_column:
+                raise ValueError(f"Unrecognised instrument list format in {path}")
+
+            for row in reader:
+                name, ticker = row[name_column].strip(), row[ticker_column].strip()
+                if not name or not ticker:
+                    continue
+                if "." not in ticker:
+                    ticker += suffix
+                self.add(name, ticker)
+                count += 1
+        return count
+
+    def _fuzzy(self, normalized):
+        with self._lock:
+            if normalized in self._fuzzy_cache:
+                return self._fuzzy_cache[normalized]
+            choices = list(self._by_name)
+
+        match = process.extractOne(normalized, choices, score_cutoff=self.score_cutoff)
+        ticker = self._by_name[match[0]] if match else None
+
+        with self._lock:
+            if len(self._fuzzy_cache) >= self.fuzzy_cache_size:
+                self._fuzzy_cache.pop(next(iter(self._fuzzy_cache)))
+            self._fuzzy_cache[normalized] = ticker
+        return ticker
+
+    def resolve(self, query):
+        """
+        Resolves a stock name or symbol to a ticker.
+        :param query: Name ("Infosys Ltd") or symbol ("INFY", "INFY.NS")
+        :return: Ticker symbol or None when nothing matches closely enough
+        """
+        if not query:
+            return None
+
+        ticker = self.exact(query)
+        if ticker:
+            return ticker
+
+        normalized = normalize_name(query)
+        if not normalized:
+            return None
+
+        return self._fuzzy(normalized)
+
+    def exact(self, query):
+        """
+        Resolves a symbol or an exact (normalized) company name, without fuzzy matching.
+        """
+        return self._by_ticker.get(query.strip().upper()) or self._by_name.get(normalize_name(query))
+
+    def name_ticker(self, normalized):
+        """
+        Looks up an already normalized company name.
+        """
+        return self._by_name.get(normalized)
+
+    def symbol_ticker(self, symbol):
+        """
+        Looks up a ticker or bare symbol ("TCS", "TCS.NS").
+        """
+        return self._by_ticker.get(symbol.upper())
+
+    def __len__(self):
+        return len(self._by_name)
@@ -1,61 +1,434 @@
 import redis
-from typing import Optional, Dict, Any
-import json
+import redis.asyncio as aioredis
+from typing import Optional, Dict, Any, List
+import os
+from app.serialization import serializer, json_loads
+
+# redis://[:password@]host:port/db
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Per process, split across the connection pools below
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+# Fraction of the budget per pool: most traffic comes from the async handlers and binary portfolio data
+_POOL_SHARES = {"sync": 0.2, "async": 0.3, "binary": 0.2, "async_binary": 0.3}
+# Seconds to wait for a free connection before failing
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+
+# Cached recommendations per wallet, dropped whenever the portfolio changes
+RECOMMENDATIONS_KEY = "recommendations:{}"
+
+# Each portfolio is a hash with one serialized field per section (Stocks, Crypto, ...)
+PORTFOLIO_KEY = "portfolio:{}"
+
+# Latest valuation written by the bulk revaluation job, kept apart from the portfolio
+# so revaluing does not change it (or drop cached recommendations)
+VALUATION_KEY = "valuation:{}"
+
+# Top-level fields of the portfolio document; a string under a bare wallet address
+# is only taken for an old-format portfolio if it is a JSON object with one of them
+_LEGACY_PORTFOLIO_FIELDS = {
+    "name", "age", "Investment_profile", "Stocks", "Mutual_funds", "Fixed_deposits", "Recent_transactions", "Crypto",
+}
+
+# Replaces one section only if the portfolio exists, and drops cached recommendations
+_UPDATE_SECTION_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('DEL', KEYS[2])
+return 1
+"""
+
+def _pool_size(name: str) -> int:
+    return max(2, int(REDIS_MAX_CONNECTIONS * _POOL_SHARES[name]))
+
 
 class RedisClient:
+    """
+    Portfolio store backed by Redis. Connections come from pools that together stay
+    within REDIS_MAX_CONNECTIONS per process and are only opened on first use, so
+    importing this module never touches the network. Decoded and binary clients
+    need separate pools because decoding is a property of the connection.
+    """
+
     def __init__(self):
+        self.pool = redis.BlockingConnectionPool.from_url(
+            REDIS_URL,
+            max_connections=_pool_size("sync"),
+            timeout=REDIS_POOL_TIMEOUT,
+            decode_responses=True
+        )
+        self.redis_client = redis.Redis(connection_pool=self.pool)
+        # Non-blocking client used by the FastAPI handlers
+        self.async_pool = aioredis.BlockingConnectionPool.from_url(
+            REDIS_URL,
+            max_connections=_pool_size("async"),
+            timeout=REDIS_POOL_TIMEOUT,
+            decode_responses=True
+        )
+        self.async_client = aioredis.Redis(connection_pool=self.async_pool)
+        # Portfolios are stored with the binary serializer, so they use undecoded clients
+        self.binary_pool = redis.BlockingConnectionPool.from_url(
+            REDIS_URL,
+            max_connections=_pool_size("binary"),
+            timeout=REDIS_POOL_TIMEOUT
+        )
+        self.binary_client = redis.Redis(connection_pool=self.binary_pool)
+        self.async_binary_pool = aioredis.BlockingConnectionPool.from_url(
+            REDIS_URL,
+            max_connections=_pool_size("async_binary"),
+            timeout=REDIS_POOL_TIMEOUT
+        )
+        self.async_binary_client = aioredis.Redis(connection_pool=self.async_binary_pool)
+        self._update_section = self.binary_client.register_script(_UPDATE_SECTION_SCRIPT)
+        self._aupdate_section = self.async_binary_client.register_script(_UPDATE_SECTION_SCRIPT)
+
+    def ping(self) -> bool:
         try:
-            self.redis_client = redis.Redis(
-                host='localhost',
-                port=6379,
-                decode_responses=True
-            )
-            # Test connection
-            self.redis_client.ping()
+            return self.redis_client.ping()
         except redis.ConnectionError as e:
             print(f"Failed to connect to Redis: {e}")
-            raise
+            return False
+
+    @staticmethod
+    def _encode_portfolio(portfolio_data: Dict[str, Any]) -> Dict[str, bytes]:
+        return {section: serializer.dumps(value) for section, value in portfolio_data.items()}
+
+    @staticmethod
+    def _decode_portfolio(fields: Dict[bytes, bytes]) -> Dict[str, Any]:
+        return {section.decode(): serializer.loads(value) for section, value in fields.items()}
+
+    def _queue_set_portfolio(self, pipe, wallet_address: str, portfolio_data: Dict[str, Any]):
+        key = PORTFOLIO_KEY.format(wallet_address)
+        pipe.delete(key)
+        if portfolio_data:
+            pipe.hset(key, mapping=self._encode_portfolio(portfolio_data))
+        pipe.delete(RECOMMENDATIONS_KEY.format(wallet_address))
 
     def set_portfolio(self, wallet_address: str, portfolio_data: Dict[str, Any]) -> bool:
         try:
             if not wallet_address:
                 raise ValueError("Wallet address cannot be empty")
-            return self.redis_client.set(
-                wallet_address,
-                json.dumps(portfolio_data)
-            )
+            pipe = self.binary_client.pipeline()
+            self._queue_set_portfolio(pipe, wallet_address, portfolio_data)
+            pipe.execute()
+            return True
         except Exception as e:
             print(f"Error setting portfolio: {e}")
             return False
 
+    @staticmethod
+    def _parse_legacy_portfolio(wallet_address: str, data: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        # Other data (namespaced keys, non-JSON values) is never mistaken for a portfolio
+        if not data or ":" in wallet_address:
+            return None
+        try:
+            document = json_loads(data)
+        except ValueError:
+            return None
+        if isinstance(document, dict) and _LEGACY_PORTFOLIO_FIELDS.intersection(document):
+            return document
+        return None
+
+    def _get_legacy_portfolio(self, wallet_address: str) -> Optional[Dict[str, Any]]:
+        # Move a portfolio stored in the old single-string format to a hash. WATCH makes
+        # the move atomic: if either key changes meanwhile, the hash written by the
+        # other client wins. The bare key is only deleted here, once its value has been
+        # confirmed to be a portfolio, since wallet addresses come from clients.
+        key = PORTFOLIO_KEY.format(wallet_address)
+        with self.binary_client.pipeline() as pipe:
+            try:
+                pipe.watch(wallet_address, key)
+                if pipe.type(wallet_address) != b"string":
+                    return None
+                portfolio = self._parse_legacy_portfolio(wallet_address, pipe.get(wallet_address))
+                if portfolio is None:
+                    return None
+                fields = pipe.hgetall(key)
+                pipe.multi()
+                if fields:
+                    # Written in the new format since, the old copy is stale
+                    portfolio = self._decode_portfolio(fields)
+                else:
+                    self._queue_set_portfolio(pipe, wallet_address, portfolio)
+                pipe.delete(wallet_address)
+                pipe.execute()
+                return portfolio
+            except redis.WatchError:
+                fields = self.binary_client.hgetall(key)
+                return self._decode_portfolio(fields) if fields else None
+
     def get_portfolio(self, wallet_address: str) -> Optional[Dict[str, Any]]:
         try:
             if not wallet_address:
                 raise ValueError("Wallet address cannot be empty")
-            data = self.redis_client.get(wallet_address)
-            return json.loads(data) if data else None
+            fields = self.binary_client.hgetall(PORTFOLIO_KEY.format(wallet_address))
+            if fields:
+                return self._decode_portfolio(fields)
+            return self._get_legacy_portfolio(wallet_address)
         except Exception as e:
             print(f"Error getting portfolio: {e}")
             return None
 
+    def get_portfolio_section(self, wallet_address: str, section: str) -> Optional[Any]:
+        try:
+            if not wallet_address:
+                raise ValueError("Wallet address cannot be empty")
+            data = self.binary_client.hget(PORTFOLIO_KEY.format(wallet_address), section)
+            if data is not None:
+                return serializer.loads(data)
+            portfolio = self._get_legacy_portfolio(wallet_address)
+            return portfolio.get(section) if portfolio else None
+        except Exception as e:
+            print(f"Error getting portfolio section: {e}")
+            return None
+
     def update_portfolio_section(self, wallet_address: str, section: str, section_data: list) -> bool:
         try:
             if not wallet_address:
                 raise ValueError("Wallet address cannot be empty")
-            
-            # Get existing portfolio
-            portfolio = self.get_portfolio(wallet_address)
-            if not portfolio:
+
+            keys = [PORTFOLIO_KEY.format(wallet_address), RECOMMENDATIONS_KEY.format(wallet_address)]
+            args = [section, serializer.dumps(section_data)]
+            if self._update_section(keys=keys, args=args):
+                return True
+
+            # Not stored as a hash yet; migrate an old-format portfolio and retry once
+            if self._get_legacy_portfolio(wallet_address) is None:
                 return False
-            
-            # Update specific section
-            portfolio[section] = section_data
-            
-            # Save updated portfolio
-            return self.set_portfolio(wallet_address, portfolio)
+            return bool(self._update_section(keys=keys, args=args))
         except Exception as e:
             print(f"Error updating portfolio section: {e}")
             return False
 
-# Create a singleton instance
+    def get_portfolios(self, wallet_addresses: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Reads many portfolios in one MULTI/EXEC round-trip.
+        :return: Mapping of wallet address to portfolio (None when not found)
+        """
+        try:
+            pipe = self.binary_client.pipeline()
+            for wallet_address in wallet_addresses:
+                pipe.hgetall(PORTFOLIO_KEY.format(wallet_address))
+            results = dict(zip(wallet_addresses, pipe.execute()))
+
+            portfolios = {wallet: self._decode_portfolio(fields) if fields else None for wallet, fields in results.items()}
+            missing = [wallet for wallet, portfolio in portfolios.items() if portfolio is None]
+            if missing:
+                # Old-format portfolios are rare, each one is migrated on its own
+                for wallet, data in zip(missing, self.binary_client.mget(missing)):
+                    if self._parse_legacy_portfolio(wallet, data) is not None:
+                        portfolios[wallet] = self._get_legacy_portfolio(wallet)
+            return portfolios
+        except Exception as e:
+            print(f"Error getting portfolios: {e}")
+            return {wallet: None for wallet in wallet_addresses}
+
+    def set_portfolios(self, portfolios: Dict[str, Dict[str, Any]]) -> bool:
+        """
+        Writes many portfolios in one MULTI/EXEC round-trip, so no reader sees a
+        portfolio between its delete and its rewrite.
+        """
+        try:
+            if not all(portfolios):
+                raise ValueError("Wallet address cannot be empty")
+            pipe = self.binary_client.pipeline()
+            for wallet_address, portfolio_data in portfolios.items():
+                self._queue_set_portfolio(pipe, wallet_address, portfolio_data)
+            pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Error setting portfolios: {e}")
+            return False
+
+    def scan_wallets(self, count: int = 1000):
+        """
+        Iterates over the wallet addresses of all hash-stored portfolios using SCAN,
+        so the server is never blocked. Portfolios still in the old single-string
+        format are not included until they are migrated, see migrate_legacy_portfolios.
+        """
+        prefix = PORTFOLIO_KEY.format("")
+        for key in self.binary_client.scan_iter(match=prefix + "*", count=count, _type="hash"):
+            yield key.decode()[len(prefix):]
+
+    def migrate_legacy_portfolios(self, count: int = 1000) -> int:
+        """
+        Moves every portfolio still stored in the old single-string format to a hash.
+        Candidates are found with SCAN and checked in batches of count keys.
+        :return: Number of portfolios migrated
+        """
+        migrated = 0
+        batch = []
+        keys = self.binary_client.scan_iter(count=count, _type="string")
+        for key in keys:
+            wallet_address = key.decode(errors="replace")
+            if ":" not in wallet_address:
+                batch.append(wallet_address)
+            if len(batch) >= count:
+                migrated += self._migrate_legacy_batch(batch)
+                batch = []
+        if batch:
+            migrated += self._migrate_legacy_batch(batch)
+        return migrated
+
+    def _migrate_legacy_batch(self, wallet_addresses: List[str]) -> int:
+        migrated = 0
+        for wallet_address, data in zip(wallet_addresses, self.binary_client.mget(wallet_addresses)):
+            if self._parse_legacy_portfolio(wallet_address, data) is None:
+                continue
+            try:
+                if self._get_legacy_portfolio(wallet_address) is not None:
+                    migrated += 1
+            except Exception as e:
+                print(f"Error migrating portfolio {wallet_address}: {e}")
+        return migrated
+
+    def get_portfolio_sections(self, wallet_addresses: List[str], section: str) -> Dict[str, Optional[Any]]:
+        """
+        Reads one section of many portfolios in one MULTI/EXEC round-trip.
+        :return: Mapping of wallet address to section (None when not found)
+        """
+        try:
+            pipe = self.binary_client.pipeline()
+            for wallet_address in wallet_addresses:
+                pipe.hget(PORTFOLIO_KEY.format(wallet_address), section)
+            return {
+                wallet: serializer.loads(data) if data is not None else None
+                for wallet, data in zip(wallet_addresses, pipe.execute())
+            }
+        except Exception as e:
+            print(f"Error getting portfolio sections: {e}")
+            return {wallet: None for wallet in wallet_addresses}
+
+    def set_valuations(self, valuations: Dict[str, Dict[str, Any]]) -> bool:
+        """
+        Writes many portfolio valuations in one MULTI/EXEC round-trip.
+        """
+        try:
+            pipe = self.binary_client.pipeline()
+            for wallet_address, valuation in valuations.items():
+                pipe.set(VALUATION_KEY.format(wallet_address), serializer.dumps(valuation))
+            pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Error setting valuations: {e}")
+            return False
+
+    async def aget_valuation(self, wallet_address: str) -> Optional[Dict[str, Any]]:
+        try:
+            return serializer.loads(await self.async_binary_client.get(VALUATION_KEY.format(wallet_address)))
+        except Exception as e:
+            print(f"Error getting valuation: {e}")
+            return None
+
+    async def aset_portfolio(self, wallet_address: str, portfolio_data: Dict[str, Any]) -> bool:
+        try:
+            if not wallet_address:
+                raise ValueError("Wallet address cannot be empty")
+            pipe = self.async_binary_client.pipeline()
+            self._queue_set_portfolio(pipe, wallet_address, portfolio_data)
+            await pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Error setting portfolio: {e}")
+            return False
+
+    async def _aget_legacy_portfolio(self, wallet_address: str) -> Optional[Dict[str, Any]]:
+        key = PORTFOLIO_KEY.format(wallet_address)
+        async with self.async_binary_client.pipeline() as pipe:
+            try:
+                await pipe.watch(wallet_address, key)
+                if await pipe.type(wallet_address) != b"string":
+                    return None
+                portfolio = self._parse_legacy_portfolio(wallet_address, await pipe.get(wallet_address))
+                if portfolio is None:
+                    return None
+                pipe.multi()
+                self._queue_set_portfolio(pipe, wallet_address, portfolio)
+                await pipe.execute()
+                return portfolio
+            except redis.WatchError:
+                fields = await self.async_binary_client.hgetall(key)
+                return self._decode_portfolio(fields) if fields else None
+
+    async def aget_portfolio(self, wallet_address: str) -> Optional[Dict[str, Any]]:
+        try:
+            if not wallet_address:
+                raise ValueError("Wallet address cannot be empty")
+            fields = await self.async_binary_client.hgetall(PORTFOLIO_KEY.format(wallet_address))
+            if fields:
+                return self._decode_portfolio(fields)
+            return await self._aget_legacy_portfolio(wallet_address)
+        except Exception as e:
+            print(f"Error getting portfolio: {e}")
+            return None
+
+    async def aget_portfolio_section(self, wallet_address: str, section: str) -> Optional[Any]:
+        try:
+            if not wallet_address:
+                raise ValueError("Wallet address cannot be empty")
+            data = await self.async_binary_client.hget(PORTFOLIO_KEY.format(wallet_address), section)
+            if data is not None:
+                return serializer.loads(data)
+            portfolio = await self._aget_legacy_portfolio(wallet_address)
+            return portfolio.get(section) if portfolio else None
+        except Exception as e:
+            print(f"Error getting portfolio section: {e}")
+            return None
+
+    async def aupdate_portfolio_section(self, wallet_address: str, section: str, section_data: list) -> bool:
+        try:
+            if not wallet_address:
+                raise ValueError("Wallet address cannot be empty")
+
+            keys = [PORTFOLIO_KEY.format(wallet_address), RECOMMENDATIONS_KEY.format(wallet_address)]
+            args = [section, serializer.dumps(section_data)]
+            if await self._aupdate_section(keys=keys, args=args):
+                return True
+
+            if await self._aget_legacy_portfolio(wallet_address) is None:
+                return False
+            return bool(await self._aupdate_section(keys=keys, args=args))
+        except Exception as e:
+            print(f"Error updating portfolio section: {e}")
+            return False
+
+    async def aget_portfolios(self, wallet_addresses: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        try:
+            pipe = self.async_binary_client.pipeline()
+            for wallet_address in wallet_addresses:
+                pipe.hgetall(PORTFOLIO_KEY.format(wallet_address))
+            results = dict(zip(wallet_addresses, await pipe.execute()))
+
+            portfolios = {wallet: self._decode_portfolio(fields) if fields else None for wallet, fields in results.items()}
+            missing = [wallet for wallet, portfolio in portfolios.items() if portfolio is None]
+            if missing:
+                for wallet, data in zip(missing, await self.async_binary_client.mget(missing)):
+                    if self._parse_legacy_portfolio(wallet, data) is not None:
+                        portfolios[wallet] = await self._aget_legacy_portfolio(wallet)
+            return portfolios
+        except Exception as e:
+            print(f"Error getting portfolios: {e}")
+            return {wallet: None for wallet in wallet_addresses}
+
+    async def aset_portfolios(self, portfolios: Dict[str, Dict[str, Any]]) -> bool:
+        try:
+            if not all(portfolios):
+                raise ValueError("Wallet address cannot be empty")
+            pipe = self.async_binary_client.pipeline()
+            for wallet_address, portfolio_data in portfolios.items():
+                self._queue_set_portfolio(pipe, wallet_address, portfolio_data)
+            await pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Error setting portfolios: {e}")
+            return False
+
+    async def aclose(self):
+        await self.async_client.aclose()
+        await self.async_binary_client.aclose()
+        await self.async_pool.disconnect()
+        await self.async_binary_pool.disconnect()
+
+# Create a singleton instance (no connection is made until first use)
 redis_client = RedisClient()
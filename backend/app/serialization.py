@@ -0,0 +1,111 @@
+import os
+import json
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Values written by this module start with MAGIC, then one byte each for the format
+# version, the codec and the compression. Plain JSON text never starts with a NUL
+# byte, so values written before this format existed are still read as JSON.
+MAGIC = b"\x00VS"
+FORMAT_VERSION = 1
+
+CODEC_JSON = b"j"
+CODEC_MSGPACK = b"m"
+COMPRESSION_NONE = b"n"
+COMPRESSION_ZLIB = b"z"
+
+# msgpack, or json (orjson when installed); msgpack falls back to json when it is not installed
+SERIALIZER_CODEC = os.getenv("SERIALIZER_CODEC", "msgpack")
+# Payloads at least this large (in bytes) are zlib compressed
+SERIALIZER_COMPRESS_THRESHOLD = int(os.getenv("SERIALIZER_COMPRESS_THRESHOLD", "4096"))
+SERIALIZER_COMPRESS_LEVEL = int(os.getenv("SERIALIZER_COMPRESS_LEVEL", "3"))
+
+
+def _default(obj):
+    # numpy/pandas scalars (e.g. prices in stock histories)
+    if hasattr(obj, "item"):
+        return obj.item()
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Type is not serializable: {type(obj)}")
+
+
+def json_dumps(obj) -> bytes:
+    if orjson:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+
+def json_loads(data):
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class Serializer:
+    """
+    Encodes values stored in Redis. Uses msgpack (or orjson) when installed,
+    compresses large payloads and prefixes a small versioned header, while still
+    reading the plain JSON values written by earlier versions.
+    """
+
+    def __init__(self, codec=SERIALIZER_CODEC, compress_threshold=SERIALIZER_COMPRESS_THRESHOLD,
+                 compress_level=SERIALIZER_COMPRESS_LEVEL):
+        if codec not in ("msgpack", "json"):
+            raise ValueError(f"Unknown serializer codec {codec!r}, expected 'msgpack' or 'json'")
+        if codec == "msgpack" and not msgpack:
+            print("msgpack is not installed, serializing as JSON instead.")
+            codec = "json"
+        self.codec = CODEC_MSGPACK if codec == "msgpack" else CODEC_JSON
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+
+    def dumps(self, obj) -> bytes:
+        if self.codec == CODEC_MSGPACK:
+            payload = msgpack.packb(obj, default=_default, use_bin_type=True)
+        else:
+            payload = json_dumps(obj)
+
+        compression = COMPRESSION_NONE
+        if self.compress_threshold and len(payload) >= self.compress_threshold:
+            payload = zlib.compress(payload, self.compress_level)
+            compression = COMPRESSION_ZLIB
+
+        return MAGIC + bytes([FORMAT_VERSION]) + self.codec + compression + payload
+
+    def loads(self, data):
+        if data is None:
+            return None
+        if isinstance(data, str):
+            data = data.encode()
+        if not data.startswith(MAGIC):
+            # Written before the versioned format: plain JSON
+            return json_loads(data)
+
+        header_end = len(MAGIC) + 3
+        version = data[len(MAGIC)]
+        codec = data[len(MAGIC) + 1:len(MAGIC) + 2]
+        compression = data[len(MAGIC) + 2:header_end]
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported serialization format version {version}")
+
+        payload = data[header_end:]
+        if compression == COMPRESSION_ZLIB:
+            payload = zlib.decompress(payload)
+        if codec == CODEC_MSGPACK:
+            if not msgpack:
+                raise ValueError("Value was written with msgpack, install the msgpack package to read it")
+            return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+        return json_loads(payload)
+
+
+serializer = Serializer()
@@ -0,0 +1,71 @@
+import datetime
+import pytest
+from app.news_recommendation_module.analytics import analyze_portfolio, _fixed_deposit_value, _sleeve_index
+import pandas as pd
+import numpy as np
+
+
+def _history(dates, closes):
+    return {"dates": dates, "close": closes}
+
+
+def test_values_stocks_at_market_prices_and_unpriced_stocks_at_cost():
+    infosys = {"name": "Infosys", "quantity": 10, "price_bought_at": 100}
+    unknown = {"name": "Unlisted", "quantity": 5, "price_bought_at": 40}
+    portfolio = {
+        "Stocks": [infosys, unknown],
+        "Mutual_funds": [{"name": "Index fund", "investment_amount": 1000, "current_value": 1200}],
+    }
+    market_data = {"INFY.NS": {"current_price": 150, "history": None}}
+
+    analytics = analyze_portfolio(portfolio, [(infosys, "INFY.NS")], market_data)
+
+    assert analytics["total_invested"] == 2200
+    assert analytics["total_current_value"] == 2900
+    assert analytics["total_pnl"] == 700
+    assert analytics["asset_classes"]["Stocks"]["pnl"] == 500
+    assert [h["priced"] for h in analytics["holdings"]] == [True, False, True]
+    assert analytics["concentration"]["largest_holding"] == "Infosys"
+    assert sum(h["weight_pct"] for h in analytics["holdings"]) == pytest.approx(100, abs=0.05)
+
+
+def test_stock_sleeve_risk_uses_the_aligned_history():
+    infosys = {"name": "Infosys", "quantity": 1, "price_bought_at": 100}
+    history = _history(["2024-01-01", "2024-01-02", "2024-01-03"], [100, 110, 99])
+    market_data = {"INFY.NS": {"current_price": 99, "history": history}}
+
+    stocks = analyze_portfolio({"Stocks": [infosys]}, [(infosys, "INFY.NS")], market_data)["stocks"]
+
+    assert stocks["return_pct"] == -1
+    assert stocks["max_drawdown_pct"] == -10
+    assert stocks["volatility_pct"] is not None
+    assert stocks["by_ticker"]["INFY.NS"]["return_pct"] == -1
+
+
+def test_sleeve_index_ignores_tickers_before_their_history_starts():
+    closes = pd.DataFrame({"A": [100.0, 110.0, 121.0], "B": [np.nan, 50.0, 55.0]})
+    index = _sleeve_index(closes, np.array([1.0, 2.0]))
+    # B only counts once it is priced on both days, so there is no jump when it appears
+    assert index == pytest.approx([1.0, 1.1, 1.1 * 1.1])
+
+
+def test_fixed_deposits_accrue_towards_their_maturity_value():
+    deposit = {"investment_amount": 1000, "maturity_value": 1210, "tenure_years": 2, "start_date": "2024-01-01"}
+    halfway, accrued = _fixed_deposit_value(deposit, datetime.date(2025, 1, 1))
+    matured, _ = _fixed_deposit_value(deposit, datetime.date(2030, 1, 1))
+
+    assert accrued
+    assert halfway == pytest.approx(1100, rel=1e-3)
+    assert matured == pytest.approx(1210)
+
+
+def test_fixed_deposits_without_a_start_date_use_the_stored_value():
+    assert _fixed_deposit_value({"investment_amount": 1000, "current_value": 1050}) == (1050, True)
+    assert _fixed_deposit_value({"investment_amount": 1000}) == (1000, False)
+
+
+def test_empty_portfolio():
+    analytics = analyze_portfolio({}, [], {})
+    assert analytics["total_invested"] == 0
+    assert analytics["total_return_pct"] is None
+    assert analytics["concentration"]["largest_holding"] is None
@@ -0,0 +1,82 @@
+import os
+import time
+import pytest
+from Call.AudioStore import AudioStore
+
+
+def _name(n):
+    return f"{n:064x}.mp3"
+
+
+def _add(store, name, size=100):
+    partial = store.partial_path(name)
+    with open(partial, "wb") as f:
+        f.write(b"\0" * size)
+    return store.put(name, partial)
+
+
+def test_evicts_least_recently_used_files_over_the_size_bound(tmp_path):
+    store = AudioStore(directory=str(tmp_path), max_bytes=250)
+    _add(store, _name(1))
+    _add(store, _name(2))
+    # Using the first file makes the second the least recently used
+    assert store.path(_name(1))
+    _add(store, _name(3))
+
+    assert store.path(_name(2)) is None
+    assert not os.path.exists(tmp_path / _name(2))
+    assert store.path(_name(1)) and store.path(_name(3))
+
+
+def test_evicts_files_older_than_the_age_bound(tmp_path):
+    store = AudioStore(directory=str(tmp_path), max_age=60)
+    _add(store, _name(1))
+    store._index[_name(1)][1] = time.time() - 120
+    _add(store, _name(2))
+
+    assert store.path(_name(1)) is None
+    assert store.path(_name(2))
+
+
+def test_pinned_files_are_never_evicted(tmp_path):
+    store = AudioStore(directory=str(tmp_path), max_bytes=150)
+    _add(store, _name(1))
+    store.pin(_name(1))
+    _add(store, _name(2))
+    _add(store, _name(3))
+
+    assert store.path(_name(1))
+    assert store.path(_name(2)) is None
+
+
+def test_pins_made_by_another_worker_are_respected(tmp_path):
+    store = AudioStore(directory=str(tmp_path), max_bytes=150)
+    other = AudioStore(directory=str(tmp_path), max_bytes=150)
+    _add(store, _name(1))
+    other.pin(_name(1))
+    _add(store, _name(2))
+
+    assert store.path(_name(1))
+
+
+def test_picks_up_files_written_by_another_worker(tmp_path):
+    store = AudioStore(directory=str(tmp_path))
+    other = AudioStore(directory=str(tmp_path))
+    _add(other, _name(1))
+    assert store.path(_name(1)) == os.path.join(str(tmp_path), _name(1))
+
+
+def test_pending_texts_are_shared_and_cleared(tmp_path):
+    store = AudioStore(directory=str(tmp_path))
+    other = AudioStore(directory=str(tmp_path))
+    store.set_pending(_name(1), "Hello caller")
+    assert other.pending_text(_name(1)) == "Hello caller"
+    other.clear_pending(_name(1))
+    assert store.pending_text(_name(1)) is None
+
+
+def test_rejects_invalid_names(tmp_path):
+    store = AudioStore(directory=str(tmp_path))
+    assert store.path("../secret.mp3") is None
+    with pytest.raises(ValueError):
+        store.pin("../secret.mp3")
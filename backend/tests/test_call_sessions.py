@@ -0,0 +1,56 @@
+import fakeredis
+import pytest
+from Call.Sessions import CallSessions, fit_lines, truncate_tokens
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def _sessions(server, **kwargs):
+    return CallSessions(fakeredis.FakeRedis(server=server, decode_responses=True), **kwargs)
+
+
+def test_history_is_shared_between_workers(server):
+    first, second = _sessions(server), _sessions(server)
+    first.start("CA1", "context")
+    first.get("CA1").add_turn("How is Infosys doing?", "Up two percent.")
+
+    session = second.get("CA1")
+    assert session.context == "context"
+    assert list(session.history) == [("How is Infosys doing?", "Up two percent.")]
+
+
+def test_a_late_start_keeps_the_existing_session(server):
+    sessions = _sessions(server)
+    sessions.start("CA1", "context from the first turn").add_turn("Hello?", "Hi there.")
+
+    session = sessions.start("CA1", "context from the welcome thread")
+    assert session.context == "context from the first turn"
+    assert list(session.history) == [("Hello?", "Hi there.")]
+
+
+def test_history_keeps_the_latest_turns(server):
+    sessions = _sessions(server, history_turns=2)
+    session = sessions.start("CA1", "context")
+    for n in range(4):
+        session.add_turn(f"q{n}", f"a{n}")
+
+    assert list(sessions.get("CA1").history) == [("q2", "a2"), ("q3", "a3")]
+
+
+def test_sessions_expire_and_end(server):
+    sessions = _sessions(server, ttl=60)
+    sessions.start("CA1", "context")
+    assert 0 < sessions.client.ttl("call:CA1:context") <= 60
+
+    sessions.end("CA1")
+    assert sessions.get("CA1") is None
+    assert sessions.get("unknown") is None
+
+
+def test_truncation_helpers():
+    assert fit_lines("one\ntwo\nthree", 2) == "one\ntwo"
+    assert truncate_tokens("short", 10) == "short"
+    assert truncate_tokens("a few words that are too long", 3) == "a few"
@@ -0,0 +1,88 @@
+import time
+import threading
+import fakeredis
+import pytest
+from app.learning_module import course_cache as course_cache_module
+from app.learning_module.course_cache import CourseCache, normalize_query
+
+COURSE = {"syllabus": {"chapter1": "Basics"}, "chapters": {"chapter1": "Text"}, "questions": {}, "course_id": "abc"}
+
+
+@pytest.fixture
+def cache():
+    return CourseCache(fakeredis.FakeRedis(), ttl=60, max_entries=2)
+
+
+def test_normalized_queries_share_a_key():
+    assert normalize_query("  Sustainable   Investing basics? ") == "sustainable investing basics"
+    assert CourseCache.key_for("Bonds 101!", "1") == CourseCache.key_for("bonds 101", "1")
+    assert CourseCache.key_for("bonds 101", "1") != CourseCache.key_for("bonds 101", "2")
+
+
+def test_round_trip_and_lru_eviction(cache):
+    keys = [CourseCache.key_for(f"course {n}", "1") for n in range(3)]
+    cache.set(keys[0], COURSE)
+    cache.set(keys[1], COURSE)
+    # Reading the first entry makes the second the least recently used
+    assert cache.get(keys[0]) == COURSE
+    time.sleep(0.01)
+    cache.set(keys[2], COURSE)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == COURSE
+    assert cache.get(keys[2]) == COURSE
+
+
+def test_first_caller_takes_the_lock(cache):
+    key = CourseCache.key_for("bonds", "1")
+    with cache.generation_lock(key) as acquired:
+        assert acquired
+    with cache.generation_lock(key) as acquired:
+        assert acquired
+
+
+def test_waiter_returns_once_the_holder_stores_the_course(cache, monkeypatch):
+    monkeypatch.setattr(course_cache_module, "COURSE_LOCK_POLL_SECONDS", 0.05)
+    key = CourseCache.key_for("bonds", "1")
+    holding = threading.Event()
+
+    def generate():
+        with cache.generation_lock(key):
+            holding.set()
+            time.sleep(0.3)
+            cache.set(key, COURSE)
+            time.sleep(5)
+
+    threading.Thread(target=generate, daemon=True).start()
+    holding.wait()
+    started = time.monotonic()
+    with cache.generation_lock(key, wait=10):
+        assert cache.get(key) == COURSE
+    assert time.monotonic() - started < 2
+
+
+def test_waiter_takes_over_when_the_holder_fails(cache):
+    key = CourseCache.key_for("bonds", "1")
+    holding = threading.Event()
+
+    def fail():
+        with cache.generation_lock(key):
+            holding.set()
+            time.sleep(0.3)
+
+    threading.Thread(target=fail, daemon=True).start()
+    holding.wait()
+    with cache.generation_lock(key, wait=10) as acquired:
+        assert acquired
+        assert cache.get(key) is None
+
+
+def test_waiting_stops_when_cancelled(cache):
+    key = CourseCache.key_for("bonds", "1")
+    cancelled = threading.Event()
+    with cache.generation_lock(key):
+        threading.Timer(0.2, cancelled.set).start()
+        started = time.monotonic()
+        with cache.generation_lock(key, wait=10, cancelled=cancelled) as acquired:
+            assert not acquired
+        assert time.monotonic() - started < 2
@@ -0,0 +1,133 @@
+import time
+import threading
+import pytest
+from app import llm_gateway
+from app.llm_gateway import LLMGateway, LLMTimeoutError
+
+
+class RateLimited(Exception):
+    code = 429
+
+
+class Run:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeAgent:
+    """
+    Stands in for a phi Agent: replays the scripted outcomes, one per run.
+    """
+
+    def __init__(self, outcomes, delay=0.0):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        return self
+
+    def run(self, prompt, stream=False):
+        with self.lock:
+            self.calls += 1
+            outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        time.sleep(self.delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        if stream:
+            return (Run(chunk) for chunk in outcome)
+        return Run(outcome)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "LLM_BACKOFF_BASE", 0)
+
+
+def _gateway(agent, **kwargs):
+    gateway = LLMGateway(api_key="test", rate=1000, burst=1000, **kwargs)
+    gateway._agent = agent
+    return gateway
+
+
+def test_retries_rate_limited_requests():
+    agent = FakeAgent([RateLimited(), RateLimited(), "answer"])
+    gateway = _gateway(agent, retries=3)
+
+    assert gateway.run("prompt") == "answer"
+    assert agent.calls == 3
+    stats = gateway.stats()
+    assert (stats["requests"], stats["retries"], stats["successes"], stats["errors"]) == (3, 2, 1, 0)
+
+
+def test_gives_up_after_the_configured_retries():
+    agent = FakeAgent([RateLimited()])
+    gateway = _gateway(agent, retries=2)
+
+    with pytest.raises(RateLimited):
+        gateway.run("prompt")
+    assert agent.calls == 3
+    assert gateway.stats()["errors"] == 1
+
+
+def test_does_not_retry_other_errors():
+    agent = FakeAgent([ValueError("bad prompt")])
+    gateway = _gateway(agent, retries=3)
+
+    with pytest.raises(ValueError):
+        gateway.run("prompt")
+    assert agent.calls == 1
+
+
+def test_timed_out_attempts_keep_their_slot_until_they_finish():
+    agent = FakeAgent(["late"], delay=0.3)
+    gateway = _gateway(agent, retries=0, timeout=0.05, concurrency=1)
+
+    with pytest.raises(LLMTimeoutError):
+        gateway.run("prompt")
+    stats = gateway.stats()
+    assert (stats["in_flight"], stats["abandoned_in_flight"], stats["timeouts"]) == (1, 1, 1)
+
+    time.sleep(0.5)
+    stats = gateway.stats()
+    assert (stats["in_flight"], stats["abandoned_in_flight"]) == (0, 0)
+
+
+def test_identical_concurrent_prompts_share_one_request():
+    agent = FakeAgent(["shared answer"], delay=0.2)
+    gateway = _gateway(agent)
+    results = []
+
+    def ask():
+        results.append(gateway.run("same prompt"))
+
+    threads = [threading.Thread(target=ask) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["shared answer"] * 4
+    assert agent.calls == 1
+    assert gateway.stats()["coalesced"] == 3
+
+
+def test_stream_retries_only_before_the_first_chunk():
+    agent = FakeAgent([RateLimited(), ["Hello ", "there."]])
+    gateway = _gateway(agent, retries=2)
+    assert "".join(gateway.stream("prompt")) == "Hello there."
+    assert agent.calls == 2
+
+
+def test_stream_releases_its_slot_when_the_consumer_stops():
+    agent = FakeAgent([["one", "two", "three"]])
+    gateway = _gateway(agent, concurrency=1)
+
+    chunks = gateway.stream("prompt")
+    assert next(chunks) == "one"
+    chunks.close()
+    time.sleep(0.1)
+
+    assert gateway.stats()["in_flight"] == 0
+    assert "".join(gateway.stream("prompt")) == "onetwothree"
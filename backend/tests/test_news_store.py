@@ -0,0 +1,61 @@
+import fakeredis
+import pytest
+from app.news_recommendation_module import news_ingest
+from app.news_recommendation_module.news_ingest import NewsIngestor
+from app.news_recommendation_module.news_store import NewsStore, NO_NEWS, article_id
+
+
+def _article(n):
+    return {"Title": f"Story {n}", "Summary": "", "Link": f"https://example.com/{n}"}
+
+
+@pytest.fixture
+def store():
+    return NewsStore(fakeredis.FakeRedis(decode_responses=True), None, max_articles=3)
+
+
+def test_articles_are_deduplicated_and_kept_newest_first(store):
+    assert store.add_articles("tcs.ns", [_article(2), _article(1)]) == 2
+    assert store.add_articles("TCS.NS", [_article(3), _article(2)]) == 1
+
+    assert [a["Title"] for a in store.get_news()["TCS.NS"]] == ["Story 3", "Story 2", "Story 1"]
+
+
+def test_each_ticker_is_trimmed_to_the_newest_articles(store):
+    store.add_articles("TCS.NS", [_article(n) for n in (2, 1)])
+    store.add_articles("TCS.NS", [_article(n) for n in (4, 3)])
+
+    assert [a["Title"] for a in store.get_news()["TCS.NS"]] == ["Story 4", "Story 3", "Story 2"]
+    assert store.client.hlen("news:articles:TCS.NS") == 3
+    # A trimmed article is new again if it comes back
+    assert store.add_articles("TCS.NS", [_article(1)]) == 1
+
+
+def test_version_only_changes_when_articles_are_added(store):
+    assert store.version() == 0
+    store.add_articles("TCS.NS", [_article(1)])
+    version = store.version()
+    store.add_articles("TCS.NS", [_article(1)])
+    assert store.version() == version > 0
+
+
+def test_requested_tickers_without_articles_read_no_news(store):
+    store.add_articles("TCS.NS", [_article(1)])
+    news, timestamps = store.get_timestamped_news(["tcs.ns", "INFY.NS"])
+
+    assert news["INFY.NS"] == [NO_NEWS]
+    assert set(timestamps) == {article_id(_article(1))}
+    assert store.get_news() == {"TCS.NS": [_article(1)]}
+
+
+def test_ingestor_stores_every_ticker_and_survives_failures(store, monkeypatch):
+    def fetch(ticker):
+        if ticker == "BAD.NS":
+            raise ConnectionError("yfinance is down")
+        return [_article(ticker)]
+
+    monkeypatch.setattr(news_ingest, "fetch_ticker_news", fetch)
+    added = NewsIngestor(store, tickers=["TCS.NS", "^BSESN", "BAD.NS"]).refresh()
+
+    assert added == {"TCS.NS": 1, "^BSESN": 1}
+    assert sorted(store.get_news()) == ["TCS.NS", "^BSESN"]
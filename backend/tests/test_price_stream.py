@@ -0,0 +1,98 @@
+import fakeredis
+import pytest
+from app.news_recommendation_module.price_stream import PriceHub
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class Prices:
+    """
+    Blocking fetch_prices stand-in that records the tickers of every call.
+    """
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.calls = []
+
+    def __call__(self, tickers):
+        self.calls.append(sorted(tickers))
+        return {ticker: self.prices.get(ticker) for ticker in tickers}
+
+
+def _drain(queue):
+    updates = []
+    while not queue.empty():
+        updates.append(queue.get_nowait())
+    return updates
+
+
+async def test_local_hub_pushes_only_changed_prices():
+    prices = Prices({"TCS.NS": 4000.0, "INFY.NS": 1500.0})
+    hub = PriceHub(prices, interval=1)
+    tcs, both = hub.subscribe(["TCS.NS"]), hub.subscribe(["TCS.NS", "INFY.NS"])
+
+    await hub.poll()
+    assert _drain(tcs) == [{"TCS.NS": 4000.0}]
+    assert _drain(both) == [{"TCS.NS": 4000.0, "INFY.NS": 1500.0}]
+
+    prices.prices["INFY.NS"] = 1510.0
+    await hub.poll()
+    assert _drain(tcs) == []
+    assert _drain(both) == [{"INFY.NS": 1510.0}]
+
+    # New subscribers start with the last known prices
+    assert _drain(hub.subscribe(["TCS.NS"])) == [{"TCS.NS": 4000.0}]
+
+
+async def test_only_the_lease_holder_fetches_for_every_process():
+    server = fakeredis.FakeServer()
+    first_prices = Prices({"TCS.NS": 4000.0, "INFY.NS": 1500.0})
+    second_prices = Prices({})
+    first = PriceHub(first_prices, fakeredis.FakeAsyncRedis(server=server, decode_responses=True), interval=10)
+    second = PriceHub(second_prices, fakeredis.FakeAsyncRedis(server=server, decode_responses=True), interval=10)
+    tcs = first.subscribe(["TCS.NS"])
+    infy = second.subscribe(["INFY.NS"])
+
+    await first.poll()
+    await second.poll()
+    await first.poll()
+    await second.poll()
+
+    assert second_prices.calls == []
+    assert first_prices.calls == [["TCS.NS"], ["INFY.NS", "TCS.NS"]]
+    assert _drain(tcs) == [{"TCS.NS": 4000.0}]
+    assert _drain(infy) == [{"INFY.NS": 1500.0}]
+
+
+async def test_another_process_takes_over_an_expired_lease():
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    first = PriceHub(Prices({}), client, interval=10)
+    second_prices = Prices({"TCS.NS": 4000.0})
+    second = PriceHub(second_prices, fakeredis.FakeAsyncRedis(server=server, decode_responses=True), interval=10)
+    second.subscribe(["TCS.NS"])
+
+    assert await first._hold_lease()
+    assert not await second._hold_lease()
+    await client.delete("prices:poller")
+
+    await second.poll()
+    assert second_prices.calls == [["TCS.NS"]]
+
+
+async def test_falls_back_to_local_polling_when_redis_fails():
+    class Broken:
+        def pipeline(self):
+            raise ConnectionError("Redis is down")
+
+    prices = Prices({"TCS.NS": 4000.0})
+    hub = PriceHub(prices, Broken(), interval=1)
+    queue = hub.subscribe(["TCS.NS"])
+
+    await hub.poll()
+    assert _drain(queue) == [{"TCS.NS": 4000.0}]
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import time
+import fakeredis
+import pytest
+from app.news_recommendation_module.recommendation_cache import ResultCache, portfolio_hash
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class Generator:
+    """
+    Counts calls and returns "<label> #<n>" after an optional delay.
+    """
+
+    def __init__(self, label, delay=0.0):
+        self.label = label
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        calls = self.calls
+        await asyncio.sleep(self.delay)
+        return f"{self.label} #{calls}"
+
+
+@pytest.fixture
+def cache():
+    return ResultCache(fakeredis.FakeAsyncRedis(decode_responses=True), fresh_seconds=60)
+
+
+async def test_portfolio_hash_ignores_key_order():
+    assert portfolio_hash({"a": 1, "b": [1, 2]}) == portfolio_hash({"b": [1, 2], "a": 1})
+    assert portfolio_hash({"a": 1}) != portfolio_hash({"a": 2})
+
+
+async def test_miss_generates_and_hit_is_served_from_redis(cache):
+    generate = Generator("result")
+    assert await cache.get_or_generate("k", "id", 1, generate) == "result #1"
+    assert await cache.get_or_generate("k", "id", 1, generate) == "result #1"
+    assert generate.calls == 1
+
+
+async def test_concurrent_misses_share_one_generation(cache):
+    generate = Generator("result", delay=0.1)
+    results = await asyncio.gather(*(cache.get_or_generate("k", "id", 1, generate) for _ in range(5)))
+    assert results == ["result #1"] * 5
+    assert generate.calls == 1
+
+
+async def test_stale_entries_are_served_while_they_are_regenerated(cache):
+    generate = Generator("result", delay=0.05)
+    await cache.get_or_generate("k", "id", 1, generate)
+
+    # A new news version makes the entry stale
+    assert await cache.get_or_generate("k", "id", 2, generate) == "result #1"
+    await asyncio.sleep(0.1)
+    assert generate.calls == 2
+    assert await cache.get_or_generate("k", "id", 2, generate) == "result #2"
+
+
+async def test_old_entries_are_refreshed(cache):
+    generate = Generator("result")
+    await cache.get_or_generate("k", "id", 1, generate)
+    entry = json.loads(await cache.client.get("k"))
+    entry["created_at"] = time.time() - 120
+    await cache.client.set("k", json.dumps(entry))
+
+    assert await cache.get_or_generate("k", "id", 1, generate) == "result #1"
+    await asyncio.sleep(0.01)
+    assert generate.calls == 2
+
+
+async def test_entries_for_another_identity_are_never_served(cache):
+    await cache.get_or_generate("k", "old portfolio", 1, Generator("old"))
+    assert await cache.get_or_generate("k", "new portfolio", 1, Generator("new")) == "new #1"
+
+
+async def test_running_generation_for_a_replaced_portfolio_is_not_joined(cache):
+    old = Generator("old", delay=0.2)
+    running = asyncio.create_task(cache.get_or_generate("k", "old portfolio", 1, old))
+    await asyncio.sleep(0.05)
+
+    assert await cache.get_or_generate("k", "new portfolio", 1, Generator("new")) == "new #1"
+    assert await running == "old #1"
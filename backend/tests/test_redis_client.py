@@ -0,0 +1,95 @@
+import json
+import fakeredis
+import pytest
+from app.redis_db import redis as redis_module
+from app.redis_db.redis import RedisClient, PORTFOLIO_KEY, RECOMMENDATIONS_KEY
+
+PORTFOLIO = {
+    "name": "Asha",
+    "age": 34,
+    "Stocks": [{"name": "Infosys", "quantity": 10, "price_bought_at": 1500}],
+    "Crypto": [],
+}
+
+
+@pytest.fixture
+def client():
+    server = fakeredis.FakeServer()
+    client = RedisClient()
+    client.redis_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    client.binary_client = fakeredis.FakeRedis(server=server)
+    client._update_section = client.binary_client.register_script(redis_module._UPDATE_SECTION_SCRIPT)
+    return client
+
+
+def test_portfolio_round_trip(client):
+    assert client.set_portfolio("0xabc", PORTFOLIO)
+    assert client.get_portfolio("0xabc") == PORTFOLIO
+    assert client.get_portfolio_section("0xabc", "Stocks") == PORTFOLIO["Stocks"]
+    assert client.get_portfolio("0xmissing") is None
+
+
+def test_update_section_replaces_one_field_and_drops_recommendations(client):
+    client.set_portfolio("0xabc", PORTFOLIO)
+    client.binary_client.set(RECOMMENDATIONS_KEY.format("0xabc"), b"cached")
+    crypto = [{"name": "BTC", "quantity": 1}]
+
+    assert client.update_portfolio_section("0xabc", "Crypto", crypto)
+    assert client.get_portfolio("0xabc") == {**PORTFOLIO, "Crypto": crypto}
+    assert not client.binary_client.exists(RECOMMENDATIONS_KEY.format("0xabc"))
+
+
+def test_update_section_does_not_create_portfolios(client):
+    assert not client.update_portfolio_section("0xmissing", "Crypto", [])
+    assert not client.binary_client.exists(PORTFOLIO_KEY.format("0xmissing"))
+
+
+def test_legacy_portfolios_are_migrated_on_read(client):
+    client.binary_client.set("0xold", json.dumps(PORTFOLIO))
+
+    assert client.get_portfolio("0xold") == PORTFOLIO
+    assert client.binary_client.type(PORTFOLIO_KEY.format("0xold")) == b"hash"
+    assert not client.binary_client.exists("0xold")
+
+
+def test_legacy_section_update_migrates_first(client):
+    client.binary_client.set("0xold", json.dumps(PORTFOLIO))
+    assert client.update_portfolio_section("0xold", "Crypto", [{"name": "ETH"}])
+    assert client.get_portfolio("0xold")["Crypto"] == [{"name": "ETH"}]
+
+
+def test_stale_legacy_copy_does_not_overwrite_a_newer_portfolio(client):
+    client.binary_client.set("0xold", json.dumps(PORTFOLIO))
+    client.set_portfolio("0xold", {**PORTFOLIO, "age": 35})
+
+    assert client.migrate_legacy_portfolios() == 1
+    assert client.get_portfolio("0xold")["age"] == 35
+    assert not client.binary_client.exists("0xold")
+
+
+@pytest.mark.parametrize("key, value", [
+    ("course_cache:index", b"internal"),
+    ("news:version", b"7"),
+    ("settings", json.dumps({"theme": "dark"}).encode()),
+])
+def test_other_keys_are_never_touched(client, key, value):
+    client.binary_client.set(key, value)
+
+    client.set_portfolio(key, PORTFOLIO)
+    client.set_portfolios({key: PORTFOLIO})
+    client.get_portfolio(key)
+    client.migrate_legacy_portfolios()
+
+    assert client.binary_client.get(key) == value
+
+
+def test_batch_reads_and_writes(client):
+    client.set_portfolios({"0xa": PORTFOLIO, "0xb": {**PORTFOLIO, "name": "Ravi"}})
+    client.binary_client.set("0xc", json.dumps(PORTFOLIO))
+
+    portfolios = client.get_portfolios(["0xa", "0xb", "0xc", "0xd"])
+    assert portfolios["0xb"]["name"] == "Ravi"
+    assert portfolios["0xc"] == PORTFOLIO
+    assert portfolios["0xd"] is None
+    assert sorted(client.scan_wallets()) == ["0xa", "0xb", "0xc"]
+    assert client.get_portfolio_sections(["0xa", "0xd"], "Stocks") == {"0xa": PORTFOLIO["Stocks"], "0xd": None}
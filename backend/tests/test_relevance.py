@@ -0,0 +1,85 @@
+import json
+from app.news_recommendation_module.news_store import article_id
+from app.news_recommendation_module.relevance import NewsIndex, estimate_tokens
+from app.news_recommendation_module.ticker_resolver import TickerResolver
+
+
+def _resolver():
+    resolver = TickerResolver()
+    resolver.add("Infosys", "INFY.NS")
+    resolver.add("Tata Consultancy Services", "TCS.NS")
+    resolver.add("Reliance Industries", "RELIANCE.NS")
+    resolver.add("ITC", "ITC.NS")
+    return resolver
+
+
+def _article(title, summary="", link=None):
+    return {"Title": title, "Summary": summary, "Link": link or title}
+
+
+NEWS = {
+    "INFY.NS": [
+        _article("Infosys wins a large deal"),
+        _article("Infosys and TCS hire more freshers"),
+    ],
+    "TCS.NS": [
+        _article("Infosys and TCS hire more freshers"),
+        _article("NSE:RELIANCE shares rally on retail listing"),
+    ],
+    "^NSEI": [_article("Nifty ends the week higher")],
+}
+
+
+def test_files_articles_under_every_mentioned_company_without_repeats():
+    index = NewsIndex(NEWS, _resolver())
+    titles = lambda ticker: [index.articles[p]["Title"] for p in index.by_ticker.get(ticker, {})]
+
+    assert len(index.articles) == 4
+    assert titles("INFY.NS") == ["Infosys wins a large deal", "Infosys and TCS hire more freshers"]
+    assert titles("TCS.NS") == ["Infosys and TCS hire more freshers", "NSE:RELIANCE shares rally on retail listing"]
+    assert titles("RELIANCE.NS") == ["NSE:RELIANCE shares rally on retail listing"]
+    assert [index.articles[p]["Title"] for p in index.index_articles] == ["Nifty ends the week higher"]
+
+
+def test_ignores_short_acronyms_and_stop_listed_words():
+    news = {"^BSESN": [_article("CEO says IT spending and GDP growth will hold up")]}
+    index = NewsIndex(news, _resolver())
+    assert "ITC.NS" not in index.by_ticker
+    assert index.by_ticker == {}
+
+
+def test_select_ranks_articles_mentioning_more_holdings_first():
+    index = NewsIndex(NEWS, _resolver())
+    selected = index.select({"INFY.NS", "TCS.NS"}, top_k=2, index_k=1)
+    assert [a["Title"] for a in selected["Companies"]] == [
+        "Infosys and TCS hire more freshers",
+        "Infosys wins a large deal",
+    ]
+    assert [a["Title"] for a in selected["Market"]] == ["Nifty ends the week higher"]
+
+
+def test_select_stays_within_the_token_budget():
+    index = NewsIndex(NEWS, _resolver())
+    budget = 30
+    selected = index.select({"INFY.NS", "TCS.NS"}, token_budget=budget)
+    used = sum(estimate_tokens(json.dumps(a)) for section in selected.values() for a in section)
+    assert 0 < used <= budget
+
+
+def test_select_without_tickers_returns_the_most_recent_articles():
+    old = [_article(f"AAA story {n}") for n in range(10)]
+    new = _article("ZZZ story")
+    news = {"AAA.NS": old, "ZZZ.NS": [new]}
+    timestamps = {article_id(article): 1000 - n for n, article in enumerate(old)}
+    timestamps[article_id(new)] = 2000
+
+    selected = NewsIndex(news, _resolver(), timestamps).select(top_k=3, index_k=0)
+    assert [a["Title"] for a in selected["Companies"]] == ["ZZZ story", "AAA story 0", "AAA story 1"]
+
+
+def test_select_breaks_ties_between_holdings_by_recency():
+    news = {"INFY.NS": [_article("Infosys old news")], "TCS.NS": [_article("TCS fresh news")]}
+    timestamps = {article_id(news["INFY.NS"][0]): 1, article_id(news["TCS.NS"][0]): 2}
+
+    selected = NewsIndex(news, _resolver(), timestamps).select({"INFY.NS", "TCS.NS"}, index_k=0)
+    assert [a["Title"] for a in selected["Companies"]] == ["TCS fresh news", "Infosys old news"]
@@ -0,0 +1,44 @@
+import pytest
+from app.news_recommendation_module.revaluation import PortfolioRevaluer
+
+
+def test_value_batch_values_each_wallet():
+    sections = {
+        "0xa": [
+            {"name": "Infosys", "quantity": 10, "price_bought_at": 100},
+            {"name": "TCS", "quantity": 2, "price_bought_at": 3000},
+        ],
+        "0xb": [{"name": "Infosys", "quantity": 1, "price_bought_at": 120}],
+    }
+    tickers = {"Infosys": "INFY.NS", "TCS": "TCS.NS"}
+    prices = {"INFY.NS": 150.0, "TCS.NS": 3500.0}
+
+    valuations = PortfolioRevaluer.value_batch(sections, tickers, prices, as_of=1700000000)
+
+    assert valuations["0xa"] == {
+        "as_of": 1700000000,
+        "stocks_invested": 7000.0,
+        "stocks_current_value": 8500.0,
+        "stocks_pnl": 1500.0,
+        "holdings": 2,
+        "unpriced_holdings": 0,
+    }
+    assert valuations["0xb"]["stocks_pnl"] == 30.0
+
+
+def test_value_batch_carries_unpriced_holdings_at_cost():
+    sections = {"0xa": [
+        {"name": "Infosys", "quantity": 10, "price_bought_at": 100},
+        {"name": "Unlisted", "quantity": 3, "price_bought_at": 50},
+    ]}
+    valuations = PortfolioRevaluer.value_batch(sections, {"Infosys": "INFY.NS"}, {"INFY.NS": None}, as_of=0)
+
+    assert valuations["0xa"]["stocks_current_value"] == pytest.approx(1150)
+    assert valuations["0xa"]["stocks_pnl"] == 0
+    assert valuations["0xa"]["unpriced_holdings"] == 2
+
+
+def test_value_batch_includes_wallets_without_stocks():
+    valuations = PortfolioRevaluer.value_batch({"0xa": None, "0xb": []}, {}, {}, as_of=0)
+    assert valuations["0xa"]["holdings"] == 0
+    assert valuations["0xb"]["stocks_current_value"] == 0
@@ -0,0 +1,59 @@
+import json
+import datetime
+import numpy as np
+import pytest
+from app import serialization
+from app.serialization import Serializer, MAGIC
+
+VALUE = {
+    "wallet": "0xabc",
+    "prices": [101.5, 99.25],
+    "nested": {"ok": True, "none": None},
+}
+
+
+@pytest.mark.parametrize("codec", ["msgpack", "json"])
+@pytest.mark.parametrize("threshold", [0, 1])
+def test_round_trip(codec, threshold):
+    if codec == "msgpack" and serialization.msgpack is None:
+        pytest.skip("msgpack is not installed")
+    serializer = Serializer(codec=codec, compress_threshold=threshold)
+    data = serializer.dumps(VALUE)
+    assert data.startswith(MAGIC)
+    assert serializer.loads(data) == VALUE
+
+
+def test_large_values_are_compressed():
+    serializer = Serializer(codec="json", compress_threshold=64)
+    value = {"history": ["same text"] * 100}
+    data = serializer.dumps(value)
+    assert len(data) < len(json.dumps(value))
+    assert serializer.loads(data) == value
+
+
+def test_reads_values_written_as_plain_json():
+    serializer = Serializer(codec="json")
+    assert serializer.loads(json.dumps(VALUE)) == VALUE
+    assert serializer.loads(json.dumps(VALUE).encode()) == VALUE
+    assert serializer.loads(None) is None
+
+
+def test_reads_values_written_with_another_codec():
+    if serialization.msgpack is None:
+        pytest.skip("msgpack is not installed")
+    assert Serializer(codec="json").loads(Serializer(codec="msgpack").dumps(VALUE)) == VALUE
+
+
+def test_numpy_scalars_and_dates_are_encoded():
+    serializer = Serializer(codec="json")
+    value = {"price": np.float64(1.5), "count": np.int64(3), "date": datetime.date(2024, 1, 2)}
+    assert serializer.loads(serializer.dumps(value)) == {"price": 1.5, "count": 3, "date": "2024-01-02"}
+
+
+def test_rejects_unknown_codecs_and_versions():
+    with pytest.raises(ValueError):
+        Serializer(codec="pickle")
+    data = bytearray(Serializer(codec="json").dumps(VALUE))
+    data[len(MAGIC)] = 99
+    with pytest.raises(ValueError):
+        Serializer(codec="json").loads(bytes(data))
@@ -0,0 +1,36 @@
+from Call.SpeechPipeline import split_sentences
+
+
+def test_splits_complete_sentences_across_chunks():
+    chunks = ["Your portfolio is up three percent tod", "ay. Infosys led the gains this week! And th", "e rest"]
+    assert list(split_sentences(chunks, min_chars=10)) == [
+        "Your portfolio is up three percent today.",
+        "Infosys led the gains this week!",
+        "And the rest",
+    ]
+
+
+def test_merges_short_fragments_with_the_next_sentence():
+    assert list(split_sentences(["Yes. Your holdings are doing well."], min_chars=10)) == [
+        "Yes. Your holdings are doing well.",
+    ]
+
+
+def test_keeps_closing_quotes_with_their_sentence():
+    assert list(split_sentences(['He said "sell it." Then he left.'], min_chars=5)) == [
+        'He said "sell it."',
+        "Then he left.",
+    ]
+
+
+def test_yields_each_sentence_before_the_stream_ends():
+    def chunks():
+        yield "The first sentence is complete. "
+        raise RuntimeError("stream broke")
+
+    sentences = split_sentences(chunks(), min_chars=5)
+    assert next(sentences) == "The first sentence is complete."
+
+
+def test_ignores_empty_input():
+    assert list(split_sentences(["", "   "])) == []
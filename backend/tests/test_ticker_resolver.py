@@ -0,0 +1,58 @@
+from app.news_recommendation_module import ticker_resolver
+from app.news_recommendation_module.ticker_resolver import TickerResolver, normalize_name
+
+
+def _resolver():
+    return TickerResolver.from_guide({"Stocks": [
+        {"name": "Mahindra & Mahindra Ltd.", "ticker": "M&M.NS"},
+        {"name": "Infosys Limited", "ticker": "INFY.NS"},
+        {"name": "Tata Consultancy Services", "ticker": "tcs.ns"},
+    ]})
+
+
+def test_normalize_name_drops_suffixes_and_punctuation():
+    assert normalize_name("Mahindra & Mahindra Ltd.") == "mahindra and mahindra"
+    assert normalize_name("The Infosys Co.") == "infosys"
+
+
+def test_resolves_exact_names_and_symbols():
+    resolver = _resolver()
+    assert resolver.resolve("mahindra and mahindra") == "M&M.NS"
+    assert resolver.resolve("INFY") == "INFY.NS"
+    assert resolver.resolve("infy.ns") == "INFY.NS"
+    assert resolver.resolve("TCS") == "TCS.NS"
+
+
+def test_falls_back_to_fuzzy_matching():
+    resolver = _resolver()
+    assert resolver.resolve("Tata Consultancy Servics") == "TCS.NS"
+    assert resolver.resolve("Completely Unrelated Corp") is None
+    assert resolver.resolve("") is None
+
+
+def test_fuzzy_results_are_memoized_until_an_instrument_is_added(monkeypatch):
+    resolver = _resolver()
+    calls = []
+    extract = ticker_resolver.process.extractOne
+
+    def counting(*args, **kwargs):
+        calls.append(args[0])
+        return extract(*args, **kwargs)
+
+    monkeypatch.setattr(ticker_resolver.process, "extractOne", counting)
+    resolver.resolve("Infosys Limted")
+    resolver.resolve("Infosys Limted")
+    assert len(calls) == 1
+
+    resolver.add("Wipro Ltd", "WIPRO.NS")
+    resolver.resolve("Infosys Limted")
+    assert len(calls) == 2
+
+
+def test_load_file_reads_exchange_csv(tmp_path):
+    listing = tmp_path / "EQUITY_L.csv"
+    listing.write_text("SYMBOL,NAME OF COMPANY\nWIPRO,Wipro Limited\nHDFCBANK,HDFC Bank Limited\n")
+    resolver = TickerResolver()
+    assert resolver.load_file(str(listing)) == 2
+    assert resolver.resolve("HDFC Bank") == "HDFCBANK.NS"
+    assert resolver.resolve("WIPRO") == "WIPRO.NS"
@@ -9,7 +9,8 @@ import remarkGfm from 'remark-gfm';
 import { BookOpen, Clock, Award, CheckCircle2, XCircle, RefreshCw } from 'lucide-react';
 import { useCourseStore } from '@/store/courseStore';
 import { useEffect, useRef } from 'react';
-import { submitQuiz } from '@/lib/api';
+import { toast } from 'react-toastify';
+import { learnAPI, submitQuiz } from '@/lib/api';
 
 interface ChapterState {
   title: string;
@@ -18,6 +19,7 @@ interface ChapterState {
 }
 
 interface QuizSubmission {
+  course_id: string;               // id returned by /api/learn
   Set: { [key: string]: string };  // question -> answer mapping
   chapter: string;                 // chapter title
 }
@@ -42,10 +44,13 @@ const ChapterView = () => {
   const [activeSection, setActiveSection] = React.useState<'content' | 'quiz'>('content');
   const [quizResults, setQuizResults] = React.useState<QuizResponse | null>(null);
   const [isSubmitting, setIsSubmitting] = React.useState(false);
+  const [isRegenerating, setIsRegenerating] = React.useState(false);
 
-  const { getCurrentCourse } = useCourseStore();
+  const { getCurrentCourse, addCourse } = useCourseStore();
   const widgetContainerRef = useRef<HTMLDivElement>(null);
   const currentCourse = getCurrentCourse();
+  // Courses saved before the server stored them have no id, so their answers cannot be evaluated
+  const storedCourseId: string | undefined = currentCourse?.data?.course_id;
 
 
 
@@ -55,7 +60,26 @@ const ChapterView = () => {
     setAnswers(newAnswers);
   };
 
+  const handleRegenerate = async () => {
+    if (!currentCourse) return;
+
+    try {
+      setIsRegenerating(true);
+      const response = await learnAPI.generateCourse(currentCourse.title);
+      addCourse(currentCourse.title, response, currentCourse.agentId);
+      toast.success("Course regenerated, open the chapter again to take the quiz");
+      navigate(`/learning/${courseId}`);
+    } catch (error) {
+      console.error('Error regenerating course:', error);
+      toast.error("Failed to regenerate course");
+    } finally {
+      setIsRegenerating(false);
+    }
+  };
+
   const handleSubmit = async () => {
+    if (!storedCourseId) return;
+
     try {
       setIsSubmitting(true);
 
@@ -68,6 +92,7 @@ const ChapterView = () => {
       console.log(answerMapping);
 
       const submission: QuizSubmission = {
+        course_id: storedCourseId,
         Set: answerMapping,
         chapter: title
       };
@@ -93,6 +118,28 @@ const ChapterView = () => {
       transition={{ duration: 0.5 }}
       className="space-y-8"
     >
+      {!storedCourseId && (
+        <div className="bg-orange-50 p-6 rounded-2xl border border-orange-200 flex items-center justify-between gap-4">
+          <p className="text-orange-800">
+            This course was saved with an older version and its quiz can't be checked. Regenerate the course to submit answers.
+          </p>
+          <Button
+            onClick={handleRegenerate}
+            disabled={isRegenerating || !currentCourse}
+            className="bg-orange-500 hover:bg-orange-600 text-white shrink-0"
+          >
+            {isRegenerating ? (
+              <>
+                <RefreshCw className="w-4 h-4 mr-2 animate-spin" />
+                Regenerating...
+              </>
+            ) : (
+              'Regenerate course'
+            )}
+          </Button>
+        </div>
+      )}
+
       {questions.slice(1).map((question, index) => (
         <motion.div
           key={index}
@@ -224,7 +271,7 @@ const ChapterView = () => {
         <div className="flex justify-end">
           <Button 
             onClick={handleSubmit}
-            disabled={submitted || isSubmitting}
+            disabled={submitted || isSubmitting || !storedCourseId}
             className="bg-green-500 hover:bg-green-600 text-white px-8 py-4 rounded-xl text-lg font-medium
                      transform transition-all duration-300 hover:scale-105 hover:shadow-xl hover:shadow-green-500/20
                      disabled:opacity-50 disabled:cursor-not-allowed disabled:transform-none disabled:shadow-none"
@@ -10,6 +10,7 @@ const api = axios.create({
 });
 
 interface QuizSubmission {
+  course_id: string;               // id returned by /api/learn
   Set: { [key: string]: string };  // question -> answer mapping
   chapter: string;                 // chapter title
 }